@@ -0,0 +1,132 @@
+# api/jobs.py
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from backend.async_runtime import AgentEvent
+from backend.config import API_INGEST_WORKERS, API_JOB_HISTORY, API_MAX_QUEUED_JOBS
+from backend.ingestion import ingest_pdf
+from backend.tracing import span
+
+
+class QueueFull(Exception):
+    """More jobs are waiting than the queue allows."""
+
+
+@dataclass
+class Job:
+    id: str
+    file_name: str
+    status: str = "queued"  # queued | running | done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Latest per-stage pipeline stats
+    progress: Dict[str, dict] = field(default_factory=dict)
+    # Finished agent steps (classification, section summaries, ...)
+    steps: List[str] = field(default_factory=list)
+    # The summary as it is being written
+    partial_summary: str = ""
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    trace_id: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class IngestJobs:
+    """
+    Ingestion jobs on a bounded worker pool. submit() returns at once with
+    a job id; the job's progress, steps and result are polled with get().
+    """
+
+    def __init__(
+        self,
+        workers: int = API_INGEST_WORKERS,
+        max_queued: int = API_MAX_QUEUED_JOBS,
+        history: int = API_JOB_HISTORY,
+    ):
+        self.max_queued = max_queued
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    def submit(
+        self,
+        file_path: str,
+        file_name: str,
+        job_id: Optional[str] = None,
+        base_doc_id: Optional[str] = None,
+    ) -> Job:
+        with self._lock:
+            queued = sum(job.status == "queued" for job in self._jobs.values())
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} ingestion jobs are already waiting")
+            job = Job(id=job_id or uuid.uuid4().hex, file_name=file_name)
+            self._jobs[job.id] = job
+            self._prune()
+        self._pool.submit(self._run, job, file_path, base_doc_id)
+        return job
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond the history size
+        finished = [j.id for j in self._jobs.values() if j.status in ("done", "failed")]
+        for job_id in finished[: max(len(self._jobs) - self.history, 0)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: Job, file_path: str, base_doc_id: Optional[str]):
+        job.status = "running"
+        job.started_at = time.time()
+
+        def _on_progress(stats: Dict[str, dict]):
+            job.progress = stats
+
+        def _on_event(event: AgentEvent):
+            if event.kind == "step":
+                job.steps.append(event.text)
+            elif event.kind == "token":
+                job.partial_summary += event.text
+            elif event.kind == "reset":
+                job.partial_summary = ""
+
+        try:
+            with span("ingest_job", job_id=job.id, file=job.file_name) as root:
+                job.trace_id = root.trace_id
+                result = ingest_pdf(
+                    file_path,
+                    on_progress=_on_progress,
+                    on_event=_on_event,
+                    base_doc_id=base_doc_id,
+                )
+        except Exception as exc:
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.status = "failed"
+        else:
+            job.result = {
+                "doc_id": result.doc_id,
+                "doc_type": result.doc_type,
+                "summary": result.summary,
+                "num_chunks": result.num_chunks,
+                "cache_hit": result.cache_hit,
+                "revision": result.revision,
+            }
+            job.status = "done"
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
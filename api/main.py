@@ -0,0 +1,181 @@
+# api/main.py
+# Headless HTTP service over the backend package:
+#
+#     uvicorn api.main:app --host 0.0.0.0 --port 8000
+#
+# Uploads are ingested by background jobs (poll /jobs/{id}); questions and
+# quizzes run on the event loop, at most API_QUERY_CONCURRENCY at a time,
+# as JSON or streamed as NDJSON agent events.
+import asyncio
+import json
+import re
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Tuple
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from backend.async_runtime import AgentEvent
+from backend.config import API_QUERY_CONCURRENCY, UPLOAD_DIR, ensure_data_dirs
+from backend.ingest_cache import load_cached_metadata
+from backend.qa_agent import aanswer_question
+from backend.quiz_agent import DEFAULT_QUIZ_QUERY, agenerate_quiz_from_query
+from backend.tracing import get_trace, span
+
+from .jobs import IngestJobs, QueueFull
+
+jobs = IngestJobs()
+_queries = asyncio.Semaphore(API_QUERY_CONCURRENCY)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    yield
+    jobs.shutdown()
+
+
+app = FastAPI(title="InsightPDF API", lifespan=_lifespan)
+
+
+class AskRequest(BaseModel):
+    question: str
+
+
+class QuizRequest(BaseModel):
+    query: str = DEFAULT_QUIZ_QUERY
+
+
+def _require_document(doc_id: str) -> dict:
+    meta = load_cached_metadata(doc_id)
+    if meta is None:
+        raise HTTPException(status_code=404, detail=f"Unknown document {doc_id}")
+    return meta
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", name.rsplit("/", 1)[-1]) or "upload.pdf"
+
+
+async def _run_query(name: str, run: Callable[[], Awaitable]) -> Tuple[str, Any]:
+    """Run an agent within the concurrency limit, in its own trace; returns (trace_id, result)."""
+    async with _queries:
+        with span(name) as root:
+            return root.trace_id, await run()
+
+
+def _line(payload: dict) -> bytes:
+    return (json.dumps(payload, default=str) + "\n").encode("utf-8")
+
+
+def _ndjson(
+    name: str, run: Callable[[Callable[[AgentEvent], None]], Awaitable]
+) -> StreamingResponse:
+    """
+    Run `run(emit)` and stream its AgentEvents, one JSON object per line,
+    ending with a "done" event (data: the result, plus the trace_id) or an
+    "error" event.
+    """
+
+    async def _events() -> AsyncIterator[bytes]:
+        queue: "asyncio.Queue" = asyncio.Queue()
+        task = asyncio.create_task(_run_query(name, lambda: run(queue.put_nowait)))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield _line(asdict(event))
+            if task.exception() is not None:
+                exc = task.exception()
+                yield _line(asdict(AgentEvent("error", f"{type(exc).__name__}: {exc}")))
+            else:
+                trace_id, result = task.result()
+                yield _line({**asdict(AgentEvent("done", data=result)), "trace_id": trace_id})
+        finally:
+            # Client went away: stop the agent too
+            task.cancel()
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+
+@app.post("/documents", status_code=202)
+async def upload_document(file: UploadFile = File(...), revises: Optional[str] = None):
+    """
+    Queue a PDF for ingestion; poll /jobs/{job_id} for progress and the
+    doc_id. `revises` names the document this is a new revision of; only
+    its changed pages are then re-indexed.
+    """
+    ensure_data_dirs()
+    job_id = uuid.uuid4().hex
+    path = UPLOAD_DIR / f"{job_id}-{_safe_name(file.filename or '')}"
+    with open(path, "wb") as f:
+        while chunk := await file.read(1 << 20):
+            f.write(chunk)
+    try:
+        job = jobs.submit(str(path), file.filename or path.name, job_id=job_id, base_doc_id=revises)
+    except QueueFull as exc:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=429, detail=str(exc))
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return [
+        {"id": j.id, "file_name": j.file_name, "status": j.status, "created_at": j.created_at}
+        for j in jobs.list()
+    ]
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    return job.as_dict()
+
+
+@app.get("/documents/{doc_id}/summary")
+async def document_summary(doc_id: str):
+    meta = _require_document(doc_id)
+    return {"doc_id": doc_id, "doc_type": meta["doc_type"], "summary": meta["summary"]}
+
+
+@app.post("/documents/{doc_id}/ask")
+async def ask(doc_id: str, request: AskRequest, stream: bool = False):
+    _require_document(doc_id)
+    if stream:
+        return _ndjson("api_ask", lambda emit: aanswer_question(request.question, doc_id, emit))
+    trace_id, (answer, sources) = await _run_query(
+        "api_ask", lambda: aanswer_question(request.question, doc_id)
+    )
+    return {"answer": answer, "sources": sources, "trace_id": trace_id}
+
+
+@app.post("/documents/{doc_id}/quiz")
+async def quiz(doc_id: str, request: Optional[QuizRequest] = None, stream: bool = False):
+    _require_document(doc_id)
+    query = (request or QuizRequest()).query
+    if stream:
+        return _ndjson("api_quiz", lambda emit: agenerate_quiz_from_query(doc_id, query, emit))
+    trace_id, result = await _run_query(
+        "api_quiz", lambda: agenerate_quiz_from_query(doc_id, query)
+    )
+    return {"quiz": result, "trace_id": trace_id}
+
+
+@app.get("/traces/{trace_id}")
+async def trace(trace_id: str):
+    spans = get_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Unknown trace {trace_id}")
+    return spans
@@ -0,0 +1,74 @@
+# app/api_client.py
+# Client of the HTTP service (api/main.py), used by the Streamlit app when
+# API_URL is set. Streams yield the same AgentEvents as the in-process agents.
+import json
+from typing import Iterator, Optional
+
+import requests
+
+from backend.async_runtime import AgentEvent
+from backend.config import API_URL
+
+
+class ApiClient:
+    def __init__(self, base_url: str = API_URL, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def _get(self, path: str) -> dict:
+        response = self._session.get(self._url(path), timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def upload(self, file_name: str, data: bytes, revises: Optional[str] = None) -> str:
+        """Queue a PDF (a new revision of document `revises`) for ingestion; returns the job id."""
+        response = self._session.post(
+            self._url("/documents"),
+            params={"revises": revises} if revises else None,
+            files={"file": (file_name, data, "application/pdf")},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["job_id"]
+
+    def job(self, job_id: str) -> dict:
+        return self._get(f"/jobs/{job_id}")
+
+    def summary(self, doc_id: str) -> dict:
+        return self._get(f"/documents/{doc_id}/summary")
+
+    def trace(self, trace_id: str) -> list:
+        response = self._session.get(self._url(f"/traces/{trace_id}"), timeout=self.timeout)
+        return response.json() if response.ok else []
+
+    def _stream(self, path: str, body: Optional[dict]) -> Iterator[AgentEvent]:
+        # No read timeout: an answer may take longer than any single poll
+        with self._session.post(
+            self._url(path), params={"stream": "true"}, json=body, stream=True,
+            timeout=(self.timeout, None),
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                payload = json.loads(line)
+                trace_id = payload.pop("trace_id", None)
+                event = AgentEvent(**payload)
+                if event.kind == "error":
+                    raise RuntimeError(event.text)
+                if event.kind == "done":
+                    # Same shape as the in-process result, plus where to find its trace
+                    event.data = (event.data, trace_id)
+                yield event
+
+    def stream_answer_question(self, question: str, doc_id: str) -> Iterator[AgentEvent]:
+        """Like qa_agent.stream_answer_question; "done" data is ((answer, sources), trace_id)."""
+        return self._stream(f"/documents/{doc_id}/ask", {"question": question})
+
+    def stream_quiz_from_query(self, doc_id: str, query: Optional[str] = None) -> Iterator[AgentEvent]:
+        """Like quiz_agent.stream_quiz_from_query; "done" data is (quiz, trace_id)."""
+        return self._stream(f"/documents/{doc_id}/quiz", {"query": query} if query else None)
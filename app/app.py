@@ -1,13 +1,14 @@
+import logging
+import threading
+import time
+
 import streamlit as st
-from pathlib import Path
 
-from backend.pdf_loader import save_uploaded_file, load_and_chunk_pdf
-from backend.vector_store import build_vector_store
-from backend.classifier_agent import classify_document
-from backend.summarizer_agent import summarize_document
-from backend.qa_agent import answer_question
-from backend.quiz_agent import generate_quiz_from_query
-from backend.config import CHROMA_DIR
+# Only light modules here, so the upload page renders at once; the backend
+# (LangChain, the vector stores, the models) is imported on first use or by
+# the background warmup. benchmarks/import_budget.py checks this.
+from backend.tracing import breakdown, get_trace, span
+from backend.config import API_URL, DEBUG_UI, WARMUP_ON_START
 
 st.set_page_config(
     page_title="InsightPDF – Agentic RAG",
@@ -52,21 +53,185 @@ section.main > div {
 
 st.markdown(COFFEE_BROWN_BG, unsafe_allow_html=True)
 
+
+def _warm_up():
+    try:
+        import backend.ingestion, backend.qa_agent, backend.quiz_agent  # noqa: F401
+        from backend.model_registry import registry
+
+        registry.warmup()
+    except Exception:
+        logging.getLogger(__name__).exception("Model warmup failed")
+
+
+@st.cache_resource(show_spinner=False)
+def warm_up_models() -> threading.Thread:
+    # Once per server process, in the background: pages render meanwhile, and
+    # a request that needs a model first waits for that model's load only.
+    thread = threading.Thread(target=_warm_up, name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource(show_spinner=False)
+def api_client():
+    from app.api_client import ApiClient
+
+    return ApiClient(API_URL)
+
+
+# With API_URL set, this app is a client of the HTTP service (api/main.py):
+# the models, ingestion and agents all run there.
+api = api_client() if API_URL else None
+
+if WARMUP_ON_START and api is None:
+    warm_up_models()
+
 if "file_path" not in st.session_state:
     st.session_state.file_path = None
 if "doc_type" not in st.session_state:
     st.session_state.doc_type = None
 if "summary" not in st.session_state:
     st.session_state.summary = None
+if "doc_id" not in st.session_state:
+    st.session_state.doc_id = None
+# File name -> doc_id of its last upload in this session. Re-uploading a
+# file under that name re-indexes it as a revision of that document.
+if "revisions" not in st.session_state:
+    st.session_state.revisions = {}
+
+
+class StreamView:
+    """Renders agent events: finished steps in a status box, tokens as they arrive."""
+
+    def __init__(self, status, placeholder, debug: bool):
+        self.status = status
+        self.placeholder = placeholder
+        self.debug = debug
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.text = ""
+
+    def __call__(self, event):
+        if event.kind == "step":
+            self.status.write(event.text)
+        elif event.kind == "token":
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.started
+            self.text += event.text
+            self.placeholder.markdown(self.text + "▌")
+        elif event.kind == "reset":
+            self.text = ""
+            self.placeholder.markdown("")
+        elif event.kind == "ttft" and self.debug:
+            self.status.write(f"`{event.text}`: first token after {event.data:.2f}s")
+
+    def finish(self, text: str):
+        self.placeholder.markdown(text)
+        if self.debug and self.first_token is not None:
+            st.caption(f"Time to first token: {self.first_token:.2f}s")
+
+
+def render_stream(events, debug: bool):
+    """Consume an agent event stream in the current container; returns the run's result."""
+    status = st.status("Thinking with RAG...", expanded=False)
+    view = StreamView(status, st.empty(), debug)
+    result = None
+    for event in events:
+        if event.kind == "done":
+            result = event.data
+        else:
+            view(event)
+    status.update(label="Done", state="complete")
+    return view, result
+
+
+def render_trace_panel():
+    """Latency breakdown of this session's last request (debug mode)."""
+    trace_id = st.session_state.get("last_trace_id") or ""
+    spans = (api.trace(trace_id) if trace_id else []) if api else get_trace(trace_id)
+    with st.sidebar.expander("Last request trace", expanded=True):
+        if not spans:
+            st.caption("No request traced yet.")
+            return
+        llm_calls = [s for s in spans if s["name"] == "llm"]
+        tokens = sum(
+            s["attributes"].get("prompt_tokens", 0) + s["attributes"].get("completion_tokens", 0)
+            for s in llm_calls
+        )
+        rows = breakdown(spans)
+        st.caption(
+            f"{rows[0]['span']}: {rows[0]['ms'] / 1000:.2f}s · "
+            f"{len(llm_calls)} LLM calls · {tokens} tokens"
+        )
+        st.dataframe(rows, hide_index=True)
 
 def main():
     st.title("InsightPDF – Agentic RAG Document Analyzer")
     st.caption("Upload a PDF → classify → summarize → chat & quiz, all powered by local RAG.")
+    st.sidebar.checkbox("Debug mode (timings)", value=DEBUG_UI, key="debug")
 
+    if api is not None and st.session_state.doc_id is None and "doc" in st.query_params:
+        # A page refresh: reopen the document the URL points at
+        open_document(api.summary(st.query_params["doc"]))
     if st.session_state.file_path is None:
-        render_upload_page()
+        if api is not None and "job" in st.query_params:
+            # A page refresh while the document was being processed
+            follow_ingest_job(st.query_params["job"])
+        else:
+            render_upload_page()
     else:
         render_summary_and_chat_page()
+    if st.session_state.debug:
+        render_trace_panel()
+
+def open_document(result: dict):
+    st.session_state.file_path = result.get("file_name", result["doc_id"])
+    st.session_state.doc_id = result["doc_id"]
+    st.session_state.doc_type = result["doc_type"]
+    st.session_state.summary = result["summary"]
+    st.query_params["doc"] = result["doc_id"]
+    if "file_name" in result:
+        st.session_state.revisions[result["file_name"]] = result["doc_id"]
+
+
+def follow_ingest_job(job_id: str):
+    """Poll an ingestion job of the service, showing its steps and summary draft."""
+    st.subheader("Step 1 – Processing your PDF")
+    st.query_params["job"] = job_id
+    status = st.status("Reading, chunking, embedding, and summarizing your document...")
+    progress = st.empty()
+    draft = st.empty()
+    shown = 0
+    while True:
+        job = api.job(job_id)
+        for step in job["steps"][shown:]:
+            status.write(step)
+        shown = len(job["steps"])
+        if job["progress"]:
+            progress.caption(
+                " · ".join(
+                    f"{s['stage']}: {s['items']} ({s['items_per_second']}/s)"
+                    for s in job["progress"].values()
+                )
+            )
+        if job["status"] in ("done", "failed"):
+            break
+        draft.markdown(job["partial_summary"] + ("▌" if job["partial_summary"] else ""))
+        time.sleep(0.5)
+
+    del st.query_params["job"]
+    st.session_state.last_trace_id = job["trace_id"]
+    if job["status"] == "failed":
+        status.update(label="Processing failed", state="error")
+        st.error(job["error"])
+        return
+    draft.markdown(job["result"]["summary"])
+    status.update(label="Document processed", state="complete")
+    open_document({**job["result"], "file_name": job["file_name"]})
+    st.success("Document processed! Opening summary & chat…")
+    st.rerun()
+
 
 def render_upload_page():
     st.subheader("Step 1 – Upload your PDF")
@@ -76,26 +241,47 @@ def render_upload_page():
         st.write(f"Selected file: **{uploaded_file.name}**")
 
         if st.button("Process & Summarize"):
-            with st.spinner("Reading, chunking, embedding, and summarizing your document..."):
-                # Save file
-                file_path = save_uploaded_file(uploaded_file)
-                st.session_state.file_path = file_path
-
-                chunks = load_and_chunk_pdf(file_path)
+            base_doc_id = st.session_state.revisions.get(uploaded_file.name)
+            if api is not None:
+                follow_ingest_job(
+                    api.upload(uploaded_file.name, uploaded_file.getvalue(), revises=base_doc_id)
+                )
+                return
+            from backend.ingestion import ingest_pdf
+            from backend.pdf_loader import save_uploaded_file
 
-                # Build vector store (Chroma)
-                build_vector_store(chunks)
+            status = st.status("Reading, chunking, embedding, and summarizing your document...")
+            # Save file
+            file_path = save_uploaded_file(uploaded_file)
+            st.session_state.file_path = file_path
 
-                # Get plain text for classification & summarization
-                full_text = "\n\n".join([c.page_content for c in chunks])
+            progress = st.empty()
+            summary_view = StreamView(status, st.empty(), st.session_state.debug)
 
-                # Classify document type
-                doc_type = classify_document(full_text)
-                st.session_state.doc_type = doc_type
+            def show_progress(stats):
+                progress.caption(
+                    " · ".join(
+                        f"{s['stage']}: {s['items']} ({s['items_per_second']}/s)"
+                        for s in stats.values()
+                    )
+                )
 
-                # Summarize document
-                summary = summarize_document(full_text, doc_type)
-                st.session_state.summary = summary
+            # Extract, chunk, embed, classify & summarize (cached by content);
+            # agent steps and the summary draft are shown as they happen
+            with span("upload", file=uploaded_file.name) as root:
+                result = ingest_pdf(
+                    file_path,
+                    on_progress=show_progress,
+                    on_event=summary_view,
+                    base_doc_id=base_doc_id,
+                )
+            st.session_state.last_trace_id = root.trace_id
+            summary_view.finish(result.summary)
+            status.update(label="Document processed", state="complete")
+            st.session_state.doc_id = result.doc_id
+            st.session_state.doc_type = result.doc_type
+            st.session_state.summary = result.summary
+            st.session_state.revisions[uploaded_file.name] = result.doc_id
 
             st.success("Document processed! Opening summary & chat…")
             st.rerun()
@@ -129,23 +315,50 @@ def render_summary_and_chat_page():
             st.session_state.chat_history.append(("user", user_input))
 
             with st.chat_message("assistant"):
-                with st.spinner("Thinking with RAG..."):
-                    if user_input.strip().lower().startswith("quiz"):
-                        quiz = generate_quiz_from_query()
-                        answer_text = quiz
+                debug = st.session_state.debug
+                is_quiz = user_input.strip().lower().startswith("quiz")
+                if api is not None:
+                    # Traced by the service; its final event says which trace
+                    if is_quiz:
+                        view, (answer_text, trace_id) = render_stream(
+                            api.stream_quiz_from_query(st.session_state.doc_id), debug
+                        )
                     else:
-                        answer, sources = answer_question(user_input)
-                        answer_text = answer
+                        view, ((answer_text, sources), trace_id) = render_stream(
+                            api.stream_answer_question(user_input, st.session_state.doc_id),
+                            debug,
+                        )
+                    st.session_state.last_trace_id = trace_id
+                else:
+                    from backend.qa_agent import stream_answer_question
+                    from backend.quiz_agent import stream_quiz_from_query
+
+                    # Agent spans nest under this one, in the stream's worker thread too
+                    with span("chat") as root:
+                        if is_quiz:
+                            view, quiz = render_stream(
+                                stream_quiz_from_query(st.session_state.doc_id), debug
+                            )
+                            answer_text = quiz
+                        else:
+                            view, (answer, sources) = render_stream(
+                                stream_answer_question(user_input, st.session_state.doc_id),
+                                debug,
+                            )
+                            answer_text = answer
+                    st.session_state.last_trace_id = root.trace_id
 
-                    st.markdown(answer_text)
-                    st.session_state.chat_history.append(("assistant", answer_text))
+                view.finish(answer_text)
+                st.session_state.chat_history.append(("assistant", answer_text))
 
     st.markdown("---")
     if st.button("Start over with a new PDF"):
         st.session_state.file_path = None
+        st.session_state.doc_id = None
         st.session_state.doc_type = None
         st.session_state.summary = None
         st.session_state.chat_history = []
+        st.query_params.clear()
 
 if __name__ == "__main__":
     main()
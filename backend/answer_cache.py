@@ -0,0 +1,152 @@
+# backend/answer_cache.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .config import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL_SECONDS,
+)
+from .embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    vector: np.ndarray
+    answer: str
+    sources: List[str]
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    Answers to earlier questions, per document, looked up by question
+    similarity (cosine of the question embeddings >= `threshold`).
+
+    Entries expire after `ttl_seconds`; beyond `max_entries` per document
+    the least recently used one is dropped. Each document's entries are
+    tied to an index version and discarded when the index changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # doc_id -> (index version, normalized question -> entry, LRU order)
+        self._docs: Dict[str, Tuple[Hashable, "OrderedDict[str, CachedAnswer]"]] = {}
+        self._counters = {
+            "hits": 0,
+            "exact_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evicted": 0,
+            "invalidated": 0,
+        }
+
+    def _entries(self, doc_id: str, version: Hashable) -> "OrderedDict[str, CachedAnswer]":
+        current = self._docs.get(doc_id)
+        if current is not None and current[0] == version:
+            return current[1]
+        if current is not None:
+            self._counters["invalidated"] += len(current[1])
+            logger.info("Answer cache for %s invalidated (index changed)", doc_id)
+        entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._docs[doc_id] = (version, entries)
+        return entries
+
+    def _drop_expired(self, entries: "OrderedDict[str, CachedAnswer]"):
+        if self.ttl_seconds <= 0:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [key for key, entry in entries.items() if entry.created_at < cutoff]
+        for key in expired:
+            del entries[key]
+        self._counters["expired"] += len(expired)
+
+    def lookup(
+        self, doc_id: str, version: Hashable, question: str, vector
+    ) -> Optional[CachedAnswer]:
+        """The cached answer to the closest earlier question, if it is close enough."""
+        key = normalize_text(question).lower()
+        with self._lock:
+            entries = self._entries(doc_id, version)
+            self._drop_expired(entries)
+
+            entry = entries.get(key)
+            if entry is not None:
+                self._counters["exact_hits"] += 1
+            elif entries:
+                keys = list(entries)
+                matrix = np.stack([entries[k].vector for k in keys])
+                scores = matrix @ _unit(vector)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    key, entry = keys[best], entries[keys[best]]
+
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry
+
+    def store(
+        self,
+        doc_id: str,
+        version: Hashable,
+        question: str,
+        vector,
+        answer: str,
+        sources: List[str],
+    ):
+        key = normalize_text(question).lower()
+        with self._lock:
+            entries = self._entries(doc_id, version)
+            entries[key] = CachedAnswer(question, _unit(vector), answer, list(sources))
+            entries.move_to_end(key)
+            self._counters["stores"] += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def invalidate(self, doc_id: Optional[str] = None):
+        """Forget one document's answers, or all of them."""
+        with self._lock:
+            doc_ids = [doc_id] if doc_id is not None else list(self._docs)
+            for d in doc_ids:
+                current = self._docs.pop(d, None)
+                if current is not None:
+                    self._counters["invalidated"] += len(current[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": sum(len(entries) for _, entries in self._docs.values()),
+                "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else 0.0,
+            }
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,156 @@
+# backend/async_runtime.py
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class AgentEvent:
+    """
+    Progress of an agent run, for UIs:
+    - "step":  an intermediate step finished (text describes it)
+    - "token": a piece of the answer being generated
+    - "reset": discard the tokens so far (e.g. a rejected first answer)
+    - "ttft":  time to first token of one LLM call (text: step, data: seconds)
+    - "done":  the run finished (data: its result)
+    """
+
+    kind: str
+    text: str = ""
+    data: Any = None
+
+
+Emit = Optional[Callable[[AgentEvent], None]]
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """
+    Run an agent coroutine to completion from synchronous code (Streamlit,
+    scripts). Inside a running event loop it is run on a fresh loop in a
+    helper thread instead of deadlocking the caller's loop.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # The helper thread runs in the caller's context (e.g. its trace span)
+    context = contextvars.copy_context()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(context.run, asyncio.run, coro).result()
+
+
+async def to_thread(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Blocking work (retrieval, embedding, disk) off the event loop."""
+    return await asyncio.to_thread(functools.partial(fn, *args, **kwargs))
+
+
+async def cancel(task: Optional[asyncio.Task]):
+    """Cancel a speculative task and wait until it has stopped."""
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except (asyncio.CancelledError, Exception):
+        # Its result is no longer wanted, and neither is its error
+        pass
+
+
+def emit_step(emit: Emit, text: str):
+    if emit is not None:
+        emit(AgentEvent("step", text))
+
+
+def _llm_cache_entry(chain, inputs: dict):
+    """
+    (cache, prompt, llm_string) under which `chain.ainvoke(inputs)` caches
+    its completion, for a `prompt | llm` chain whose LLM has a response
+    cache; None otherwise.
+    """
+    steps = getattr(chain, "steps", None)
+    if not steps or len(steps) != 2:
+        return None
+    prompt, llm = steps
+    cache = getattr(llm, "cache", None)
+    if cache is None or isinstance(cache, bool):
+        return None
+    # Same key as BaseLLM.agenerate: its parameters with stop=None, sorted
+    params = llm._dict_for_compat()
+    params["stop"] = None
+    return cache, prompt.invoke(inputs).to_string(), str(sorted(params.items()))
+
+
+async def ainvoke_llm(chain, inputs: dict, emit: Emit = None, step: str = "") -> str:
+    """
+    `chain.ainvoke(inputs)`, or with `emit`, stream the completion as "token"
+    events (plus its "ttft") and return the joined text. LangChain's astream
+    bypasses the LLM's response cache, so streamed completions are looked up
+    and stored here, under the key ainvoke uses; a cached one is emitted as
+    a single token.
+    """
+    if emit is None:
+        return await chain.ainvoke(inputs)
+    start = time.perf_counter()
+    entry = _llm_cache_entry(chain, inputs)
+    if entry is not None:
+        cache, prompt, llm_string = entry
+        cached = await to_thread(cache.lookup, prompt, llm_string)
+        if cached:
+            emit(AgentEvent("ttft", step, round(time.perf_counter() - start, 3)))
+            emit(AgentEvent("token", cached[0].text))
+            return cached[0].text
+    parts = []
+    async for token in chain.astream(inputs):
+        if not parts:
+            emit(AgentEvent("ttft", step, round(time.perf_counter() - start, 3)))
+        parts.append(token)
+        emit(AgentEvent("token", token))
+    text = "".join(parts)
+    if entry is not None:
+        from langchain_core.outputs import Generation
+
+        await to_thread(cache.update, prompt, llm_string, [Generation(text=text)])
+    return text
+
+
+class _Failed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def stream_events(run: Callable[[Callable[[AgentEvent], None]], Awaitable[T]]) -> Iterator[AgentEvent]:
+    """
+    Run `run(emit)` in a background thread and yield its events as they
+    happen, ending with a "done" event carrying its result. Errors are
+    re-raised in the consumer. The run is not cancelled if the consumer
+    stops early; it finishes in the background.
+    """
+    events: "queue.Queue" = queue.Queue()
+
+    def _worker():
+        try:
+            result = run_sync(run(events.put))
+        except BaseException as exc:
+            events.put(_Failed(exc))
+        else:
+            events.put(AgentEvent("done", data=result))
+
+    context = contextvars.copy_context()
+    threading.Thread(
+        target=context.run, args=(_worker,), name="agent-stream", daemon=True
+    ).start()
+    while True:
+        event = events.get()
+        if isinstance(event, _Failed):
+            raise event.exc
+        yield event
+        if event.kind == "done":
+            return
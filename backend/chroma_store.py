@@ -0,0 +1,102 @@
+# backend/chroma_store.py
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.documents import Document
+
+from .config import CHROMA_COLLECTION, CHROMA_DIR
+from .vector_backend import SearchResults, VectorBackend, VectorIndex
+
+_client_lock = threading.Lock()
+_clients: Dict[Path, object] = {}
+
+
+def _get_client(path: Path = CHROMA_DIR):
+    """One persistent Chroma client per directory and process, shared by every collection."""
+    with _client_lock:
+        client = _clients.get(path)
+        if client is None:
+            import chromadb
+
+            client = chromadb.PersistentClient(path=str(path))
+            _clients[path] = client
+        return client
+
+
+def collection_name(doc_id: str) -> str:
+    # vector_store builds each index under "<doc_id>-<build>"; names are capped at 63 chars
+    doc_id, _, build = doc_id.partition("-")
+    return f"{CHROMA_COLLECTION}_{doc_id[:24]}" + (f"_{build}" if build else "")
+
+
+class ChromaIndex(VectorIndex):
+    def __init__(self, collection, client):
+        self._collection = collection
+        self._max_batch = client.get_max_batch_size()
+
+    def add(self, ids: Sequence[str], chunks: Sequence[Document], vectors) -> None:
+        for start in range(0, len(chunks), self._max_batch):
+            end = start + self._max_batch
+            self._collection.upsert(
+                ids=list(ids[start:end]),
+                embeddings=vectors[start:end],
+                documents=[c.page_content for c in chunks[start:end]],
+                metadatas=[c.metadata for c in chunks[start:end]],
+            )
+
+    def search(self, query_vector, k: int, where: Optional[dict] = None) -> SearchResults:
+        result = self._collection.query(
+            query_embeddings=[query_vector],
+            n_results=k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            # cosine space: distance = 1 - similarity
+            (Document(page_content=text, metadata=metadata or {}), 1.0 - distance)
+            for text, metadata, distance in zip(
+                result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    def get(self, ids: Sequence[str]) -> List[Document]:
+        result = self._collection.get(ids=list(ids), include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(
+                result["ids"], result["documents"], result["metadatas"]
+            )
+        }
+        return [by_id[i] for i in ids if i in by_id]
+
+    def count(self) -> int:
+        return self._collection.count()
+
+
+class ChromaBackend(VectorBackend):
+    """Chroma collections (SQLite + HNSW), one per document."""
+
+    name = "chroma"
+
+    def __init__(self, path: Path = CHROMA_DIR):
+        self.path = path
+
+    def create(self, doc_id: str) -> ChromaIndex:
+        self.drop(doc_id)
+        client = _get_client(self.path)
+        collection = client.create_collection(
+            collection_name(doc_id), metadata={"hnsw:space": "cosine"}
+        )
+        return ChromaIndex(collection, client)
+
+    def open(self, doc_id: str) -> ChromaIndex:
+        client = _get_client(self.path)
+        return ChromaIndex(client.get_collection(collection_name(doc_id)), client)
+
+    def drop(self, doc_id: str) -> None:
+        try:
+            _get_client(self.path).delete_collection(collection_name(doc_id))
+        except Exception:
+            # Collection did not exist
+            pass
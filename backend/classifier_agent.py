@@ -1,7 +1,83 @@
 # backend/classifier_agent.py
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from .llm_provider import get_llm
 
+from .async_runtime import run_sync, to_thread
+from .config import CLASSIFY_MIN_CONFIDENCE, CLASSIFY_SAMPLE_CHUNKS, EMBEDDING_MODEL
+from .context_packer import render_context
+from .embedding_cache import get_embedding_cache
+from .llm_provider import get_embeddings, get_llm
+from .tracing import annotate, traced
+
+logger = logging.getLogger(__name__)
+
+# The LLM fallback reads this much of the document
+CLASSIFY_INPUT_CHARS = 4000
+
+# Canonical labels, as used by the summarizer prompts
+DOCUMENT_TYPES = (
+    "Research Paper",
+    "Novel / Literature",
+    "Study Material / Notes",
+    "Technical Documentation",
+    "Business Report",
+)
+DEFAULT_DOCUMENT_TYPE = "Study Material / Notes"
+
+# Typical passages of each type; their embeddings are the type prototypes
+TYPE_PROTOTYPES: Dict[str, Tuple[str, ...]] = {
+    "Research Paper": (
+        "Abstract. We propose a novel method and evaluate it on benchmark datasets.",
+        "Our experiments show the proposed approach outperforms the baselines.",
+        "Related work. Prior studies have examined this problem [12, 15].",
+        "We report mean accuracy and standard deviation over five runs; p < 0.05.",
+        "Limitations and future work. The dataset is small and the results may not generalize.",
+    ),
+    "Novel / Literature": (
+        "She walked slowly down the lane, remembering the night her father left.",
+        "\"I never wanted this,\" he whispered, turning away from the window.",
+        "Chapter Seven. The rain had not stopped for three days when the stranger arrived.",
+        "Her heart pounded as the door creaked open and the candle flickered out.",
+        "The old man smiled at the children and told them the story of the war.",
+    ),
+    "Study Material / Notes": (
+        "Definition: a function is continuous if small changes in input give small changes in output.",
+        "Key concepts to remember for the exam: photosynthesis, respiration and osmosis.",
+        "Example 3. Solve for x using the quadratic formula.",
+        "Lecture 4 notes: summary of the main theorems and practice exercises.",
+        "Exercise: explain the difference between mitosis and meiosis in your own words.",
+    ),
+    "Technical Documentation": (
+        "To install the package, run pip install and set the API key in the configuration file.",
+        "The endpoint returns a JSON object with the following fields.",
+        "Parameters: timeout (int) - number of seconds to wait before the request fails.",
+        "The system architecture consists of a frontend, a REST API and a database service.",
+        "Troubleshooting: if the service does not start, check the log files and port settings.",
+    ),
+    "Business Report": (
+        "Revenue grew 12% year over year, driven by strong sales in the European market.",
+        "Executive summary: key performance indicators, risks and strategic priorities for next quarter.",
+        "The board approved the budget and recommended cost reductions in operations.",
+        "Market share, customer acquisition cost and quarterly earnings compared to forecast.",
+        "Action items: expand the sales team, renegotiate supplier contracts, review pricing.",
+    ),
+}
+
+# Words that identify a type in a free-form LLM answer
+_TYPE_KEYWORDS = (
+    ("Research Paper", re.compile(r"research|paper|article|study\b|scientific|academic", re.I)),
+    ("Novel / Literature", re.compile(r"novel|literature|fiction|story|poem|literary", re.I)),
+    ("Study Material / Notes", re.compile(r"study|notes|lecture|textbook|course|tutorial", re.I)),
+    ("Technical Documentation", re.compile(r"technical|documentation|manual|api|guide|spec", re.I)),
+    ("Business Report", re.compile(r"business|report|financial|annual|corporate", re.I)),
+)
 
 CLASSIFICATION_SYSTEM_PROMPT = """
 You are a document classifier. Given the text of a PDF (or a large sample),
@@ -15,7 +91,95 @@ classify it into exactly one of the following types:
 Answer ONLY with the type.
 """
 
-def classify_document(sample_text: str) -> str:
+
+@dataclass
+class Classification:
+    doc_type: str
+    # Share of the sampled chunks that voted for the embedding classifier's pick
+    confidence: float
+    # "embedding", or "llm" when the LLM decided
+    method: str
+
+
+def canonical_type(raw: str, default: str = DEFAULT_DOCUMENT_TYPE) -> str:
+    """Map a free-form type name (e.g. an LLM answer) to one of DOCUMENT_TYPES."""
+    text = raw.strip().strip(".\"'*").lower()
+    for doc_type in DOCUMENT_TYPES:
+        if doc_type.lower() in text:
+            return doc_type
+    for doc_type, keywords in _TYPE_KEYWORDS:
+        if keywords.search(text):
+            return doc_type
+    return default
+
+
+_prototypes: Dict[str, np.ndarray] = {}
+_prototypes_lock = threading.Lock()
+
+
+def _prototype_matrix(model_name: str = EMBEDDING_MODEL) -> np.ndarray:
+    """One unit vector per type (centroid of its example passages), in DOCUMENT_TYPES order."""
+    with _prototypes_lock:
+        matrix = _prototypes.get(model_name)
+        if matrix is None:
+            texts = [t for doc_type in DOCUMENT_TYPES for t in TYPE_PROTOTYPES[doc_type]]
+            embed = get_embeddings().embed_documents
+            vectors = get_embedding_cache(model_name).embed(texts, embed)
+            rows, start = [], 0
+            for doc_type in DOCUMENT_TYPES:
+                end = start + len(TYPE_PROTOTYPES[doc_type])
+                rows.append(_unit(_unit(vectors[start:end]).mean(axis=0)))
+                start = end
+            matrix = _prototypes[model_name] = np.stack(rows)
+        return matrix
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _spread(count: int, limit: int) -> np.ndarray:
+    """Up to `limit` indices spread evenly over range(count)."""
+    if count <= limit:
+        return np.arange(count)
+    return np.linspace(0, count - 1, limit).round().astype(int)
+
+
+def classify_by_embedding(
+    vectors: np.ndarray, sample_size: int = CLASSIFY_SAMPLE_CHUNKS
+) -> Optional[Classification]:
+    """
+    Classify a document from its chunk embeddings: each chunk sampled
+    across the whole document votes for its nearest type prototype.
+    Confidence is the winner's share of the votes. None without vectors.
+    """
+    if vectors is None or len(vectors) == 0:
+        return None
+    sample = _unit(vectors[_spread(len(vectors), sample_size)])
+    similarity = sample @ _prototype_matrix().T
+    votes = np.bincount(similarity.argmax(axis=1), minlength=len(DOCUMENT_TYPES))
+    # Ties go to the type closest on average
+    best = max(range(len(DOCUMENT_TYPES)), key=lambda i: (votes[i], similarity[:, i].mean()))
+    confidence = round(float(votes[best] / len(sample)), 3)
+    return Classification(DOCUMENT_TYPES[best], confidence, "embedding")
+
+
+def sample_passages(passages: Sequence[Document], max_chars: int = CLASSIFY_INPUT_CHARS) -> str:
+    """Passages spread over the whole document, up to `max_chars` of text."""
+    if not passages:
+        return ""
+    picked = [passages[i] for i in _spread(len(passages), 8)]
+    per_passage = max_chars // len(picked)
+    trimmed = [
+        Document(page_content=p.page_content[:per_passage], metadata=p.metadata) for p in picked
+    ]
+    return render_context(trimmed)[:max_chars]
+
+
+async def aclassify_document(sample_text: str, default: str = DEFAULT_DOCUMENT_TYPE) -> str:
+    """Ask the LLM for the type of a text sample; returns a canonical label (or `default`)."""
     llm = get_llm()
     prompt = ChatPromptTemplate.from_messages(
         [
@@ -24,5 +188,37 @@ def classify_document(sample_text: str) -> str:
         ]
     )
     chain = prompt | llm
-    result = chain.invoke({"sample": sample_text[:4000]})
-    return result.strip()
+    result = await chain.ainvoke({"sample": sample_text[:CLASSIFY_INPUT_CHARS]})
+    return canonical_type(result, default)
+
+
+def classify_document(sample_text: str) -> str:
+    return run_sync(aclassify_document(sample_text))
+
+
+@traced("classify")
+async def aclassify_ingested(
+    vectors: np.ndarray,
+    passages: Sequence[Document],
+    min_confidence: float = CLASSIFY_MIN_CONFIDENCE,
+) -> Classification:
+    """
+    Classify a document from the chunk embeddings computed during ingestion;
+    only when that is not confident enough, ask the LLM about passages
+    sampled across the document.
+    """
+    local = await to_thread(classify_by_embedding, vectors)
+    if local is not None:
+        annotate(embedding_type=local.doc_type, confidence=local.confidence)
+    if local is not None and local.confidence >= min_confidence:
+        logger.info("Classified as %s (%.0f%% of chunks)", local.doc_type, 100 * local.confidence)
+        return local
+    logger.info(
+        "Embedding classifier unsure (%s); asking the LLM",
+        "no vectors" if local is None else f"{local.doc_type} at {local.confidence:.2f}",
+    )
+    if local is None:
+        doc_type = await aclassify_document(sample_passages(passages))
+        return Classification(doc_type, 0.0, "llm")
+    doc_type = await aclassify_document(sample_passages(passages), local.doc_type)
+    return Classification(doc_type, local.confidence, "llm")
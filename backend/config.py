@@ -3,22 +3,202 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+load_dotenv()
+
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATA_DIR = BASE_DIR / "data"
+# Everything the app stores (indexes, caches, traces); benchmarks point it elsewhere
+DATA_DIR = Path(os.getenv("DATA_DIR", str(BASE_DIR / "data")))
 UPLOAD_DIR = DATA_DIR / "uploads"
 CHROMA_DIR = DATA_DIR / "chroma_store"
+INGEST_CACHE_DIR = DATA_DIR / "ingest_cache"
+EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
+NUMPY_STORE_DIR = DATA_DIR / "numpy_store"
+LEXICAL_INDEX_DIR = DATA_DIR / "lexical_index"
+PARENT_STORE_DIR = DATA_DIR / "parent_chunks"
+SUMMARY_INDEX_DIR = DATA_DIR / "summary_index"
+SUMMARY_CACHE_DIR = DATA_DIR / "summary_cache"
+QUIZ_BANK_DIR = DATA_DIR / "quiz_bank"
+TRACE_DIR = DATA_DIR / "traces"
 CHROMA_COLLECTION = "insightpdf_docs"
 
+_DATA_DIRS = (
+    UPLOAD_DIR,
+    CHROMA_DIR,
+    INGEST_CACHE_DIR,
+    EMBEDDING_CACHE_DIR,
+    NUMPY_STORE_DIR,
+    LEXICAL_INDEX_DIR,
+    PARENT_STORE_DIR,
+    SUMMARY_INDEX_DIR,
+    SUMMARY_CACHE_DIR,
+    QUIZ_BANK_DIR,
+    TRACE_DIR,
+)
+_data_dirs_ready = False
 
 
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-CHROMA_DIR.mkdir(parents=True, exist_ok=True)
-
-load_dotenv()
+def ensure_data_dirs():
+    """Create the data directories. Called before the first write, not on import."""
+    global _data_dirs_ready
+    if not _data_dirs_ready:
+        for directory in _DATA_DIRS:
+            directory.mkdir(parents=True, exist_ok=True)
+        _data_dirs_ready = True
 
 # LLM / embeddings config
 OLLAMA_LLM_MODEL = os.getenv("OLLAMA_LLM_MODEL", "llama3")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# "ollama", or "fake": a deterministic local stand-in that answers from the
+# prompt's context after FAKE_LLM_LATENCY_MS, at FAKE_LLM_TOKENS_PER_SECOND
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "ollama")
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "50"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "200"))
+FAKE_LLM_MAX_TOKENS = int(os.getenv("FAKE_LLM_MAX_TOKENS", "128"))
+# "huggingface", or "hash": feature-hashed bag-of-words vectors, no model
+# download. Its vectors are cached and indexed under their own model name.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "huggingface")
+HASH_EMBEDDING_DIM = int(os.getenv("HASH_EMBEDDING_DIM", "384"))
+if EMBEDDING_PROVIDER == "hash":
+    EMBEDDING_MODEL = f"hash-{HASH_EMBEDDING_DIM}"
+# How long the Ollama server keeps the model resident between requests
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Load models when the app starts instead of on the first request
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "1") == "1"
+
+# Chunking config (part of the ingestion cache key). CHUNK_SIZE/OVERLAP are
+# the parent passages sent to the LLM; the embedded child chunks are sized to
+# the embedder's input limit unless CHILD_CHUNK_SIZE is set.
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "4000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "600"))
+CHILD_CHUNK_SIZE = int(os.getenv("CHILD_CHUNK_SIZE", "0"))
+CHILD_CHUNK_OVERLAP_RATIO = float(os.getenv("CHILD_CHUNK_OVERLAP_RATIO", "0.15"))
+# Embedder input limit in tokens; 0 = ask the loaded model
+EMBEDDING_MAX_TOKENS = int(os.getenv("EMBEDDING_MAX_TOKENS", "0"))
+
+# Incremental re-indexing: a PDF declared a revision of an ingested one
+# (the app does so for a re-upload under the same name in one session) is
+# diffed against it page by page; only changed pages are chunked and
+# embedded, unchanged sections keep their summaries
+INCREMENTAL_INGEST = os.getenv("INCREMENTAL_INGEST", "1") == "1"
+
+# Caps on the on-disk caches (0 = none); least recently used entries are
+# deleted first. A document whose ingestion was deleted can no longer be
+# restored once its index is evicted too, and has to be uploaded again.
+INGEST_CACHE_MAX_MB = int(os.getenv("INGEST_CACHE_MAX_MB", "4096"))
+EMBEDDING_CACHE_MAX_ROWS = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "1000000"))
+SUMMARY_CACHE_MAX_MB = int(os.getenv("SUMMARY_CACHE_MAX_MB", "256"))
+QUIZ_BANK_MAX_MB = int(os.getenv("QUIZ_BANK_MAX_MB", "64"))
+
+# PDF extraction: page ranges of this size are parsed in a process pool
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+# Ingestion pipeline: embedding micro-batches, vector write batches and the
+# capacity (in batches) of the queues between stages
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "256"))
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# LLM context: retrieved chunks are packed into this many prompt tokens
+# (estimated at CHARS_PER_TOKEN), picked by MMR with this relevance weight
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+CHARS_PER_TOKEN = int(os.getenv("CHARS_PER_TOKEN", "4"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Candidates retrieved per chunk that fits in the budget
+RETRIEVAL_OVERSAMPLE = int(os.getenv("RETRIEVAL_OVERSAMPLE", "3"))
 
 # Chroma config
 CHROMA_COLLECTION = os.getenv("CHROMA_COLLECTION", "insightpdf_docs")
+# Vector backend: "numpy" (in-process exact search over a memory-mapped
+# matrix, fastest for single-document working sets) or "chroma"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "numpy")
+# Compact codes the numpy backend scans before re-scoring the best
+# candidates against the float32 vectors on disk: "none" (exact search),
+# "int8" (per-row scalar codes, 4x smaller) or "binary" (sign bits, 32x
+# smaller). Applies to newly built indexes. This saves memory, not time:
+# int8 scans are no faster than exact search, binary ones only from tens
+# of thousands of rows.
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
+# Candidates re-scored per requested hit. Re-scoring reads only those rows,
+# so a generous pool is cheap; binary codes need it (recall@10 ~0.72 at 8,
+# ~0.88 at 16, ~0.99 at 32).
+QUANTIZED_RESCORE_FACTOR = int(os.getenv("QUANTIZED_RESCORE_FACTOR", "32"))
+# Hybrid retrieval: BM25 over the same chunks, fused with dense hits by
+# reciprocal rank fusion (score = sum 1 / (RRF_K + rank))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+RRF_K = int(os.getenv("RRF_K", "60"))
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Each document gets its own index; least recently used ones are
+# evicted beyond this many (they are restored from the ingestion cache).
+MAX_CACHED_COLLECTIONS = int(os.getenv("MAX_CACHED_COLLECTIONS", "20"))
+
+# Semantic answer cache (chat path): a question whose embedding is at least
+# this similar to an earlier one about the same document gets its answer
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.93"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Per document; least recently used answers are dropped beyond this
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "256"))
+
+# Exact-match LLM response cache (model + generation params + rendered
+# prompt), on disk and shared by all agents. LLM_CACHE_ENABLED=0 bypasses it.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(DATA_DIR / "llm_cache.sqlite")))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Fast path: skip the LLM router/rewriter/grader when local signals decide.
+# Questions with at least FAST_REWRITE_MIN_WORDS words and no pronouns are
+# not rewritten; answers are graded GOOD without the LLM when the best dense
+# hit scores FAST_GRADE_MIN_SCORE (cosine) and that share of their content
+# words occurs in the context.
+FAST_PATH = os.getenv("FAST_PATH", "1") == "1"
+FAST_REWRITE_MIN_WORDS = int(os.getenv("FAST_REWRITE_MIN_WORDS", "6"))
+FAST_GRADE_MIN_SCORE = float(os.getenv("FAST_GRADE_MIN_SCORE", "0.45"))
+FAST_GRADE_MIN_GROUNDING = float(os.getenv("FAST_GRADE_MIN_GROUNDING", "0.6"))
+
+# Start refining the query (and retrieving for it) while the LLM grader is
+# still running; the speculative work is cancelled when the grade is GOOD
+SPECULATIVE_REFINE = os.getenv("SPECULATIVE_REFINE", "1") == "1"
+
+# Document classifier: CLASSIFY_SAMPLE_CHUNKS chunk embeddings sampled across
+# the document vote for the nearest type prototype; the LLM is asked only
+# when the winner gets less than CLASSIFY_MIN_CONFIDENCE of the votes
+CLASSIFY_SAMPLE_CHUNKS = int(os.getenv("CLASSIFY_SAMPLE_CHUNKS", "64"))
+CLASSIFY_MIN_CONFIDENCE = float(os.getenv("CLASSIFY_MIN_CONFIDENCE", "0.5"))
+
+# Summaries of long documents are map-reduced: sections of about this many
+# characters are summarized in parallel (at most SUMMARY_MAX_CONCURRENCY LLM
+# calls at a time), then merged. Partial summaries are cached by content.
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "12000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+
+# Show agent timings (time to first token, per-call TTFT) in the app
+DEBUG_UI = os.getenv("DEBUG_UI", "0") == "1"
+
+# Quiz bank: after ingestion a background job writes questions for
+# QUIZ_BANK_SECTIONS sections sampled across the document; "quiz" serves
+# QUIZ_SIZE of them at once and refills the bank when it runs low
+QUIZ_BANK_ENABLED = os.getenv("QUIZ_BANK_ENABLED", "1") == "1"
+QUIZ_BANK_SECTIONS = int(os.getenv("QUIZ_BANK_SECTIONS", "6"))
+QUIZ_BANK_CONCURRENCY = int(os.getenv("QUIZ_BANK_CONCURRENCY", "2"))
+QUIZ_SIZE = int(os.getenv("QUIZ_SIZE", "9"))
+
+# Tracing: every upload, question and quiz is traced as nested spans (stages,
+# batches, searches, agent steps, LLM calls). The last TRACE_KEEP traces stay
+# in memory for the debug panel; with TRACE_EXPORT they are also appended to
+# TRACE_DIR/traces-YYYYMMDD.jsonl, one span per line
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "1") == "1"
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", "50"))
+
+# HTTP service (api/): uploads are ingested by API_INGEST_WORKERS background
+# workers with at most API_MAX_QUEUED_JOBS waiting (more are refused with
+# 429); at most API_QUERY_CONCURRENCY ask/quiz requests run at once. The
+# last API_JOB_HISTORY jobs can be polled.
+API_INGEST_WORKERS = int(os.getenv("API_INGEST_WORKERS", "2"))
+API_MAX_QUEUED_JOBS = int(os.getenv("API_MAX_QUEUED_JOBS", "16"))
+API_QUERY_CONCURRENCY = int(os.getenv("API_QUERY_CONCURRENCY", "4"))
+API_JOB_HISTORY = int(os.getenv("API_JOB_HISTORY", "200"))
+# When set (e.g. http://localhost:8000), the Streamlit app is a client of
+# that service instead of running the backend in-process
+API_URL = os.getenv("API_URL", "")
@@ -0,0 +1,166 @@
+# backend/context_packer.py
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import (
+    CHARS_PER_TOKEN,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CONTEXT_TOKEN_BUDGET,
+    MMR_LAMBDA,
+    RETRIEVAL_OVERSAMPLE,
+)
+from .embedding_cache import get_embedding_cache
+from .llm_provider import get_embeddings
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP = 16
+# Retrieval scores a parent passage inherits from the chunk that selected it
+_SCORE_KEYS = ("score", "rrf_score", "bm25_score")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round-trip); ~4 characters per token."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def candidate_count(budget_tokens: int = CONTEXT_TOKEN_BUDGET, chunk_size: int = CHUNK_SIZE) -> int:
+    """How many chunks to retrieve so MMR has a choice but nothing is fetched for nothing."""
+    chunk_tokens = max(1, (chunk_size - CHUNK_OVERLAP) // CHARS_PER_TOKEN)
+    fits = max(1, math.ceil(budget_tokens / chunk_tokens))
+    return max(4, fits * RETRIEVAL_OVERSAMPLE)
+
+
+def strip_overlap(previous: str, text: str, max_overlap: int = CHUNK_OVERLAP) -> Tuple[str, bool]:
+    """
+    Remove the prefix of `text` that repeats the end of `previous` (the
+    splitter's chunk overlap). Returns (remaining text, whether anything was cut).
+    """
+    window = previous[-(max_overlap + 1):] if max_overlap else ""
+    probe = text[:_MIN_OVERLAP]
+    if len(probe) < _MIN_OVERLAP:
+        return text, False
+    start = window.find(probe)
+    while start != -1:
+        # The earliest match is the longest overlap
+        tail = window[start:]
+        if text.startswith(tail):
+            return text[len(tail):], True
+        start = window.find(probe, start + 1)
+    return text, False
+
+
+def _chunk_id(doc: Document) -> str:
+    # Indexed chunks have a chunk_id; parent passages only their parent_id
+    return str(doc.metadata.get("chunk_id") or doc.metadata.get("parent_id", ""))
+
+
+def _chunk_position(doc: Document) -> Tuple[str, int]:
+    number = _chunk_id(doc).rsplit("-", 1)[-1]
+    return str(doc.metadata.get("source", "")), int(number) if number.isdigit() else -1
+
+
+def render_context(docs: Sequence[Document]) -> str:
+    """Join chunks in document order, merging adjacent chunks without their overlap."""
+    ordered = sorted(docs, key=_chunk_position)
+    parts: List[str] = []
+    previous: Optional[Document] = None
+    for doc in ordered:
+        text = doc.page_content
+        if previous is not None:
+            prev_source, prev_number = _chunk_position(previous)
+            source, number = _chunk_position(doc)
+            if source == prev_source and number == prev_number + 1:
+                text, merged = strip_overlap(previous.page_content, text)
+                if merged:
+                    parts.append(text)
+                    previous = doc
+                    continue
+            parts.append("\n\n")
+        parts.append(text)
+        previous = doc
+    return "".join(parts)
+
+
+def mmr_order(relevance: np.ndarray, vectors: np.ndarray, lambda_: float = MMR_LAMBDA) -> List[int]:
+    """Rank all candidates by maximal marginal relevance (relevance vs. redundancy)."""
+    if not len(vectors):
+        return []
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+    pairwise = vectors @ vectors.T
+
+    order: List[int] = []
+    remaining = np.ones(len(vectors), dtype=bool)
+    max_similarity = np.full(len(vectors), -np.inf)
+    for _ in range(len(vectors)):
+        redundancy = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        remaining[best] = False
+        max_similarity = np.maximum(max_similarity, pairwise[best])
+    return order
+
+
+def pack_context(
+    query: str,
+    docs: Sequence[Document],
+    budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+    parents: Optional[Dict[str, Document]] = None,
+) -> Tuple[str, List[Document]]:
+    """
+    Choose chunks by MMR and fill the token budget with them, most useful
+    first. Overlapping spans between adjacent chunks are counted (and sent)
+    once. With `parents` (parent_id -> passage), each picked chunk is
+    replaced by its parent passage. Returns the context string and the
+    chunks/passages it contains.
+    """
+    if not docs:
+        return "", []
+
+    embeddings = get_embeddings()
+    # Indexed chunks are in the embedding cache, so this is a lookup, not a model call
+    vectors = get_embedding_cache().embed([d.page_content for d in docs], embeddings.embed_documents)
+    if all("rrf_score" in d.metadata for d in docs):
+        # Hybrid hits: keep the fused ranking, which also reflects BM25 matches
+        # (min-max scaled: raw RRF scores sit in a narrow band near 1/RRF_K)
+        relevance = np.asarray([d.metadata["rrf_score"] for d in docs], dtype=np.float32)
+        spread = float(relevance.max() - relevance.min())
+        relevance = (relevance - relevance.min()) / spread if spread else np.ones_like(relevance)
+    else:
+        query_vector = np.asarray(embeddings.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        norms = np.linalg.norm(vectors, axis=1)
+        relevance = (vectors @ query_vector) / np.maximum(norms, 1e-12)
+    order = mmr_order(relevance, vectors)
+
+    def _expand(doc: Document) -> Document:
+        parent = parents.get(doc.metadata.get("parent_id")) if parents else None
+        if parent is None:
+            return doc
+        # A copy: the parent is shared, the retrieval scores are this query's
+        scores = {k: doc.metadata[k] for k in _SCORE_KEYS if k in doc.metadata}
+        return Document(page_content=parent.page_content, metadata={**parent.metadata, **scores})
+
+    selected: List[Document] = []
+    seen = set()
+    for i in order:
+        doc = _expand(docs[i])
+        if _chunk_id(doc) in seen:
+            continue
+        trial = selected + [doc]
+        if estimate_tokens(render_context(trial)) <= budget_tokens:
+            selected = trial
+            seen.add(_chunk_id(doc))
+
+    if not selected:
+        # Even the best passage is over budget: send as much of it as fits
+        best = _expand(docs[order[0]])
+        text = best.page_content[: budget_tokens * CHARS_PER_TOKEN]
+        return text, [best]
+    return render_context(selected), selected
@@ -0,0 +1,56 @@
+# backend/disk_lru.py
+import os
+import shutil
+from pathlib import Path
+from typing import Container, Iterable
+
+# Size caps for the on-disk caches. An entry (a file or a directory) is as
+# recent as its mtime: readers touch() it, and prune() deletes the least
+# recently used entries first.
+
+
+def touch(path: Path):
+    """Mark a cache entry as just used."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def entry_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+def prune(entries: Iterable[Path], max_bytes: int, keep: Container[str] = ()) -> int:
+    """
+    Delete least recently used entries until the others fit in `max_bytes`
+    (0 = no cap). Entries named in `keep` are never deleted. Returns the
+    number of bytes freed.
+    """
+    if max_bytes <= 0:
+        return 0
+    sized = []
+    for path in entries:
+        try:
+            sized.append((path.stat().st_mtime, entry_size(path), path))
+        except OSError:
+            # Deleted by a concurrent prune
+            continue
+    total = sum(size for _, size, _ in sized)
+    freed = 0
+    for _, size, path in sorted(sized, key=lambda e: e[0]):
+        if total - freed <= max_bytes:
+            break
+        if path.name in keep:
+            continue
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+        freed += size
+    return freed
@@ -0,0 +1,245 @@
+# backend/embedding_cache.py
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import (
+    EMBED_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_ROWS,
+    EMBEDDING_MODEL,
+)
+from .file_lock import FileLock
+from .tracing import count
+
+DIGEST_SIZE = 16
+# Rows copied at a time when the cache is compacted
+_COMPACT_BLOCK = 65536
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace-insensitive form, so re-flowed copies of a passage share an entry."""
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=DIGEST_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache for one model.
+
+    Layout (append-only, one row per distinct chunk text):
+    - vectors.f32: float32 matrix, memory-mapped for reads
+    - keys.bin:    16-byte text digests, row i of keys.bin is row i of vectors.f32
+    - meta.json:   model name and dimension
+
+    Vectors are appended before their keys, so a crash can leave at most an
+    orphan vector row, never a key pointing at missing data.
+
+    Several processes can share the directory: reads and appends hold an
+    inter-process lock, under which each process first catches up with the
+    rows the others appended, so a new row's index always matches its
+    position in the files.
+
+    Beyond `max_rows` rows, the files are rewritten with the most recently
+    used three quarters of them.
+    """
+
+    def __init__(self, model_name: str, directory: Path, max_rows: int = EMBEDDING_CACHE_MAX_ROWS):
+        self.model_name = model_name
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self._vectors_path = directory / "vectors.f32"
+        self._keys_path = directory / "keys.bin"
+        self._meta_path = directory / "meta.json"
+        self._lock = FileLock(directory / "lock")
+        # digest -> row, least recently used first
+        self._rows: Dict[bytes, int] = {}
+        # Inode of the keys.bin the rows were read from (replaced by compaction)
+        self._keys_inode: Optional[int] = None
+        self._dim: Optional[int] = None
+        self._mm: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._sync()
+            self._repair()
+
+    def _repair(self):
+        """Drop rows half-written by an interrupted append. Lock held."""
+        if self._dim is None or not self._vectors_path.exists():
+            return
+        vector_rows = self._vectors_path.stat().st_size // (4 * self._dim)
+        if vector_rows < len(self._rows):
+            # Keys without vectors (e.g. the disk filled up): keep the complete rows
+            self._rows = dict(list(self._rows.items())[:vector_rows])
+            with open(self._keys_path, "r+b") as f:
+                f.truncate(vector_rows * DIGEST_SIZE)
+        self._truncate_vectors()
+
+    def _sync(self):
+        """Catch up with rows appended (or a compaction done) by another process. Lock held."""
+        if self._dim is None:
+            try:
+                with open(self._meta_path, encoding="utf-8") as f:
+                    self._dim = json.load(f)["dim"]
+            except (OSError, ValueError, KeyError):
+                return
+        try:
+            stat = os.stat(self._keys_path)
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self._keys_inode or stat.st_size // DIGEST_SIZE < len(self._rows):
+            self._rows, self._mm = {}, None
+            self._keys_inode = stat.st_ino
+        known = len(self._rows)
+        if stat.st_size // DIGEST_SIZE <= known:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(known * DIGEST_SIZE)
+            keys = f.read((stat.st_size // DIGEST_SIZE - known) * DIGEST_SIZE)
+        for row in range(len(keys) // DIGEST_SIZE):
+            self._rows[keys[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE]] = known + row
+
+    def _truncate_vectors(self):
+        """Cut vectors.f32 back to the keyed rows. Lock held."""
+        if self._dim is None or not self._vectors_path.exists():
+            return
+        size = len(self._rows) * 4 * self._dim
+        if self._vectors_path.stat().st_size != size:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _matrix(self) -> np.memmap:
+        # Re-map only when rows were appended since the last mapping
+        if self._mm is None or self._mm.shape[0] < len(self._rows):
+            self._mm = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self._dim)
+            )
+        return self._mm
+
+    def lookup(self, digests: Sequence[bytes]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Rows for the cached digests (in input order) and the positions that missed.
+        The returned matrix has zeros in the missing rows.
+        """
+        with self._lock:
+            self._sync()
+            # Re-inserting a hit moves it to the most recently used end
+            rows = [self._rows.pop(d, None) for d in digests]
+            for d, r in zip(digests, rows):
+                if r is not None:
+                    self._rows[d] = r
+            missing = [i for i, r in enumerate(rows) if r is None]
+            self.hits += len(digests) - len(missing)
+            self.misses += len(missing)
+            if self._dim is None:
+                return None, missing
+            out = np.zeros((len(digests), self._dim), dtype=np.float32)
+            hit_positions = [i for i, r in enumerate(rows) if r is not None]
+            if hit_positions:
+                # One vectorized gather from the memory map
+                out[hit_positions] = self._matrix()[[rows[i] for i in hit_positions]]
+            return out, missing
+
+    def add(self, digests: Sequence[bytes], vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._sync()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": self._dim}, f)
+            new = [(d, v) for d, v in zip(digests, vectors) if d not in self._rows]
+            # Duplicates inside one batch are stored once
+            seen = set()
+            new = [(d, v) for d, v in new if not (d in seen or seen.add(d))]
+            if not new:
+                return
+            # New rows go right after the keyed ones, whatever another
+            # process's interrupted append left behind
+            self._truncate_vectors()
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.stack([v for _, v in new]).tobytes())
+            with open(self._keys_path, "ab") as f:
+                f.write(b"".join(d for d, _ in new))
+            self._keys_inode = os.stat(self._keys_path).st_ino
+            for d, _ in new:
+                self._rows[d] = len(self._rows)
+            if self.max_rows and len(self._rows) > self.max_rows:
+                self._compact(self.max_rows * 3 // 4)
+
+    def _compact(self, keep: int):
+        """Rewrite the files with only the `keep` most recently used rows. Lock held."""
+        digests = list(self._rows)[-keep:]
+        rows = [self._rows[d] for d in digests]
+        matrix = self._matrix()
+        tmp_vectors = self._vectors_path.with_suffix(".tmp")
+        tmp_keys = self._keys_path.with_suffix(".tmp")
+        with open(tmp_vectors, "wb") as f:
+            for start in range(0, len(rows), _COMPACT_BLOCK):
+                f.write(np.ascontiguousarray(matrix[rows[start:start + _COMPACT_BLOCK]]).tobytes())
+        tmp_keys.write_bytes(b"".join(digests))
+        # Emptying keys.bin first keeps the files consistent at every step:
+        # a crash in between leaves orphan vector rows (dropped on load)
+        with open(self._keys_path, "r+b") as f:
+            f.truncate(0)
+        os.replace(tmp_vectors, self._vectors_path)
+        os.replace(tmp_keys, self._keys_path)
+        self._rows = {d: row for row, d in enumerate(digests)}
+        self._keys_inode = os.stat(self._keys_path).st_ino
+        self._mm = None
+
+    def embed(
+        self,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[List[float]]],
+        batch_size: int = EMBED_BATCH_SIZE,
+    ) -> np.ndarray:
+        """Vectors for `texts`, calling `embed_fn` in batches for cache misses only."""
+        digests = [text_digest(t) for t in texts]
+        out, missing = self.lookup(digests)
+        count("embedding_cache_hits", len(texts) - len(missing))
+        count("embedding_cache_misses", len(missing))
+        if out is None and not missing:
+            return np.zeros((0, 0), dtype=np.float32)
+        if not missing:
+            return out
+
+        for start in range(0, len(missing), batch_size):
+            positions = missing[start:start + batch_size]
+            vectors = np.asarray(embed_fn([texts[i] for i in positions]), dtype=np.float32)
+            self.add([digests[i] for i in positions], vectors)
+            if out is None:
+                out = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[positions] = vectors
+        return out
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str = EMBEDDING_MODEL) -> EmbeddingCache:
+    """Process-wide cache instance per embedding model."""
+    with _caches_lock:
+        cache = _caches.get(model_name)
+        if cache is None:
+            safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+            cache = EmbeddingCache(model_name, EMBEDDING_CACHE_DIR / safe_name)
+            _caches[model_name] = cache
+        return cache
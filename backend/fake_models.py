@@ -0,0 +1,220 @@
+# backend/fake_models.py
+# Deterministic local stand-ins for the LLM and the embedder, for benchmarks
+# and offline runs (LLM_PROVIDER=fake, EMBEDDING_PROVIDER=hash). Answers are
+# extracted from the prompt's own context, so retrieval quality still shows.
+import asyncio
+import hashlib
+import json
+import re
+import time
+from functools import lru_cache
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+from .lexical_index import tokenize
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+_REFUSAL = "I don't know."
+
+
+def _human_part(prompt: str) -> str:
+    # Chat prompts are rendered as "System: ...\nHuman: ..."
+    return prompt.rsplit("Human:", 1)[-1].strip()
+
+
+def _field(text: str, label: str) -> str:
+    """The block after `label:` up to the next blank line."""
+    match = re.search(rf"{re.escape(label)}:\s*\n?(.*?)(?:\n\s*\n|$)", text, re.DOTALL)
+    return match.group(1).strip() if match else ""
+
+
+def _block(text: str, label: str) -> str:
+    """Everything after `label:` (long blocks such as the context)."""
+    _, _, rest = text.partition(f"{label}:")
+    return rest.strip()
+
+
+def _sentences(text: str) -> List[str]:
+    lines = (line.strip() for line in text.splitlines())
+    text = " ".join(line for line in lines if line and not line.startswith("[Source"))
+    return [s.strip() for s in _SENTENCE.split(text) if len(s.strip()) > 20]
+
+
+def _best_sentences(context: str, question: str, count: int) -> List[str]:
+    terms = {t for t in tokenize(question) if len(t) > 2}
+    scored = []
+    for position, sentence in enumerate(_sentences(context)):
+        overlap = len(terms & set(tokenize(sentence)))
+        if overlap:
+            scored.append((-overlap, position, sentence))
+    return [s for _, _, s in sorted(scored)[:count]]
+
+
+def _quiz_json(context: str) -> str:
+    sentences = _sentences(context)[:3] or ["The document has no text."]
+    sentences += sentences[-1:] * (3 - len(sentences))
+    questions = [
+        {
+            "type": "mcq",
+            "difficulty": "easy",
+            "question": f"Which statement appears in the section? ({sentences[0][:60]})",
+            "options": [sentences[0][:80], "None of these", "All of these", "It is not stated"],
+            "answer": sentences[0][:80],
+        },
+        {
+            "type": "true_false",
+            "difficulty": "medium",
+            "question": f"True or false: {sentences[1]}",
+            "options": [],
+            "answer": "True",
+        },
+        {
+            "type": "short_answer",
+            "difficulty": "hard",
+            "question": "What does the section state?",
+            "options": [],
+            "answer": sentences[2],
+        },
+    ]
+    return json.dumps(questions)
+
+
+def fake_response(prompt: str) -> str:
+    """What the fake LLM answers to one of the app's agent prompts."""
+    human = _human_part(prompt)
+    if "answer grading agent" in prompt:
+        answer = _block(human, "Answer")
+        return "BAD" if "don't know" in answer.lower() else "GOOD"
+    if "retrieval router agent" in prompt:
+        return "RAW"
+    if "query rewriting agent" in prompt or "query refinement agent" in prompt:
+        return _field(human, "Original question")
+    if "document classifier" in prompt:
+        return "Technical Documentation"
+    if "critical reviewer" in prompt:
+        return '{"grade": "GOOD", "missing": ""}'
+    if "quiz generator" in prompt:
+        if "JSON" in prompt:
+            return _quiz_json(_block(human, "Section"))
+        return "\n".join(
+            f"{i}. True or false: {s}" for i, s in enumerate(_sentences(_block(human, "Context"))[:9], 1)
+        )
+    if "Question:" in human and "Context:" in human:
+        context, _, question = human.partition("Question:")
+        best = _best_sentences(context, question, 2)
+        return " ".join(best) if best else _REFUSAL
+    # Summaries: the opening sentences of the content
+    return " ".join(_sentences(human)[:4]) or "The document has no text."
+
+
+class FakeLLM(LLM):
+    """
+    Deterministic LLM: answers from the prompt itself (see fake_response),
+    after `latency_ms` to the first token and then `tokens_per_second`,
+    with at most `max_tokens` words.
+    """
+
+    latency_ms: float = 50.0
+    tokens_per_second: float = 200.0
+    max_tokens: int = 128
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "tokens_per_second": self.tokens_per_second,
+            "max_tokens": self.max_tokens,
+        }
+
+    def _tokens(self, prompt: str) -> List[str]:
+        words = fake_response(prompt).split(" ")[: self.max_tokens]
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _delay(self, index: int) -> float:
+        return self.latency_ms / 1000 if index == 0 else 1 / self.tokens_per_second
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        parts = [chunk.text async for chunk in self._astream(prompt, stop, run_manager, **kwargs)]
+        return "".join(parts)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        for i, token in enumerate(self._tokens(prompt)):
+            time.sleep(self._delay(i))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token)
+            yield GenerationChunk(text=token)
+
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        for i, token in enumerate(self._tokens(prompt)):
+            await asyncio.sleep(self._delay(i))
+            if run_manager is not None:
+                await run_manager.on_llm_new_token(token)
+            yield GenerationChunk(text=token)
+
+
+@lru_cache(maxsize=65536)
+def _bucket(term: str, dim: int) -> tuple:
+    digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % dim, 1.0 if (value >> 63) & 1 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Feature-hashed bag of words and word pairs (unit vectors of size `dim`).
+    Texts sharing terms are similar, which is enough to measure retrieval.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        terms = tokenize(text)
+        for term in terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]:
+            index, sign = _bucket(term, self.dim)
+            vector[index] += sign
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
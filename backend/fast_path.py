@@ -0,0 +1,133 @@
+# backend/fast_path.py
+# Local decisions that stand in for LLM calls on the question hot path.
+# Each returns its decision, or None when the local signals are
+# inconclusive and the caller should ask the LLM.
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Optional, Sequence
+
+from langchain_core.documents import Document
+
+from .config import (
+    FAST_GRADE_MIN_GROUNDING,
+    FAST_GRADE_MIN_SCORE,
+    FAST_PATH,
+    FAST_REWRITE_MIN_WORDS,
+)
+from .lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Words that only make sense with earlier context: the rewriter should resolve them
+_REFERENCES = {
+    "he", "she", "they", "him", "her", "them", "his", "hers", "their", "theirs",
+    "it", "its", "this", "that", "these", "those", "former", "latter",
+}
+# What the QA prompt asks the LLM to answer when the context lacks the answer
+REFUSAL_ANSWER = "I don't know."
+# Only that whole answer counts: "The report does not mention an audit" can
+# be a correct answer, so other wordings are left to the LLM grader
+_REFUSAL = re.compile(r"^\W*i (?:don['’]?t|do not) know\W*$", re.IGNORECASE)
+# Questions about the document as a whole (answered from section summaries)
+_OVERVIEW = re.compile(
+    r"\b(summar\w*|overview|main (?:points?|ideas?|themes?|topics?|findings|argument)"
+    r"|key (?:points?|takeaways?|themes?|findings)|takeaways?|gist|outline"
+    r"|what is (?:this|the) (?:document|pdf|paper|book|report) about|whole (?:document|pdf|book))\b",
+    re.IGNORECASE,
+)
+# Questions about one specific detail (answered from raw passages)
+_SPECIFIC = re.compile(r"\d|[\"“”]\w[^\"“”]*[\"“”]|\b[A-Z]{2,}[-_]?\w*\b")
+# Too common to count as evidence that an answer came from the context
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "as", "by",
+    "is", "are", "was", "were", "be", "been", "it", "this", "that", "which", "from",
+    "at", "not", "no", "can", "also", "has", "have", "had", "its", "their", "they",
+}
+
+_lock = threading.Lock()
+_decisions: Counter = Counter()
+
+
+def _record(decision: str, outcome, reason: str):
+    with _lock:
+        _decisions[f"{decision}:{'llm' if outcome is None else outcome}"] += 1
+    if outcome is None:
+        logger.info("fast path %s inconclusive (%s); asking the LLM", decision, reason)
+    else:
+        logger.info("fast path %s -> %s (%s)", decision, outcome, reason)
+    return outcome
+
+
+def route_index(question: str, indexes: Sequence[str] = ("RAW",)) -> Optional[str]:
+    """
+    Index to retrieve from: the only one there is, SUMMARY for questions
+    about the document as a whole, RAW for questions naming specifics.
+    """
+    if not FAST_PATH:
+        return _record("route", None, "disabled")
+    if len(indexes) == 1:
+        return _record("route", indexes[0], "only one index")
+    if "SUMMARY" in indexes and _OVERVIEW.search(question):
+        return _record("route", "SUMMARY", "overview question")
+    if "RAW" in indexes and _SPECIFIC.search(question):
+        return _record("route", "RAW", "names a number, code or quote")
+    return _record("route", None, "no clear signal")
+
+
+def should_rewrite(question: str) -> Optional[bool]:
+    """
+    False for questions that are already specific enough to retrieve with:
+    long enough and free of pronouns that need resolving.
+    """
+    if not FAST_PATH:
+        return _record("rewrite", None, "disabled")
+    words = re.findall(r"[A-Za-z0-9'-]+", question.lower())
+    references = [w for w in words if w in _REFERENCES]
+    if len(words) >= FAST_REWRITE_MIN_WORDS and not references:
+        return _record("rewrite", False, f"{len(words)} words, no references")
+    reason = f"{len(words)} words" + (f", references {references}" if references else "")
+    return _record("rewrite", None, reason)
+
+
+def grounding(answer: str, docs: Sequence[Document]) -> float:
+    """Share of the answer's content words that also occur in the retrieved context."""
+    answer_terms = {t for t in tokenize(answer) if t not in _STOPWORDS and len(t) > 2}
+    if not answer_terms:
+        return 0.0
+    context_terms = set()
+    for doc in docs:
+        context_terms.update(tokenize(doc.page_content))
+    return len(answer_terms & context_terms) / len(answer_terms)
+
+
+def grade_answer(answer: str, docs: Sequence[Document]) -> Optional[bool]:
+    """
+    False for the prompt's refusal (REFUSAL_ANSWER); True when retrieval was
+    confident (top cosine score) and the answer is grounded in the context.
+    """
+    if not FAST_PATH:
+        return _record("grade", None, "disabled")
+    if not answer.strip() or _REFUSAL.search(answer):
+        return _record("grade", False, "refusal")
+
+    scores = [d.metadata["score"] for d in docs if "score" in d.metadata]
+    top_score = max(scores) if scores else None
+    share = grounding(answer, docs)
+    reason = "top score {}, grounding {:.2f}".format(
+        "n/a" if top_score is None else f"{top_score:.3f}", share
+    )
+    if (
+        top_score is not None
+        and top_score >= FAST_GRADE_MIN_SCORE
+        and share >= FAST_GRADE_MIN_GROUNDING
+    ):
+        return _record("grade", True, reason)
+    return _record("grade", None, reason)
+
+
+def stats() -> dict:
+    """How often each decision was made locally vs. handed to the LLM."""
+    with _lock:
+        return dict(_decisions)
@@ -0,0 +1,79 @@
+# backend/file_lock.py
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the lock only covers this process's threads
+    fcntl = None
+
+
+class FileLock:
+    """
+    Re-entrant lock held across the threads of this process and, through
+    flock() on `path`, across every process sharing the same DATA_DIR
+    (`uvicorn --workers N`, or the Streamlit app next to the API).
+
+    With `remove`, the lock file is deleted on release, for per-key locks
+    whose files would otherwise pile up; a process that was waiting on the
+    deleted file notices and locks the new one.
+    """
+
+    def __init__(self, path: Path, remove: bool = False):
+        self.path = path
+        self.remove = remove
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        self._lock.acquire()
+        if self._depth == 0:
+            try:
+                self._acquire()
+            except BaseException:
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self._release()
+        self._lock.release()
+
+    def _acquire(self):
+        while True:
+            if self._fd is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            if not self.remove:
+                return
+            try:
+                if os.fstat(self._fd).st_ino == os.stat(self.path).st_ino:
+                    return
+            except FileNotFoundError:
+                pass
+            # The previous holder deleted the file as it released it
+            os.close(self._fd)
+            self._fd = None
+
+    def _release(self):
+        if self.remove:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        # Explicit unlock: forked children (e.g. the PDF extraction pool)
+        # share the descriptor, so closing it would not release the lock
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        if self.remove:
+            os.close(self._fd)
+            self._fd = None
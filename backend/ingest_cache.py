@@ -0,0 +1,231 @@
+# backend/ingest_cache.py
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import INGEST_CACHE_DIR, INGEST_CACHE_MAX_MB
+from .disk_lru import prune, touch
+from .file_lock import FileLock
+
+# Bump when the on-disk layout or chunk metadata changes
+CACHE_FORMAT_VERSION = 3
+
+# Written by every save_cached_ingestion (pages.json is optional)
+_ENTRY_FILES = ("chunks.json", "parents.json", "sections.json", "vectors.npy", "meta.json")
+
+# key -> [lock, threads holding or waiting for it]; dropped when that reaches 0
+_key_locks: Dict[str, list] = {}
+_key_locks_guard = threading.Lock()
+
+
+@dataclass
+class CachedIngestion:
+    chunks: List[Document]
+    vectors: np.ndarray
+    doc_type: str
+    summary: str
+    # Passages the chunks point to via metadata["parent_id"]
+    parents: List[Document]
+    # Section summaries (the SUMMARY index)
+    sections: List[Document]
+    # page_fingerprint() of every page; None for entries written without them
+    page_hashes: Optional[List[str]] = None
+    # ingestion_params() it was made with; None for entries written without them
+    params: Optional[dict] = None
+
+
+def file_sha256(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def page_fingerprint(text: str) -> str:
+    """Identity of a page's extracted text, insensitive to whitespace changes."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+def ingestion_params(
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model: str,
+    child_chunk_size: int = 0,
+    child_chunk_overlap: int = 0,
+) -> dict:
+    """Everything besides the PDF bytes that shapes an ingestion's chunks and vectors."""
+    return {
+        "version": CACHE_FORMAT_VERSION,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "child_chunk_size": child_chunk_size,
+        "child_chunk_overlap": child_chunk_overlap,
+        "embedding_model": embedding_model,
+    }
+
+
+def ingestion_key(
+    file_hash: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_model: str,
+    child_chunk_size: int = 0,
+    child_chunk_overlap: int = 0,
+    llm: Optional[dict] = None,
+) -> str:
+    """
+    Content address of one ingestion: PDF bytes + everything that shapes its
+    output. `llm` (llm_identity()) covers the cached doc_type and summary.
+    """
+    params = ingestion_params(
+        chunk_size, chunk_overlap, embedding_model, child_chunk_size, child_chunk_overlap
+    )
+    payload = json.dumps({"file": file_hash, **params, "llm": llm}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def ingestion_lock(key: str):
+    """
+    Held while the document with this key is ingested or its index rebuilt,
+    so a concurrent upload of the same PDF waits and then hits the cache,
+    in this or any other process sharing DATA_DIR. Re-entrant.
+    """
+    with _key_locks_guard:
+        slot = _key_locks.setdefault(
+            key, [FileLock(INGEST_CACHE_DIR / f".{key}.lock", remove=True), 0]
+        )
+        slot[1] += 1
+    try:
+        with slot[0]:
+            yield
+    finally:
+        with _key_locks_guard:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del _key_locks[key]
+
+
+def _to_json(docs: List[Document]) -> list:
+    return [{"page_content": d.page_content, "metadata": d.metadata} for d in docs]
+
+
+def _from_json(raw: list) -> List[Document]:
+    return [Document(page_content=d["page_content"], metadata=d["metadata"]) for d in raw]
+
+
+def load_cached_metadata(key: str) -> Optional[dict]:
+    """Just the doc_type and summary of a cached ingestion (None on a miss)."""
+    try:
+        with open(INGEST_CACHE_DIR / key / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    touch(INGEST_CACHE_DIR / key)
+    return meta
+
+
+def load_cached_ingestion(key: str) -> Optional[CachedIngestion]:
+    entry_dir = INGEST_CACHE_DIR / key
+    try:
+        with open(entry_dir / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(entry_dir / "chunks.json", encoding="utf-8") as f:
+            raw_chunks = json.load(f)
+        with open(entry_dir / "parents.json", encoding="utf-8") as f:
+            raw_parents = json.load(f)
+        with open(entry_dir / "sections.json", encoding="utf-8") as f:
+            raw_sections = json.load(f)
+        vectors = np.load(entry_dir / "vectors.npy", mmap_mode="r")
+    except (OSError, ValueError):
+        # Missing or half-written entry: treat as a miss
+        return None
+    try:
+        with open(entry_dir / "pages.json", encoding="utf-8") as f:
+            page_hashes = json.load(f)
+    except (OSError, ValueError):
+        page_hashes = None
+    touch(entry_dir)
+
+    return CachedIngestion(
+        chunks=_from_json(raw_chunks),
+        vectors=vectors,
+        doc_type=meta["doc_type"],
+        summary=meta["summary"],
+        parents=_from_json(raw_parents),
+        sections=_from_json(raw_sections),
+        page_hashes=page_hashes,
+        params=meta.get("params"),
+    )
+
+
+def _is_complete(entry_dir: Path) -> bool:
+    return all((entry_dir / name).exists() for name in _ENTRY_FILES)
+
+
+def save_cached_ingestion(
+    key: str,
+    chunks: List[Document],
+    vectors,
+    doc_type: str,
+    summary: str,
+    parents: Optional[List[Document]] = None,
+    sections: Optional[List[Document]] = None,
+    page_hashes: Optional[List[str]] = None,
+    params: Optional[dict] = None,
+):
+    """
+    Write the entry to a temp dir of its own and rename it, so readers never
+    see partial data. The key is a content address: when another writer got
+    there first, its entry is kept. Least recently used entries are then
+    deleted beyond INGEST_CACHE_MAX_MB.
+    """
+    entry_dir = INGEST_CACHE_DIR / key
+    INGEST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{key}.", suffix=".tmp", dir=INGEST_CACHE_DIR))
+
+    with open(tmp_dir / "chunks.json", "w", encoding="utf-8") as f:
+        json.dump(_to_json(chunks), f)
+    with open(tmp_dir / "parents.json", "w", encoding="utf-8") as f:
+        json.dump(_to_json(parents or []), f)
+    with open(tmp_dir / "sections.json", "w", encoding="utf-8") as f:
+        json.dump(_to_json(sections or []), f)
+    np.save(tmp_dir / "vectors.npy", np.asarray(vectors, dtype=np.float32))
+    if page_hashes is not None:
+        with open(tmp_dir / "pages.json", "w", encoding="utf-8") as f:
+            json.dump(page_hashes, f)
+    with open(tmp_dir / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"doc_type": doc_type, "summary": summary, "params": params}, f)
+
+    if _is_complete(entry_dir):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return
+    # Unreadable leftover (e.g. files deleted by hand): replace it
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    try:
+        tmp_dir.rename(entry_dir)
+    except OSError:
+        # A concurrent writer renamed its copy in between
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not _is_complete(entry_dir):
+            raise
+    _enforce_size_cap(keep=key)
+
+
+def _enforce_size_cap(keep: str):
+    with _key_locks_guard:
+        # Entries being ingested or restored right now stay
+        busy = set(_key_locks) | {keep}
+    entries = [p for p in INGEST_CACHE_DIR.iterdir() if p.is_dir() and not p.name.startswith(".")]
+    prune(entries, INGEST_CACHE_MAX_MB << 20, keep=busy)
+
@@ -0,0 +1,341 @@
+# backend/ingest_pipeline.py
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    EMBED_BATCH_SIZE,
+    PIPELINE_QUEUE_SIZE,
+    WRITE_BATCH_SIZE,
+)
+from .embedding_cache import get_embedding_cache
+from .ingest_cache import page_fingerprint
+from .llm_provider import get_embeddings
+from .pdf_loader import child_chunk_params, iter_parent_child_chunks, iter_pdf_pages
+from .revisions import RevisionDiff
+from .tracing import propagate, span
+from .vector_store import IndexWriter
+
+STAGES = ("extract", "chunk", "embed", "write")
+
+# Marks the end of a stage's output on its queue
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy_seconds: float = 0.0
+    cache_hits: int = 0
+    # Chunks carried over from an earlier revision, with their vectors
+    reused: int = 0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of busy time (what the stage could sustain alone)."""
+        return self.items / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> dict:
+        end = self.finished_at or time.perf_counter()
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(end - self.started_at, 3) if self.started_at else 0.0,
+            "items_per_second": round(self.throughput, 1),
+            "cache_hits": self.cache_hits,
+            "reused": self.reused,
+            "done": self.finished_at is not None,
+        }
+
+
+@dataclass
+class PipelineResult:
+    chunks: List[Document]
+    vectors: np.ndarray
+    parents: List[Document] = field(default_factory=list)
+    stats: Dict[str, dict] = field(default_factory=dict)
+    wall_seconds: float = 0.0
+    # page_fingerprint() of every page, in order
+    page_hashes: List[str] = field(default_factory=list)
+
+
+class _Aborted(Exception):
+    pass
+
+
+def run_ingestion_pipeline(
+    file_path: str,
+    doc_id: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    child_chunk_size: int = 0,
+    child_chunk_overlap: int = 0,
+    embed_batch_size: int = EMBED_BATCH_SIZE,
+    write_batch_size: int = WRITE_BATCH_SIZE,
+    queue_size: int = PIPELINE_QUEUE_SIZE,
+    on_progress: Optional[Callable[[Dict[str, dict]], None]] = None,
+    on_parent: Optional[Callable[[Document], None]] = None,
+    revision: Optional[RevisionDiff] = None,
+) -> PipelineResult:
+    """
+    Extract → chunk → embed → write, with each stage in its own thread and
+    bounded queues in between, so embedding starts while later pages are
+    still being parsed. Wall-clock time approaches the slowest stage rather
+    than the sum of all stages.
+
+    Pages are split into parent passages (chunk_size) and those into child
+    chunks sized for the embedder; only children are embedded and searched.
+
+    `on_progress` is called from the calling thread (the writer) with a
+    per-stage stats snapshot after every write batch. `on_parent` is called
+    from the chunk stage with each parent passage as soon as it is split
+    off, so text consumers need not wait for embedding; it must not block.
+
+    With `revision`, pages unchanged since the base revision are not split
+    or embedded: their passages, chunks and vectors are carried over.
+    """
+    if not child_chunk_size:
+        child_chunk_size, child_chunk_overlap = child_chunk_params()
+    stats = {name: StageStats(name) for name in STAGES}
+    page_q: queue.Queue = queue.Queue(maxsize=queue_size * embed_batch_size)
+    chunk_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    vector_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def _put(q: queue.Queue, item):
+        # Bounded put that gives up when another stage has failed
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _Aborted()
+
+    def _get(q: queue.Queue):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise _Aborted()
+
+    def _stage(name: str, body: Callable[[StageStats], None], out_q: queue.Queue):
+        def _run():
+            st = stats[name]
+            st.started_at = time.perf_counter()
+            try:
+                with span(name) as s:
+                    body(st)
+                    s.set(items=st.items)
+                _put(out_q, _DONE)
+            except _Aborted:
+                pass
+            except BaseException as exc:
+                errors.append(exc)
+                stop.set()
+            finally:
+                st.finished_at = time.perf_counter()
+
+        # In the caller's trace context, so stage spans nest under the upload
+        return threading.Thread(target=propagate(_run), name=f"ingest-{name}", daemon=True)
+
+    def _extract(st: StageStats):
+        pages = iter_pdf_pages(file_path)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                page = next(pages, None)
+                st.busy_seconds += time.perf_counter() - t0
+                if page is None:
+                    return
+                st.items += 1
+                _put(page_q, page)
+        finally:
+            pages.close()  # shuts the process pool down on abort
+
+    page_hashes: List[str] = []
+
+    def _chunk(st: StageStats):
+        number = 0
+        # Fresh chunks wait for a full embedding batch; carried-over ones
+        # (with vectors) are sent separately. Either kind is flushed before
+        # the other is queued, so chunks keep their document order.
+        batch: List[Document] = []
+        parents: List[Document] = []
+        reused: List[Document] = []
+        reused_parents: List[Document] = []
+        reused_vectors: List[np.ndarray] = []
+
+        def _flush_fresh():
+            nonlocal batch, parents
+            if batch or parents:
+                # Parents travel with the batch that completes them
+                _put(chunk_q, (batch, parents, None))
+                batch, parents = [], []
+
+        def _flush_reused():
+            nonlocal reused, reused_parents, reused_vectors
+            if reused or reused_parents:
+                vectors = (
+                    np.concatenate(reused_vectors)
+                    if reused_vectors
+                    else np.zeros((0, 0), dtype=np.float32)
+                )
+                _put(chunk_q, (reused, reused_parents, vectors))
+                reused, reused_parents, reused_vectors = [], [], []
+
+        while True:
+            page = _get(page_q)
+            if page is _DONE:
+                break
+            t0 = time.perf_counter()
+            page_hashes.append(page_fingerprint(page.page_content))
+            carried = revision.match(page, page_hashes[-1], number) if revision else None
+            if carried is None:
+                pairs = iter_parent_child_chunks(
+                    [page], chunk_size, chunk_overlap, child_chunk_size, child_chunk_overlap,
+                    start=number,
+                )
+                passages = [(parent, children, None) for parent, children in pairs]
+            else:
+                passages = carried
+            st.busy_seconds += time.perf_counter() - t0
+            for parent, children, vectors in passages:
+                number += 1
+                if on_parent is not None:
+                    on_parent(parent)
+                st.items += len(children)
+                if vectors is None:
+                    _flush_reused()
+                    parents.append(parent)
+                    batch.extend(children)
+                    if len(batch) >= embed_batch_size:
+                        _flush_fresh()
+                else:
+                    _flush_fresh()
+                    reused_parents.append(parent)
+                    reused.extend(children)
+                    if len(children):
+                        reused_vectors.append(vectors)
+                    if len(reused) >= write_batch_size:
+                        _flush_reused()
+        _flush_fresh()
+        _flush_reused()
+
+    def _embed(st: StageStats):
+        embeddings = get_embeddings()
+        cache = get_embedding_cache()
+        while True:
+            item = _get(chunk_q)
+            if item is _DONE:
+                return
+            batch, parents, vectors = item
+            if vectors is not None:
+                st.reused += len(batch)
+                _put(vector_q, (batch, vectors, parents))
+                continue
+            t0 = time.perf_counter()
+            hits_before = cache.hits
+            # Only chunks never seen before (by any document) hit the model
+            with span("embed_batch", chunks=len(batch)):
+                vectors = cache.embed(
+                    [c.page_content for c in batch], embeddings.embed_documents, embed_batch_size
+                )
+            st.cache_hits += cache.hits - hits_before
+            st.busy_seconds += time.perf_counter() - t0
+            st.items += len(batch)
+            _put(vector_q, (batch, vectors, parents))
+
+    threads = [
+        _stage("extract", _extract, page_q),
+        _stage("chunk", _chunk, chunk_q),
+        _stage("embed", _embed, vector_q),
+    ]
+    wall_start = time.perf_counter()
+    writer = IndexWriter(doc_id)
+    for t in threads:
+        t.start()
+
+    # Writer runs in the calling thread so progress callbacks are safe for UIs
+    write = stats["write"]
+    write.started_at = time.perf_counter()
+    all_chunks: List[Document] = []
+    all_vectors: List[np.ndarray] = []
+    all_parents: List[Document] = []
+    pending_chunks: List[Document] = []
+    pending_vectors: List[np.ndarray] = []
+
+    def _flush():
+        if not pending_chunks:
+            return
+        t0 = time.perf_counter()
+        vectors = np.concatenate(pending_vectors)
+        with span("write_batch", chunks=len(pending_chunks)):
+            writer.add(pending_chunks, vectors)
+        write.busy_seconds += time.perf_counter() - t0
+        write.items += len(pending_chunks)
+        all_chunks.extend(pending_chunks)
+        all_vectors.append(vectors)
+        pending_chunks.clear()
+        pending_vectors.clear()
+        if on_progress is not None:
+            on_progress({name: s.as_dict() for name, s in stats.items()})
+
+    try:
+        while True:
+            item = _get(vector_q)
+            if item is _DONE:
+                break
+            batch, vectors, parents = item
+            writer.add_parents(parents)
+            all_parents.extend(parents)
+            if not batch:
+                continue
+            pending_chunks.extend(batch)
+            pending_vectors.append(vectors)
+            if len(pending_chunks) >= write_batch_size:
+                _flush()
+        _flush()
+    except _Aborted:
+        pass
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        # Normal exit: every stage has already finished. Failure: unblock them.
+        stop.set()
+        for t in threads:
+            t.join()
+        write.finished_at = time.perf_counter()
+
+    if errors:
+        writer.abort()
+        raise errors[0]
+
+    if on_progress is not None:
+        on_progress({name: s.as_dict() for name, s in stats.items()})
+    with span("commit"):
+        writer.commit()
+
+    vectors = np.concatenate(all_vectors) if all_vectors else np.zeros((0, 0), dtype=np.float32)
+    return PipelineResult(
+        chunks=all_chunks,
+        vectors=vectors,
+        parents=all_parents,
+        stats={name: s.as_dict() for name, s in stats.items()},
+        wall_seconds=round(time.perf_counter() - wall_start, 3),
+        page_hashes=page_hashes,
+    )
@@ -0,0 +1,298 @@
+# backend/ingestion.py
+import asyncio
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .async_runtime import AgentEvent, emit_step, run_sync, to_thread
+from .classifier_agent import aclassify_ingested
+from .config import (
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    EMBEDDING_MODEL,
+    INCREMENTAL_INGEST,
+    QUIZ_BANK_ENABLED,
+    ensure_data_dirs,
+)
+from .ingest_cache import (
+    file_sha256,
+    ingestion_key,
+    ingestion_lock,
+    ingestion_params,
+    load_cached_ingestion,
+    save_cached_ingestion,
+)
+from .ingest_pipeline import run_ingestion_pipeline
+from .llm_provider import llm_identity
+from .pdf_loader import child_chunk_params
+from .quiz_bank import schedule_quiz_bank
+from .revisions import RevisionDiff
+from .summarizer_agent import DocumentSummary, asummarize_passages
+from .tracing import annotate, propagate, span, traced
+from .vector_store import build_summary_index, evict_vector_store, load_vector_store
+
+
+@dataclass
+class IngestResult:
+    doc_id: str
+    doc_type: str
+    summary: str
+    num_chunks: int
+    cache_hit: bool
+    # Per-stage pipeline stats (empty on a cache hit)
+    stage_stats: Dict[str, dict] = field(default_factory=dict)
+    # For a revision of an ingested document: what was reused (RevisionDiff.stats)
+    # and which summary sections the change affected
+    revision: Optional[dict] = None
+
+
+# Ends the stream of passages fed to _DocumentAnalysis
+_END = object()
+
+
+class _DocumentAnalysis:
+    """
+    Classifies and summarizes a document while the pipeline is still
+    embedding it. Parent passages are fed in as they are split off and each
+    section is summarized as soon as it is complete. The document is
+    classified from its chunk embeddings (handed to result()) just before
+    the final summary, which is the only step that needs its type.
+
+    Agent events are queued and handed to `on_event` only from the thread
+    that calls drain()/result(), so UI callbacks stay on the UI thread.
+    """
+
+    def __init__(self, on_event: Optional[Callable[[AgentEvent], None]] = None):
+        self._passages: "queue.Queue" = queue.Queue()
+        self._on_event = on_event
+        self._events: "queue.Queue" = queue.Queue()
+        self._emit = self._events.put if on_event is not None else None
+        self._vectors: Future = Future()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-analysis")
+        self._future = self._pool.submit(propagate(lambda: run_sync(self._run())))
+
+    def add(self, parent: Document):
+        self._passages.put(parent)
+
+    @traced("analysis")
+    async def _run(self) -> Tuple[str, DocumentSummary]:
+        passages: List[Document] = []
+        doc_type: Optional[str] = None
+
+        async def _stream():
+            while True:
+                passage = await to_thread(self._passages.get)
+                if passage is _END:
+                    return
+                passages.append(passage)
+                yield passage
+
+        async def _doc_type() -> str:
+            nonlocal doc_type
+            if doc_type is None:
+                vectors = await asyncio.wrap_future(self._vectors)
+                result = await aclassify_ingested(vectors, passages)
+                if result.method == "llm":
+                    how = "by the LLM (embeddings were inconclusive)"
+                else:
+                    how = f"from embeddings ({result.confidence:.0%} of sampled chunks agree)"
+                emit_step(self._emit, f"Classified as {result.doc_type} {how}")
+                doc_type = result.doc_type
+            return doc_type
+
+        summary = await asummarize_passages(_stream(), _doc_type, emit=self._emit)
+        return await _doc_type(), summary
+
+    def drain(self):
+        while self._on_event is not None:
+            try:
+                self._on_event(self._events.get_nowait())
+            except queue.Empty:
+                return
+
+    def result(self, vectors: np.ndarray) -> Tuple[str, DocumentSummary]:
+        """Wait for the analysis; `vectors` are the document's chunk embeddings."""
+        self._vectors.set_result(vectors)
+        self._passages.put(_END)
+        while True:
+            try:
+                result = self._future.result(timeout=0.05)
+            except FutureTimeout:
+                self.drain()
+                continue
+            self.drain()
+            return result
+
+    def close(self):
+        # Unblocks the analysis if the pipeline failed before result()
+        self._vectors.cancel()
+        self._passages.put(_END)
+        self._pool.shutdown(wait=False)
+
+
+@traced("ingest")
+def ingest_pdf(
+    file_path: str,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    on_progress: Optional[Callable[[Dict[str, dict]], None]] = None,
+    on_event: Optional[Callable[[AgentEvent], None]] = None,
+    base_doc_id: Optional[str] = None,
+) -> IngestResult:
+    """
+    Extract, chunk, embed, index, classify and summarize a PDF.
+    Small child chunks are embedded; their parent passages are what the LLM reads.
+    Results are cached by PDF content + chunking/embedding/LLM config, so a
+    re-upload of the same file reuses its index (or restores the stored
+    vectors). The returned `doc_id` scopes retrieval to this document.
+    Quiz questions are then generated in the background (see quiz_bank).
+    `on_progress` receives per-stage pipeline stats while indexing, and
+    `on_event` the classifier/summarizer steps and summary tokens
+    (both on the calling thread).
+
+    A new revision of an ingested document (`base_doc_id`, which callers
+    track per user or session) only has its changed pages chunked and
+    embedded; see revisions.RevisionDiff. When it shares pages with the
+    base, its index then replaces the base's; otherwise it is ingested as
+    an unrelated document.
+    """
+    ensure_data_dirs()
+    child_size, child_overlap = child_chunk_params()
+    params = ingestion_params(
+        chunk_size, chunk_overlap, EMBEDDING_MODEL, child_size, child_overlap
+    )
+    key = ingestion_key(
+        file_sha256(file_path),
+        chunk_size,
+        chunk_overlap,
+        EMBEDDING_MODEL,
+        child_size,
+        child_overlap,
+        llm_identity(),
+    )
+
+    # A concurrent upload of the same PDF waits here, then hits the cache
+    with ingestion_lock(key):
+        return _ingest_pdf(
+            file_path,
+            key,
+            params,
+            on_progress,
+            on_event,
+            base_doc_id,
+        )
+
+
+def _ingest_pdf(
+    file_path: str,
+    key: str,
+    params: dict,
+    on_progress: Optional[Callable[[Dict[str, dict]], None]],
+    on_event: Optional[Callable[[AgentEvent], None]],
+    base_doc_id: Optional[str],
+) -> IngestResult:
+    cached = load_cached_ingestion(key)
+    annotate(doc_id=key, cache_hit=cached is not None)
+    if cached is not None:
+        # Marks the index recently used, or restores it if it was evicted
+        load_vector_store(key)
+        if QUIZ_BANK_ENABLED:
+            schedule_quiz_bank(key)
+        return IngestResult(
+            doc_id=key,
+            doc_type=cached.doc_type,
+            summary=cached.summary,
+            num_chunks=len(cached.chunks),
+            cache_hit=True,
+        )
+
+    revision = None
+    if INCREMENTAL_INGEST and base_doc_id is not None and base_doc_id != key:
+        with span("revision_diff", base_doc_id=base_doc_id) as s:
+            revision = RevisionDiff.load(base_doc_id, params)
+            s.set(reused=revision is not None)
+
+    # Classification & summarization overlap with embedding and indexing
+    analysis = _DocumentAnalysis(on_event)
+
+    def _progress(stats: Dict[str, dict]):
+        analysis.drain()
+        if on_progress is not None:
+            on_progress(stats)
+
+    try:
+        pipeline = run_ingestion_pipeline(
+            file_path,
+            key,
+            chunk_size=params["chunk_size"],
+            chunk_overlap=params["chunk_overlap"],
+            child_chunk_size=params["child_chunk_size"],
+            child_chunk_overlap=params["child_chunk_overlap"],
+            on_progress=_progress,
+            on_parent=analysis.add,
+            revision=revision,
+        )
+        if revision is not None and revision.unchanged_pages == 0:
+            # Not a revision of the base after all: nothing to reuse or replace
+            revision = None
+        revision_stats = revision.stats(len(pipeline.chunks)) if revision else None
+        if revision_stats is not None:
+            annotate(**{k: v for k, v in revision_stats.items() if k != "changed_pages"})
+            analysis.drain()
+            emit_step(
+                on_event,
+                f"Revision of an earlier upload: {revision_stats['pages_changed']} of "
+                f"{len(pipeline.page_hashes)} pages new or changed; embedded "
+                f"{revision_stats['chunks_embedded']} chunks, reused "
+                f"{revision_stats['chunks_reused']}, dropped {revision_stats['chunks_dropped']}",
+            )
+        doc_type, doc_summary = analysis.result(pipeline.vectors)
+    finally:
+        analysis.close()
+    chunks, vectors, parents = pipeline.chunks, pipeline.vectors, pipeline.parents
+    annotate(chunks=len(chunks), parents=len(parents), doc_type=doc_type)
+    # Section summaries become the document's SUMMARY index
+    with span("summary_index", sections=len(doc_summary.sections)):
+        build_summary_index(key, doc_summary.sections)
+
+    if revision_stats is not None:
+        # Only these sections were summarized again; the others kept theirs
+        revision_stats["stale_sections"] = [
+            number
+            for number, section in enumerate(doc_summary.sections)
+            if not section.metadata.get("summary_cached")
+        ]
+
+    with span("save_cache"):
+        save_cached_ingestion(
+            key,
+            chunks,
+            vectors,
+            doc_type,
+            doc_summary.summary,
+            parents,
+            doc_summary.sections,
+            pipeline.page_hashes,
+            params,
+        )
+    if revision is not None:
+        # The new revision replaces the base's index rather than sitting next
+        # to it; the base stays in the ingestion cache and is restored from
+        # there if it is still queried
+        evict_vector_store(revision.base_doc_id)
+    if QUIZ_BANK_ENABLED:
+        schedule_quiz_bank(key)
+    return IngestResult(
+        doc_id=key,
+        doc_type=doc_type,
+        summary=doc_summary.summary,
+        num_chunks=len(chunks),
+        cache_hit=False,
+        stage_stats=pipeline.stats,
+        revision=revision_stats,
+    )
@@ -0,0 +1,140 @@
+# backend/lexical_index.py
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .config import BM25_B, BM25_K1
+from .numpy_store import top_k
+
+# Keeps identifiers such as "E-4412", "v2.3.1" or "part_no" in one piece
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word/identifier tokens. Compound identifiers are emitted whole
+    and also split into their parts, so "E-4412" matches "4412" as well.
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group(0)
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunks of one document.
+
+    Postings are stored per term as parallel (doc index, term frequency)
+    arrays, so a query only touches the documents containing its terms and
+    scores them with vectorized NumPy arithmetic.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self._doc_lens: List[int] = []
+        self._building: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._lens_array = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]):
+        for chunk_id, text in zip(ids, texts):
+            doc_index = len(self.ids)
+            counts = Counter(tokenize(text))
+            self.ids.append(chunk_id)
+            self._doc_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._building[term].append((doc_index, tf))
+
+    def _finalize(self):
+        if not self._building:
+            return
+        for term, entries in self._building.items():
+            docs = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((t for _, t in entries), dtype=np.float32, count=len(entries))
+            if term in self._postings:
+                old_docs, old_tfs = self._postings[term]
+                docs = np.concatenate([old_docs, docs])
+                tfs = np.concatenate([old_tfs, tfs])
+            self._postings[term] = (docs, tfs)
+        self._building.clear()
+        self._lens_array = np.asarray(self._doc_lens, dtype=np.float32)
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score) pairs; chunks sharing no term with the query are skipped."""
+        self._finalize()
+        n = len(self.ids)
+        if n == 0:
+            return []
+        avg_len = float(self._lens_array.mean()) or 1.0
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self._lens_array[docs] / avg_len)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        best = matched[top_k(scores[matched], k)]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+    def save(self, path: Path):
+        self._finalize()
+        payload = {
+            "k1": self.k1,
+            "b": self.b,
+            "ids": self.ids,
+            "doc_lens": self._doc_lens,
+            "postings": {
+                term: [docs.tolist(), tfs.astype(int).tolist()]
+                for term, (docs, tfs) in self._postings.items()
+            },
+        }
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        index = cls(k1=payload["k1"], b=payload["b"])
+        index.ids = payload["ids"]
+        index._doc_lens = payload["doc_lens"]
+        index._postings = {
+            term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (docs, tfs) in payload["postings"].items()
+        }
+        index._lens_array = np.asarray(index._doc_lens, dtype=np.float32)
+        return index
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
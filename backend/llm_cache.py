@@ -0,0 +1,113 @@
+# backend/llm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.outputs import Generation
+
+from .config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_PATH
+from .tracing import count
+
+
+class SQLiteLLMCache(BaseCache):
+    """
+    Exact-match LLM response cache in one SQLite file, shared by every agent.
+
+    The key is a hash of the LLM string (model name + generation parameters,
+    as serialized by LangChain) and the fully rendered prompt. Beyond
+    `max_entries` the least recently used responses are deleted.
+    """
+
+    def __init__(self, path: Path = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_lru ON llm_cache (last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return hashlib.sha256(f"{llm_string}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                count("llm_cache_misses")
+                return None
+            self._conn.execute(
+                "UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.hits += 1
+        count("llm_cache_hits")
+        try:
+            return [Generation(**g) for g in json.loads(row[0])]
+        except (ValueError, TypeError):
+            # Unreadable entry: recompute
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self._key(prompt, llm_string)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, last_used) VALUES (?, ?, ?)",
+                (key, _serialize(return_val), time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self, **kwargs: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def _serialize(generations: RETURN_VAL_TYPE) -> str:
+    # Completion text + provider info (e.g. token counts); enough to rebuild a Generation
+    return json.dumps(
+        [{"text": g.text, "generation_info": g.generation_info} for g in generations],
+        default=str,
+    )
+
+
+_cache: Optional[SQLiteLLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> SQLiteLLMCache:
+    """Process-wide response cache (opened on first use)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SQLiteLLMCache()
+        return _cache
@@ -1,11 +1,23 @@
 # backend/llm_provider.py
-from langchain_community.llms import Ollama
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from .config import OLLAMA_LLM_MODEL, EMBEDDING_MODEL
+from .config import FAKE_LLM_MAX_TOKENS, LLM_PROVIDER, OLLAMA_LLM_MODEL
+from .model_registry import registry
+
+
+def get_llm(**params):
+    # Ollama must be running (`ollama serve`) unless LLM_PROVIDER=fake
+    # Shared client from the process-wide registry, one per config.
+    return registry.get_llm(**params)
 
-def get_llm():
-    # Ollama must be running: `ollama serve`
-    return Ollama(model=OLLAMA_LLM_MODEL)
 
 def get_embeddings():
-    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    # Loaded once per process; every caller gets the same warm model.
+    return registry.get_embeddings()
+
+
+def llm_identity() -> dict:
+    """The configured LLM, for keys of anything cached from its output."""
+    # Output of the fake LLM (benchmarks, offline runs) must never be
+    # served in place of a real model's
+    if LLM_PROVIDER == "fake":
+        return {"provider": "fake", "max_tokens": FAKE_LLM_MAX_TOKENS}
+    return {"provider": LLM_PROVIDER, "model": OLLAMA_LLM_MODEL}
@@ -0,0 +1,77 @@
+# backend/llm_tracing.py
+# LangChain callback recording LLM calls as tracing spans. Separate from
+# tracing.py so that spans (used by the app's first page) do not import
+# LangChain.
+import threading
+import time
+from typing import Any, Dict, List
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .config import CHARS_PER_TOKEN
+from .tracing import Span, end_span, start_span
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    One "llm" span per LLM call, under the span that made the call, with
+    time to first token (when streaming) and prompt/completion token
+    counts (as reported by the model, else estimated from characters).
+    """
+
+    # Called in the caller's context, so the current span is the caller's
+    run_inline = True
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs):
+        s = start_span(
+            "llm",
+            model=(kwargs.get("invocation_params") or {}).get("model", ""),
+            prompt_chars=sum(len(p) for p in prompts),
+        )
+        if s is None:
+            return
+        with self._lock:
+            self._spans[run_id] = s
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        s = self._spans.get(run_id)
+        if s is not None and "ttft_ms" not in s.attributes:
+            s.set(ttft_ms=round((time.time() - s.start) * 1000, 2))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        with self._lock:
+            s = self._spans.pop(run_id, None)
+        if s is None:
+            return
+        prompt_tokens = completion_tokens = 0
+        completion_chars = 0
+        for generations in response.generations:
+            for g in generations:
+                info = g.generation_info or {}
+                prompt_tokens += info.get("prompt_eval_count") or 0
+                completion_tokens += info.get("eval_count") or 0
+                completion_chars += len(g.text)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = prompt_tokens or usage.get("prompt_tokens", 0)
+        completion_tokens = completion_tokens or usage.get("completion_tokens", 0)
+        if not (prompt_tokens or completion_tokens):
+            prompt_tokens = s.attributes["prompt_chars"] // CHARS_PER_TOKEN
+            completion_tokens = completion_chars // CHARS_PER_TOKEN
+            s.set(tokens_estimated=True)
+        s.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        end_span(s)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        with self._lock:
+            s = self._spans.pop(run_id, None)
+        if s is not None:
+            end_span(s, error)
+
+
+tracing_handler = TracingCallbackHandler()
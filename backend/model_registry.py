@@ -0,0 +1,197 @@
+# backend/model_registry.py
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+from .config import (
+    EMBEDDING_MAX_TOKENS,
+    EMBEDDING_MODEL,
+    EMBEDDING_PROVIDER,
+    FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_MAX_TOKENS,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    HASH_EMBEDDING_DIM,
+    LLM_CACHE_ENABLED,
+    LLM_PROVIDER,
+    OLLAMA_KEEP_ALIVE,
+    OLLAMA_LLM_MODEL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Input limits (word pieces) of common embedders, used when the loaded model
+# does not report one
+KNOWN_EMBEDDING_MAX_TOKENS = {
+    "sentence-transformers/all-MiniLM-L6-v2": 256,
+    "sentence-transformers/all-MiniLM-L12-v2": 256,
+    "sentence-transformers/all-mpnet-base-v2": 384,
+    "sentence-transformers/multi-qa-MiniLM-L6-cos-v1": 512,
+    "BAAI/bge-small-en-v1.5": 512,
+    "BAAI/bge-base-en-v1.5": 512,
+}
+DEFAULT_EMBEDDING_MAX_TOKENS = 256
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MB, if the OS exposes it."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+
+        # ru_maxrss is a high-water mark (KB on Linux), still useful as a delta
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:
+        return None
+
+
+class ModelRegistry:
+    """
+    Process-wide owner of the embedding model and LLM clients.
+
+    Every model is built once per config key and the same instance is handed
+    to all agents and sessions. Loading is guarded per key, so two threads
+    asking for the same model wait for a single load instead of racing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._models: Dict[Hashable, object] = {}
+        self._stats: Dict[Hashable, dict] = {}
+
+    def _get_or_load(self, key: Hashable, loader: Callable[[], object]):
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+            rss_before = _rss_mb()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = _rss_mb()
+            rss_delta = (
+                rss_after - rss_before
+                if rss_before is not None and rss_after is not None
+                else None
+            )
+            self._stats[key] = {
+                "kind": key[0],
+                "name": key[1],
+                "load_seconds": round(load_seconds, 3),
+                "rss_delta_mb": round(rss_delta, 1) if rss_delta is not None else None,
+                "loaded_at": time.time(),
+            }
+            self._models[key] = model
+            logger.info(
+                "Loaded %s model %s in %.2fs (rss +%s MB)",
+                key[0], key[1], load_seconds, self._stats[key]["rss_delta_mb"],
+            )
+        return model
+
+    def get_embeddings(self, model_name: str = EMBEDDING_MODEL):
+        def _load():
+            if EMBEDDING_PROVIDER == "hash":
+                from .fake_models import HashEmbeddings
+
+                return HashEmbeddings(HASH_EMBEDDING_DIM)
+
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+
+            return HuggingFaceEmbeddings(model_name=model_name)
+
+        return self._get_or_load(("embeddings", model_name), _load)
+
+    def embedding_max_tokens(self, model_name: str = EMBEDDING_MODEL) -> int:
+        """
+        How many tokens the embedder reads before truncating. EMBEDDING_MAX_TOKENS
+        overrides; otherwise the loaded sentence-transformer's max_seq_length.
+        """
+        if EMBEDDING_MAX_TOKENS:
+            return EMBEDDING_MAX_TOKENS
+        client = getattr(self.get_embeddings(model_name), "client", None)
+        limit = getattr(client, "max_seq_length", None)
+        if isinstance(limit, int) and limit > 0:
+            return limit
+        return KNOWN_EMBEDDING_MAX_TOKENS.get(model_name, DEFAULT_EMBEDDING_MAX_TOKENS)
+
+    def get_llm(self, model_name: str = OLLAMA_LLM_MODEL, cache: bool = LLM_CACHE_ENABLED, **params):
+        """
+        One shared client per (model, generation params) combination.
+        With `cache`, identical prompts are answered from the on-disk
+        response cache instead of the model.
+        """
+        params.setdefault("keep_alive", OLLAMA_KEEP_ALIVE)
+        key = ("llm", model_name, cache, tuple(sorted(params.items())))
+
+        def _load():
+            from .llm_cache import get_llm_cache
+            from .llm_tracing import tracing_handler
+
+            if LLM_PROVIDER == "fake":
+                from .fake_models import FakeLLM
+
+                return FakeLLM(
+                    latency_ms=FAKE_LLM_LATENCY_MS,
+                    tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND,
+                    max_tokens=FAKE_LLM_MAX_TOKENS,
+                    cache=get_llm_cache() if cache else False,
+                    callbacks=[tracing_handler],
+                )
+
+            from langchain_community.llms import Ollama
+
+            # Ollama must be running: `ollama serve`
+            return Ollama(
+                model=model_name,
+                cache=get_llm_cache() if cache else False,
+                callbacks=[tracing_handler],
+                **params,
+            )
+
+        return self._get_or_load(key, _load)
+
+    def warmup(self, embeddings: bool = True, llm: bool = True, ping_llm: bool = False):
+        """
+        Eagerly load models so the first user request does not pay for it.
+        The embedder runs one probe query to page its weights in; with
+        `ping_llm` the Ollama server is also asked to load the model.
+        """
+        if embeddings:
+            self.get_embeddings().embed_query("warmup")
+        if llm:
+            client = self.get_llm()
+            if ping_llm:
+                try:
+                    # an empty prompt only loads the model on the server
+                    client.invoke("")
+                except Exception as exc:
+                    logger.warning("LLM warmup ping failed: %s", exc)
+        return self.stats()
+
+    def stats(self) -> List[dict]:
+        """Load time and memory footprint of every model loaded so far."""
+        return [dict(s) for s in self._stats.values()]
+
+    def clear(self):
+        """Drop all cached instances (mainly for config changes at runtime)."""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+            self._key_locks.clear()
+
+
+registry = ModelRegistry()
@@ -0,0 +1,351 @@
+# backend/numpy_store.py
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .config import NUMPY_STORE_DIR, QUANTIZED_RESCORE_FACTOR, VECTOR_QUANTIZATION
+from .vector_backend import SearchResults, VectorBackend, VectorIndex, match_where
+
+QUANTIZATIONS = ("none", "int8", "binary")
+# Rows converted from int8 to float32 at a time during a scan; small
+# enough for the converted block to stay in cache
+_SCAN_BLOCK = 1024
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and the scales that map them back to float."""
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    codes = np.round(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits, packed and zero-padded to whole 64-bit words per row."""
+    bits = np.packbits(vectors > 0, axis=1)
+    width = -(-bits.shape[1] // 8) * 8
+    return np.ascontiguousarray(np.pad(bits, ((0, 0), (0, width - bits.shape[1]))))
+
+
+def code_bytes(quantization: str, rows: int, dim: int) -> int:
+    """Memory taken by the codes of `rows` vectors (int8 codes carry a float32 scale)."""
+    if quantization == "int8":
+        return rows * (dim + 4)
+    if quantization == "binary":
+        return rows * (-(-dim // 64) * 8)
+    return 0
+
+
+if hasattr(np, "bitwise_count"):
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words)
+
+else:  # numpy < 2.0
+    _BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return _BYTE_POPCOUNT[words.view(np.uint8)]
+
+
+def hamming_distances(codes: np.ndarray, query_code: np.ndarray) -> np.ndarray:
+    """Differing bits between each row of `codes` and `query_code` (from quantize_binary)."""
+    diff = codes.view(np.uint64) ^ query_code.view(np.uint64)
+    return _popcount(diff).sum(axis=1, dtype=np.int32)
+
+
+class NumpyIndex(VectorIndex):
+    """
+    Cosine search over one document's vectors: exact, or in two stages when
+    quantized. The compact codes are held in memory and scanned for the
+    best `rescore_factor * k` candidates, which are then re-scored exactly
+    against their rows of the memory-mapped float32 matrix.
+
+    Layout:
+    - vectors.f32: L2-normalized float32 matrix, memory-mapped
+    - codes.i8 + scales.f32 (int8): per-row scalar codes and their scales
+    - codes.b1 (binary): packed sign bits, 64-bit aligned rows
+    - docs.jsonl:  one {"id", "text", "metadata"} line per row
+    - meta.json:   dimension and quantization
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        quantization: str = "none",
+        rescore_factor: int = QUANTIZED_RESCORE_FACTOR,
+    ):
+        self.directory = directory
+        self._vectors_path = directory / "vectors.f32"
+        self._docs_path = directory / "docs.jsonl"
+        self._meta_path = directory / "meta.json"
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._dim: Optional[int] = None
+        self._mm: Optional[np.memmap] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._row_of: Optional[Dict[str, int]] = None
+        # An existing index keeps the quantization it was built with
+        self.quantization = self._load() or quantization
+        if self.quantization not in QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown quantization {self.quantization!r}; use one of {QUANTIZATIONS}"
+            )
+        self.rescore_factor = rescore_factor
+        suffix = "b1" if self.quantization == "binary" else "i8"
+        self._codes_path = directory / f"codes.{suffix}"
+        self._scales_path = directory / "scales.f32"
+
+    def _load(self) -> Optional[str]:
+        """Read an existing index; returns its quantization."""
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self._dim = meta["dim"]
+            with open(self._docs_path, encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    self._ids.append(row["id"])
+                    self._texts.append(row["text"])
+                    self._metadatas.append(row["metadata"])
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta.get("quantization", "none")
+
+    def _matrix(self) -> np.memmap:
+        if self._mm is None or self._mm.shape[0] != len(self._ids):
+            self._mm = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._ids), self._dim)
+            )
+        return self._mm
+
+    def _code_matrix(self) -> np.ndarray:
+        """The codes of all rows, read into memory once."""
+        if self._codes is None or len(self._codes) != len(self._ids):
+            if self.quantization == "binary":
+                width = -(-self._dim // 64) * 8
+                self._codes = np.fromfile(self._codes_path, dtype=np.uint8).reshape(-1, width)
+            else:
+                self._codes = np.fromfile(self._codes_path, dtype=np.int8).reshape(-1, self._dim)
+                self._scales = np.fromfile(self._scales_path, dtype=np.float32)
+        return self._codes
+
+    def add(self, ids: Sequence[str], chunks: Sequence[Document], vectors) -> None:
+        if not len(chunks):
+            return
+        vectors = _normalize_rows(vectors)
+        with self._lock:
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self._meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self._dim, "quantization": self.quantization}, f)
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors.tobytes())
+            if self.quantization == "int8":
+                codes, scales = quantize_int8(vectors)
+                with open(self._scales_path, "ab") as f:
+                    f.write(scales.tobytes())
+            elif self.quantization == "binary":
+                codes = quantize_binary(vectors)
+            if self.quantization != "none":
+                with open(self._codes_path, "ab") as f:
+                    f.write(codes.tobytes())
+            with open(self._docs_path, "a", encoding="utf-8") as f:
+                for chunk_id, chunk in zip(ids, chunks):
+                    f.write(
+                        json.dumps(
+                            {"id": chunk_id, "text": chunk.page_content, "metadata": chunk.metadata}
+                        )
+                        + "\n"
+                    )
+            self._ids.extend(ids)
+            self._texts.extend(c.page_content for c in chunks)
+            self._metadatas.extend(dict(c.metadata) for c in chunks)
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """First stage: scores from the codes alone (higher is closer)."""
+        codes = self._code_matrix()
+        if rows is not None:
+            codes = codes[rows]
+        if self.quantization == "binary":
+            return -hamming_distances(codes, quantize_binary(query[None, :])[0]).astype(np.float32)
+        scales = self._scales if rows is None else self._scales[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        buffer = np.empty((min(_SCAN_BLOCK, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_BLOCK):
+            block = buffer[: len(codes[start : start + _SCAN_BLOCK])]
+            block[...] = codes[start : start + _SCAN_BLOCK]
+            np.matmul(block, query, out=scores[start : start + len(block)])
+        return scores * scales
+
+    def search(self, query_vector, k: int, where: Optional[dict] = None) -> SearchResults:
+        return self._search(query_vector, k, where, exact=self.quantization == "none")
+
+    def _search(self, query_vector, k: int, where: Optional[dict], exact: bool) -> SearchResults:
+        with self._lock:
+            if not self._ids:
+                return []
+            matrix = self._matrix()
+            query = _normalize_rows(query_vector)[0]
+            rows = None
+            if where:
+                rows = np.fromiter(
+                    (i for i, m in enumerate(self._metadatas) if match_where(m, where)),
+                    dtype=np.int64,
+                )
+                if not len(rows):
+                    return []
+            if exact:
+                scores = (matrix if rows is None else matrix[rows]) @ query
+                best = top_k(scores, k)
+                positions = rows[best] if rows is not None else best
+                hits = zip(positions, scores[best])
+            else:
+                candidates = top_k(self._approximate_scores(query, rows), k * self.rescore_factor)
+                if rows is not None:
+                    candidates = rows[candidates]
+                # Second stage: exact scores from the float32 rows on disk, read in file order
+                candidates = np.sort(candidates)
+                scores = matrix[candidates] @ query
+                best = top_k(scores, k)
+                hits = zip(candidates[best], scores[best])
+            return [
+                (
+                    Document(page_content=self._texts[i], metadata=dict(self._metadatas[i])),
+                    float(score),
+                )
+                for i, score in hits
+            ]
+
+    def nbytes(self) -> Dict[str, int]:
+        """Bytes of the float32 vectors (on disk) and of the codes scanned in memory."""
+        n, dim = len(self._ids), self._dim or 0
+        return {"vectors": n * dim * 4, "codes": code_bytes(self.quantization, n, dim)}
+
+    def get(self, ids: Sequence[str]) -> List[Document]:
+        with self._lock:
+            if self._row_of is None or len(self._row_of) != len(self._ids):
+                self._row_of = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            rows = [self._row_of[i] for i in ids if i in self._row_of]
+            return [
+                Document(page_content=self._texts[r], metadata=dict(self._metadatas[r]))
+                for r in rows
+            ]
+
+    def count(self) -> int:
+        return len(self._ids)
+
+
+def evaluate_recall(index: NumpyIndex, queries, k: int = 10) -> dict:
+    """
+    Recall@k of the index's two-stage search against exact search over the
+    same float32 vectors, with the latency of both and the storage sizes.
+    """
+    recalls, approximate, exact = [], [], []
+    for query in np.asarray(queries, dtype=np.float32):
+        t0 = time.perf_counter()
+        truth = index._search(query, k, None, exact=True)
+        exact.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        hits = index.search(query, k)
+        approximate.append(time.perf_counter() - t0)
+        expected = {doc.metadata.get("chunk_id", doc.page_content) for doc, _ in truth}
+        found = {doc.metadata.get("chunk_id", doc.page_content) for doc, _ in hits}
+        recalls.append(len(expected & found) / max(len(expected), 1))
+    return {
+        "quantization": index.quantization,
+        "rescore_factor": index.rescore_factor,
+        "k": k,
+        "queries": len(recalls),
+        "rows": index.count(),
+        "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+        "search_p50_ms": round(float(np.median(approximate)) * 1000, 3) if recalls else None,
+        "exact_p50_ms": round(float(np.median(exact)) * 1000, 3) if recalls else None,
+        **{f"{name}_bytes": size for name, size in index.nbytes().items()},
+    }
+
+
+def evaluate_sampled_recall(
+    index: NumpyIndex, k: int = 10, queries: int = 100, seed: int = 0
+) -> dict:
+    """
+    evaluate_recall() with queries made from the index's own vectors: the
+    midpoints of random pairs of rows, so their neighbours are not just the
+    rows themselves.
+    """
+    if not index.count():
+        raise ValueError(f"Index {index.directory.name} is empty")
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, index.count(), size=(queries, 2))
+    with index._lock:
+        matrix = index._matrix()
+        sample = matrix[pairs[:, 0]] + matrix[pairs[:, 1]]
+    return evaluate_recall(index, sample, k)
+
+
+class NumpyBackend(VectorBackend):
+    """In-process search, exact or quantized; no server, no SQLite, no HNSW graph."""
+
+    name = "numpy"
+
+    def __init__(self, root: Path = NUMPY_STORE_DIR, quantization: str = VECTOR_QUANTIZATION):
+        self.root = root
+        # For new indexes; opened ones keep their own
+        self.quantization = quantization
+        self._lock = threading.Lock()
+        # Opened indexes stay warm (memory map + metadata) across queries
+        self._open: Dict[str, NumpyIndex] = {}
+
+    def create(self, doc_id: str) -> NumpyIndex:
+        with self._lock:
+            self._open.pop(doc_id, None)
+            directory = self.root / doc_id
+            shutil.rmtree(directory, ignore_errors=True)
+            directory.mkdir(parents=True)
+            index = NumpyIndex(directory, self.quantization)
+            self._open[doc_id] = index
+            return index
+
+    def open(self, doc_id: str) -> NumpyIndex:
+        with self._lock:
+            index = self._open.get(doc_id)
+            if index is None:
+                directory = self.root / doc_id
+                if not directory.exists():
+                    raise KeyError(doc_id)
+                index = NumpyIndex(directory)
+                self._open[doc_id] = index
+            return index
+
+    def drop(self, doc_id: str) -> None:
+        with self._lock:
+            self._open.pop(doc_id, None)
+            shutil.rmtree(self.root / doc_id, ignore_errors=True)
@@ -1,23 +1,155 @@
 # backend/pdf_loader.py
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Tuple
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from .config import UPLOAD_DIR
+from .config import (
+    UPLOAD_DIR,
+    CHARS_PER_TOKEN,
+    CHILD_CHUNK_OVERLAP_RATIO,
+    CHILD_CHUNK_SIZE,
+    CHUNK_SIZE,
+    CHUNK_OVERLAP,
+    PDF_EXTRACT_WORKERS,
+    PDF_PAGES_PER_TASK,
+    ensure_data_dirs,
+)
 
 def save_uploaded_file(uploaded_file) -> str:
-    file_path = UPLOAD_DIR / uploaded_file.name
+    """
+    Save under a name of its own: the file is hashed and parsed later, so a
+    concurrent upload with the same name must not overwrite it in between.
+    """
+    ensure_data_dirs()
+    file_path = UPLOAD_DIR / f"{uuid.uuid4().hex}-{os.path.basename(uploaded_file.name)}"
     with open(file_path, "wb") as f:
         f.write(uploaded_file.getbuffer())
     return str(file_path)
 
-def load_and_chunk_pdf(file_path: str, chunk_size: int = 4000, chunk_overlap: int = 600):
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
-    splitter = RecursiveCharacterTextSplitter(
+@lru_cache(maxsize=2)
+def _open_reader(file_path: str, mtime_ns: int, size: int):
+    # Keyed by mtime/size too: an upload with the same name replaces the file
+    from pypdf import PdfReader
+
+    return PdfReader(file_path)
+
+def _reader_for(file_path: str):
+    stat = os.stat(file_path)
+    return _open_reader(file_path, stat.st_mtime_ns, stat.st_size)
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[str, str]]:
+    """Worker: (text, page_label) for pages [start, end). Runs in a child process."""
+    reader = _reader_for(file_path)
+    labels = reader.page_labels  # computed for the whole file on each access
+    return [
+        (reader.pages[i].extract_text().strip(), labels[i])
+        for i in range(start, end)
+    ]
+
+def iter_pdf_pages(
+    file_path: str,
+    workers: int = PDF_EXTRACT_WORKERS,
+    pages_per_task: int = PDF_PAGES_PER_TASK,
+) -> Iterator[Document]:
+    """
+    Yield one Document per page, in page order.
+    Page ranges are extracted in a process pool; at most `2 * workers` ranges
+    are in flight, so memory stays bounded however long the PDF is.
+    """
+    total_pages = len(_reader_for(file_path).pages)
+    ranges = [
+        (start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    ]
+
+    def _to_documents(start: int, extracted: List[Tuple[str, str]]) -> Iterator[Document]:
+        for offset, (text, label) in enumerate(extracted):
+            yield Document(
+                page_content=text,
+                metadata={
+                    "source": file_path,
+                    "page": start + offset,
+                    "page_label": label,
+                    "total_pages": total_pages,
+                },
+            )
+
+    if workers <= 1 or len(ranges) <= 1:
+        # Not worth spawning processes for a short document
+        for start, end in ranges:
+            yield from _to_documents(start, _extract_page_range(file_path, start, end))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_range = 0
+        while pending or next_range < len(ranges):
+            while next_range < len(ranges) and len(pending) < 2 * workers:
+                start, end = ranges[next_range]
+                pending.append((start, pool.submit(_extract_page_range, file_path, start, end)))
+                next_range += 1
+            start, future = pending.popleft()
+            yield from _to_documents(start, future.result())
+
+def _splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", ".", "!", "?", " ", ""],
     )
-    chunks = splitter.split_documents(docs)
+
+def iter_chunks(
+    pages: Iterable[Document], chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP
+) -> Iterator[Document]:
+    """Split pages as they arrive; each page is chunked independently, like split_documents."""
+    splitter = _splitter(chunk_size, chunk_overlap)
+    for page in pages:
+        yield from splitter.split_documents([page])
+
+def child_chunk_params() -> Tuple[int, int]:
+    """
+    (size, overlap) in characters for the embedded child chunks, derived from
+    the configured embedder's input limit so nothing it reads is truncated.
+    """
+    if CHILD_CHUNK_SIZE:
+        size = CHILD_CHUNK_SIZE
+    else:
+        from .model_registry import registry
+
+        # 2 tokens go to [CLS]/[SEP]; 15% headroom for dense word-piece text
+        size = int((registry.embedding_max_tokens() - 2) * CHARS_PER_TOKEN * 0.85)
+    return size, int(size * CHILD_CHUNK_OVERLAP_RATIO)
+
+def parent_chunk_id(number: int) -> str:
+    """Id of the number-th parent passage of a document (in document order)."""
+    return f"parent-{number}"
+
+def iter_parent_child_chunks(
+    pages: Iterable[Document],
+    parent_size: int = CHUNK_SIZE,
+    parent_overlap: int = CHUNK_OVERLAP,
+    child_size: int = 0,
+    child_overlap: int = 0,
+    start: int = 0,
+) -> Iterator[Tuple[Document, List[Document]]]:
+    """
+    Yield (parent, children) pairs. Parents are the large passages given to
+    the LLM; children are small enough to be embedded in full and carry
+    their parent's id in metadata["parent_id"]. Parents are numbered from
+    `start`, for pages split one at a time.
+    """
+    if not child_size:
+        child_size, child_overlap = child_chunk_params()
+    child_splitter = _splitter(child_size, child_overlap)
+    for number, parent in enumerate(iter_chunks(pages, parent_size, parent_overlap), start):
+        parent.metadata["parent_id"] = parent_chunk_id(number)
+        children = child_splitter.split_documents([parent])
+        yield parent, children
+
+def load_and_chunk_pdf(file_path: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP):
+    chunks = list(iter_chunks(iter_pdf_pages(file_path), chunk_size, chunk_overlap))
     return chunks
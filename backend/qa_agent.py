@@ -1,7 +1,22 @@
 # backend/qa_agent.py
+import asyncio
 from langchain_core.prompts import ChatPromptTemplate
-from .llm_provider import get_llm
-from .rag_retriever_agent import answer_with_rag
+from .answer_cache import answer_cache
+from .async_runtime import (
+    AgentEvent,
+    Emit,
+    cancel,
+    emit_step,
+    run_sync,
+    stream_events,
+    to_thread,
+)
+from .config import ANSWER_CACHE_ENABLED, SPECULATIVE_REFINE
+from .fast_path import grade_answer, should_rewrite
+from .llm_provider import get_embeddings, get_llm
+from .rag_retriever_agent import aanswer_with_rag, aretrieve_context_agentic
+from .tracing import annotate, traced
+from .vector_store import index_version, load_vector_store
 
 # 1) Decide / rewrite the question for better retrieval
 ROUTE_OR_REWRITE_PROMPT = ChatPromptTemplate.from_messages(
@@ -69,43 +84,116 @@ Return ONLY the refined query text, no explanations.
     ]
 )
 
-def _rewrite_query(question: str) -> str:
+@traced("rewrite")
+async def _rewrite_query(question: str) -> str:
     llm = get_llm()
     chain = ROUTE_OR_REWRITE_PROMPT | llm
-    rewritten = chain.invoke({"question": question})
+    rewritten = await chain.ainvoke({"question": question})
     return rewritten.strip()
 
-def _grade_answer(question: str, answer: str) -> bool:
+@traced("grade")
+async def _grade_answer(question: str, answer: str) -> bool:
     llm = get_llm()
     chain = GRADE_ANSWER_PROMPT | llm
-    grade = chain.invoke({"question": question, "answer": answer}).strip().upper()
+    grade = (await chain.ainvoke({"question": question, "answer": answer})).strip().upper()
     return grade == "GOOD"
 
-def _refine_query(question: str, answer: str) -> str:
+async def _refine_query(question: str, answer: str) -> str:
     llm = get_llm()
     chain = REFINE_QUESTION_PROMPT | llm
-    refined = chain.invoke({"question": question, "answer": answer})
+    refined = await chain.ainvoke({"question": question, "answer": answer})
     return refined.strip()
 
-def answer_question(question: str):
+@traced("refine")
+async def _refine_and_retrieve(question: str, answer: str, doc_id: str):
+    refined_query = await _refine_query(question, answer)
+    docs = await aretrieve_context_agentic(refined_query, doc_id)
+    return refined_query, docs
+
+def _sources(docs):
+    return [doc.metadata.get("source", "Unknown") for doc in docs]
+
+async def _answer_uncached(question: str, doc_id: str, emit: Emit = None):
+    """(answer, sources, graded GOOD); only GOOD answers may be reused for other questions."""
+    # 1) Rewrite query for better retrieval (specific questions are used as-is)
+    if should_rewrite(question) is False:
+        rewritten_query = question
+    else:
+        rewritten_query = await _rewrite_query(question)
+        emit_step(emit, f"Rewrote the question: {rewritten_query}")
+
+    # 2) First RAG attempt, graded locally when the signals are clear
+    answer, docs = await aanswer_with_rag(rewritten_query, doc_id, emit=emit)
+    good = grade_answer(answer, docs)
+    speculative = None
+    if good is not None:
+        emit_step(emit, f"Answer graded {'GOOD' if good else 'BAD'} (fast path)")
+    else:
+        # While the LLM grades, already refine the query and retrieve for it;
+        # that work is cancelled if the grade comes back GOOD
+        if SPECULATIVE_REFINE:
+            speculative = asyncio.create_task(_refine_and_retrieve(question, answer, doc_id))
+        try:
+            good = await _grade_answer(question, answer)
+        except BaseException:
+            await cancel(speculative)
+            raise
+        emit_step(emit, f"Answer graded {'GOOD' if good else 'BAD'}")
+    if good:
+        await cancel(speculative)
+        return answer, _sources(docs), True
+
+    # 3) If answer is bad, refine query and try again
+    if emit is not None:
+        emit(AgentEvent("reset"))
+    if speculative is None:
+        speculative = asyncio.create_task(_refine_and_retrieve(question, answer, doc_id))
+    refined_query, refined_docs = await speculative
+    emit_step(emit, f"Refined the question: {refined_query}")
+    answer2, docs2 = await aanswer_with_rag(refined_query, doc_id, docs=refined_docs, emit=emit)
+    # The retry is not graded by the LLM; only the local signals can vouch for it
+    return answer2, _sources(docs2), grade_answer(answer2, docs2) is True
+
+@traced("ask")
+async def aanswer_question(question: str, doc_id: str, emit: Emit = None):
     """
     Agentic RAG entrypoint for the app:
+    - Reuse the answer to an earlier, near-identical question if cached
     - Rewrite query for retrieval
     - Run RAG
-    - Grade answer
+    - Grade answer (refinement starts speculatively meanwhile)
     - If bad, refine query and retry once
+    Only answers that pass grading are cached.
+    With `emit`, steps and answer tokens are reported as they happen.
     """
-    # 1) Rewrite query for better retrieval
-    rewritten_query = _rewrite_query(question)
-
-    # 2) First RAG attempt
-    answer, docs = answer_with_rag(rewritten_query)
-    if _grade_answer(question, answer):
-        sources = [doc.metadata.get("source", "Unknown") for doc in docs]
+    if not ANSWER_CACHE_ENABLED:
+        answer, sources, _ = await _answer_uncached(question, doc_id, emit)
         return answer, sources
 
-    # 3) If answer is bad, refine query and try again
-    refined_query = _refine_query(question, answer)
-    answer2, docs2 = answer_with_rag(refined_query)
-    sources2 = [doc.metadata.get("source", "Unknown") for doc in docs2]
-    return answer2, sources2
\ No newline at end of file
+    def _lookup():
+        # Restores an evicted index first, so the version below is the live one
+        load_vector_store(doc_id)
+        version = index_version(doc_id)
+        vector = get_embeddings().embed_query(question)
+        return version, vector, answer_cache.lookup(doc_id, version, question, vector)
+
+    version, vector, cached = await to_thread(_lookup)
+    annotate(answer_cache_hit=cached is not None)
+    if cached is not None:
+        emit_step(emit, f"Reused the answer to: {cached.question}")
+        if emit is not None:
+            emit(AgentEvent("token", cached.answer))
+        return cached.answer, list(cached.sources)
+
+    answer, sources, good = await _answer_uncached(question, doc_id, emit)
+    # A refusal or an ungrounded answer would be served to every similar question
+    if good:
+        answer_cache.store(doc_id, version, question, vector, answer, sources)
+    return answer, sources
+
+def answer_question(question: str, doc_id: str):
+    return run_sync(aanswer_question(question, doc_id))
+
+def stream_answer_question(question: str, doc_id: str):
+    """Like answer_question, as a stream of AgentEvents; "done" carries (answer, sources)."""
+    return stream_events(lambda emit: aanswer_question(question, doc_id, emit))
\ No newline at end of file
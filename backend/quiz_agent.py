@@ -1,7 +1,11 @@
 # backend/quiz_agent.py
 from langchain_core.prompts import ChatPromptTemplate  # or langchain.prompts if on old version
+from .async_runtime import AgentEvent, Emit, ainvoke_llm, emit_step, run_sync, stream_events, to_thread
+from .config import QUIZ_BANK_ENABLED
 from .llm_provider import get_llm
-from .rag_retriever_agent import answer_with_rag
+from .quiz_bank import format_quiz, schedule_quiz_bank, take_quiz
+from .rag_retriever_agent import aretrieve_and_pack
+from .tracing import annotate, traced
 
 QUIZ_SYSTEM_PROMPT = """
 You are a quiz generator. Using ONLY the provided PDF context, create a quiz.
@@ -15,9 +19,25 @@ Requirements:
 - Base everything strictly on the document.
 """
 
-def generate_quiz_from_query(query: str = "Create a quiz based on the whole document."):
-    answer, docs = answer_with_rag(query)
-    context = "\n\n".join(d.page_content for d in docs)
+DEFAULT_QUIZ_QUERY = "Create a quiz based on the whole document."
+
+@traced("quiz")
+async def agenerate_quiz_from_query(doc_id: str, query: str = DEFAULT_QUIZ_QUERY, emit: Emit = None):
+    # The whole-document quiz is served from the pre-built bank when it has questions
+    if QUIZ_BANK_ENABLED and query == DEFAULT_QUIZ_QUERY:
+        questions = await to_thread(take_quiz, doc_id)
+        annotate(from_bank=bool(questions))
+        if questions:
+            quiz = format_quiz(questions)
+            emit_step(emit, f"Served {len(questions)} questions from the quiz bank")
+            if emit is not None:
+                emit(AgentEvent("token", quiz))
+            return quiz
+        emit_step(emit, "Quiz bank is still being built; generating this quiz directly")
+        await to_thread(schedule_quiz_bank, doc_id)
+
+    context, docs = await aretrieve_and_pack(query, doc_id, emit=emit)
+    emit_step(emit, f"Collected {len(docs)} passages for the quiz")
 
     llm = get_llm()
     prompt = ChatPromptTemplate.from_messages(
@@ -27,5 +47,12 @@ def generate_quiz_from_query(query: str = "Create a quiz based on the whole docu
         ]
     )
     chain = prompt | llm
-    quiz = chain.invoke({"context": context[:8000]})
-    return quiz
\ No newline at end of file
+    quiz = await ainvoke_llm(chain, {"context": context}, emit, "quiz")
+    return quiz
+
+def generate_quiz_from_query(doc_id: str, query: str = DEFAULT_QUIZ_QUERY):
+    return run_sync(agenerate_quiz_from_query(doc_id, query))
+
+def stream_quiz_from_query(doc_id: str, query: str = DEFAULT_QUIZ_QUERY):
+    """Like generate_quiz_from_query, as a stream of AgentEvents; "done" carries the quiz."""
+    return stream_events(lambda emit: agenerate_quiz_from_query(doc_id, query, emit))
\ No newline at end of file
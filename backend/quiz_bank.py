@@ -0,0 +1,325 @@
+# backend/quiz_bank.py
+import asyncio
+import json
+import logging
+import random
+import re
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+from langchain_core.documents import Document
+from langchain_core.prompts import ChatPromptTemplate
+
+from .async_runtime import run_sync
+from .config import (
+    CHARS_PER_TOKEN,
+    CONTEXT_TOKEN_BUDGET,
+    QUIZ_BANK_CONCURRENCY,
+    QUIZ_BANK_DIR,
+    QUIZ_BANK_MAX_MB,
+    QUIZ_BANK_SECTIONS,
+    QUIZ_SIZE,
+    ensure_data_dirs,
+)
+from .context_packer import render_context
+from .disk_lru import prune
+from .llm_provider import get_llm
+from .summarizer_agent import SectionGrouper
+from .tracing import annotate, traced
+from .vector_store import load_parent_chunks
+
+logger = logging.getLogger(__name__)
+
+QUESTION_TYPES = ("mcq", "true_false", "short_answer")
+DIFFICULTIES = ("easy", "medium", "hard")
+
+SECTION_QUIZ_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+You are a quiz generator. Using ONLY the provided section of a PDF, write
+exactly 3 questions:
+- 1 multiple-choice question ("mcq") with 4 options,
+- 1 true/false question ("true_false"),
+- 1 short-answer question ("short_answer").
+Give them different difficulties: one "easy", one "medium", one "hard".
+Base everything strictly on the section.
+
+Respond with a JSON list only, one object per question, with keys:
+- "type": "mcq", "true_false" or "short_answer"
+- "difficulty": "easy", "medium" or "hard"
+- "question": the question text
+- "options": list of 4 options for "mcq", otherwise []
+- "answer": the correct answer
+""",
+        ),
+        (
+            "human",
+            "Section:\n{context}\n\nAlready in the quiz (write different questions):\n"
+            "{asked}\n\nYour JSON list:",
+        ),
+    ]
+)
+
+
+@dataclass
+class QuizQuestion:
+    id: str
+    section: int
+    first_page: int
+    last_page: int
+    type: str
+    difficulty: str
+    question: str
+    options: List[str]
+    answer: str
+    served: bool = False
+
+
+def _bank_path(doc_id: str):
+    return QUIZ_BANK_DIR / f"{doc_id}.json"
+
+
+def load_quiz_bank(doc_id: str) -> List[QuizQuestion]:
+    try:
+        with open(_bank_path(doc_id), encoding="utf-8") as f:
+            return [QuizQuestion(**q) for q in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return []
+
+
+def _save_quiz_bank(doc_id: str, questions: List[QuizQuestion]):
+    ensure_data_dirs()
+    path = _bank_path(doc_id)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([asdict(q) for q in questions], f)
+    tmp_path.replace(path)
+
+
+def document_sections(doc_id: str) -> List[List[Document]]:
+    """
+    The document's parent passages in sections (grouped like the SUMMARY
+    index's) small enough for the quiz prompt to take whole.
+    """
+    parents = load_parent_chunks(doc_id) or {}
+    ordered = sorted(
+        parents.values(), key=lambda p: int(p.metadata["parent_id"].rsplit("-", 1)[-1])
+    )
+    grouper = SectionGrouper(target_chars=CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN)
+    sections = [g for g in (grouper.push(p) for p in ordered) if g is not None]
+    rest = grouper.flush()
+    if rest is not None:
+        sections.append(rest)
+    return sections
+
+
+def _question_key(question: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form, to spot repeated questions."""
+    return re.sub(r"\W+", " ", question).strip().lower()
+
+
+def _parse_questions(raw: str) -> List[dict]:
+    match = re.search(r"\[.*\]", raw, re.DOTALL)
+    if match is None:
+        return []
+    try:
+        items = json.loads(match.group(0))
+    except ValueError:
+        return []
+    questions = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict) or not str(item.get("question", "")).strip():
+            continue
+        kind = str(item.get("type", "")).lower().replace("/", "_").replace("-", "_")
+        difficulty = str(item.get("difficulty", "")).lower()
+        options = item.get("options") or []
+        questions.append(
+            {
+                "type": kind if kind in QUESTION_TYPES else "short_answer",
+                "difficulty": difficulty if difficulty in DIFFICULTIES else "medium",
+                "question": str(item["question"]).strip(),
+                "options": [str(o) for o in options] if isinstance(options, list) else [],
+                "answer": str(item.get("answer", "")).strip(),
+            }
+        )
+    return questions
+
+
+async def _section_questions(
+    number: int, passages: List[Document], asked: List[str], semaphore: asyncio.Semaphore
+) -> List[QuizQuestion]:
+    # Only a single passage longer than the budget is cut short
+    context = render_context(passages)[: CONTEXT_TOKEN_BUDGET * CHARS_PER_TOKEN]
+    inputs = {"context": context, "asked": "\n".join(f"- {q}" for q in asked) or "(none)"}
+    # Uncached: a refill must not be answered with the previous fill's questions
+    async with semaphore:
+        raw = await (SECTION_QUIZ_PROMPT | get_llm(cache=False)).ainvoke(inputs)
+    first_page = passages[0].metadata.get("page", 0)
+    last_page = passages[-1].metadata.get("page", 0)
+    return [
+        QuizQuestion(
+            id=f"s{number}-{random.getrandbits(32):08x}",
+            section=number,
+            first_page=first_page,
+            last_page=last_page,
+            **q,
+        )
+        for q in _parse_questions(raw)
+    ]
+
+
+def _pick_sections(
+    sections: List[List[Document]], bank: List[QuizQuestion], count: int
+) -> List[int]:
+    """Sections with the fewest unserved questions, spread over the document."""
+    if len(sections) <= count:
+        return list(range(len(sections)))
+    unserved = Counter(q.section for q in bank if not q.served)
+    # One pick per stratum of the document, least-stocked section within it
+    n = len(sections)
+    strata = [range(i * n // count, (i + 1) * n // count) for i in range(count)]
+    return [min(stratum, key=lambda s: (unserved[s], random.random())) for stratum in strata]
+
+
+@traced("quiz_bank_fill")
+async def afill_quiz_bank(doc_id: str, sections_per_fill: int = QUIZ_BANK_SECTIONS) -> int:
+    """Generate questions for a sample of sections and add them to the bank; returns how many."""
+    sections = document_sections(doc_id)
+    if not sections:
+        return 0
+    bank = load_quiz_bank(doc_id)
+    picked = _pick_sections(sections, bank, sections_per_fill)
+    asked: Dict[int, List[str]] = defaultdict(list)
+    for q in bank:
+        asked[q.section].append(q.question)
+    semaphore = asyncio.Semaphore(QUIZ_BANK_CONCURRENCY)
+    results = await asyncio.gather(
+        *(_section_questions(n, sections[n], asked[n], semaphore) for n in picked),
+        return_exceptions=True,
+    )
+    new_questions = []
+    for number, result in zip(picked, results):
+        if isinstance(result, BaseException):
+            logger.warning("Quiz bank: section %d of %s failed: %s", number, doc_id, result)
+        else:
+            new_questions.extend(result)
+    with _bank_lock(doc_id):
+        bank = load_quiz_bank(doc_id)
+        # Never serve a question again as a new one
+        seen = {_question_key(q.question) for q in bank}
+        added = []
+        for q in new_questions:
+            key = _question_key(q.question)
+            if key not in seen:
+                seen.add(key)
+                added.append(q)
+        _save_quiz_bank(doc_id, bank + added)
+    # Banks are rewritten whenever a quiz is served, so the least recently
+    # quizzed documents go first
+    prune(QUIZ_BANK_DIR.glob("*.json"), QUIZ_BANK_MAX_MB << 20, keep={_bank_path(doc_id).name})
+    annotate(sections=len(picked), questions=len(added), duplicates=len(new_questions) - len(added))
+    logger.info(
+        "Quiz bank for %s: +%d questions (%d repeats dropped)",
+        doc_id, len(added), len(new_questions) - len(added),
+    )
+    return len(added)
+
+
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+_jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-bank")
+_pending: set = set()
+
+
+def _bank_lock(doc_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks[doc_id]
+
+
+def schedule_quiz_bank(doc_id: str, min_unserved: int = 2 * QUIZ_SIZE) -> bool:
+    """
+    Refill the bank in the background unless it already holds `min_unserved`
+    unserved questions or a refill is already queued. Returns whether one was queued.
+    """
+    with _locks_guard:
+        if doc_id in _pending:
+            return False
+        if sum(not q.served for q in load_quiz_bank(doc_id)) >= min_unserved:
+            return False
+        _pending.add(doc_id)
+
+    def _job():
+        try:
+            run_sync(afill_quiz_bank(doc_id))
+        except Exception:
+            logger.exception("Quiz bank refill for %s failed", doc_id)
+        finally:
+            with _locks_guard:
+                _pending.discard(doc_id)
+
+    _jobs.submit(_job)
+    return True
+
+
+def _choose(unserved: List[QuizQuestion], size: int) -> List[QuizQuestion]:
+    """A balanced quiz: types in equal shares, sections and difficulties rotated."""
+    by_type: Dict[str, List[QuizQuestion]] = defaultdict(list)
+    for q in sorted(unserved, key=lambda q: (q.section, DIFFICULTIES.index(q.difficulty))):
+        by_type[q.type].append(q)
+    chosen: List[QuizQuestion] = []
+    used_sections: Counter = Counter()
+    while len(chosen) < size and any(by_type.values()):
+        for kind in QUESTION_TYPES:
+            if not by_type[kind] or len(chosen) >= size:
+                continue
+            # Least-used section first, so one quiz covers as much of the document as it can
+            best = min(by_type[kind], key=lambda q: used_sections[q.section])
+            by_type[kind].remove(best)
+            used_sections[best.section] += 1
+            chosen.append(best)
+    return chosen
+
+
+def take_quiz(doc_id: str, size: int = QUIZ_SIZE) -> List[QuizQuestion]:
+    """Serve `size` unserved questions from the bank (fewer if it runs low) and schedule a refill."""
+    with _bank_lock(doc_id):
+        bank = load_quiz_bank(doc_id)
+        chosen = _choose([q for q in bank if not q.served], size)
+        if chosen:
+            ids = {q.id for q in chosen}
+            for q in bank:
+                if q.id in ids:
+                    q.served = True
+            _save_quiz_bank(doc_id, bank)
+    schedule_quiz_bank(doc_id)
+    return chosen
+
+
+def format_quiz(questions: List[QuizQuestion]) -> str:
+    titles = {
+        "mcq": "Multiple choice",
+        "true_false": "True / False",
+        "short_answer": "Short answer",
+    }
+    lines: List[str] = []
+    number = 0
+    for kind in QUESTION_TYPES:
+        group = [q for q in questions if q.type == kind]
+        if not group:
+            continue
+        lines.append(f"### {titles[kind]}")
+        for q in group:
+            number += 1
+            if q.first_page == q.last_page:
+                pages = f"p. {q.first_page + 1}"
+            else:
+                pages = f"pp. {q.first_page + 1}–{q.last_page + 1}"
+            lines.append(f"**{number}. {q.question}** _({q.difficulty}, {pages})_")
+            lines.extend(f"- {letter}) {option}" for letter, option in zip("ABCD", q.options))
+            lines.append(f"\n_Answer: {q.answer}_\n")
+    return "\n".join(lines).strip()
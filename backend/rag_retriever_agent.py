@@ -1,8 +1,17 @@
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
+from .async_runtime import Emit, ainvoke_llm, emit_step, run_sync, to_thread
+from .context_packer import candidate_count, pack_context
+from .fast_path import REFUSAL_ANSWER, route_index
 from .llm_provider import get_llm
-from .vector_store import load_vector_store
+from .tracing import annotate, traced
+from .vector_store import (
+    load_parent_chunks,
+    load_summary_index,
+    search_documents,
+    search_summaries,
+)
 
 ROUTER_PROMPT = ChatPromptTemplate.from_messages(
     [
@@ -11,46 +20,83 @@ ROUTER_PROMPT = ChatPromptTemplate.from_messages(
             """
 You are a retrieval router agent.
 
-For now there is only ONE index of raw chunks for the PDF,
-but you should still analyze the question for difficulty and specificity.
-In future, you might choose between RAW and SUMMARY indexes.
+There are two indexes for the PDF:
+- RAW: passages of the document. Best for specific facts, names, numbers,
+  definitions, quotes and details.
+- SUMMARY: summaries of the document's sections. Best for overviews, main
+  points, themes and questions about the document as a whole.
 
-For now, always answer with "RAW".
+Analyze the question for difficulty and specificity and choose one index.
+Answer with exactly one word: RAW or SUMMARY.
 """,
         ),
-        ("human", "Question:\n{question}\n\nYour choice (RAW):"),
+        ("human", "Question:\n{question}\n\nYour choice (RAW or SUMMARY):"),
     ]
 )
 
-def _route_index(question: str) -> str:
+@traced("route")
+async def _route_index(question: str) -> str:
     llm = get_llm()
     chain = ROUTER_PROMPT | llm
-    choice = str(chain.invoke({"question": question})).strip().upper()
-    # Since we only have one index, force RAW as a safe default.
-    if choice not in {"RAW"}:
-        return "RAW"
-    return choice
+    choice = str(await chain.ainvoke({"question": question})).strip().upper()
+    # Anything but a clear SUMMARY falls back to the raw passages
+    return "SUMMARY" if choice.startswith("SUMMARY") else "RAW"
 
-def retrieve_context_agentic(query: str, k: int = 25) -> List[Document]:
+@traced("retrieve")
+async def aretrieve_context_agentic(
+    query: str, doc_id: str, k: Optional[int] = None, emit: Emit = None
+) -> List[Document]:
     """
-    Agentic-style retrieval wrapper, currently over a single raw index.
-    Router is kept for future extension, but always ends up using RAW.
+    Agentic-style retrieval over one document: the router picks the RAW
+    passages or the SUMMARY index (section summaries); the LLM router only
+    runs when the fast path cannot decide.
+    By default only as many chunks as the context budget can use are fetched.
     """
-    _ = _route_index(query)  # kept for extensibility
-    vectorstore = load_vector_store()
-    retriever = vectorstore.as_retriever(search_kwargs={"k": k})
-    docs = retriever.invoke(query)
+    if k is None:
+        k = candidate_count()
+    has_summaries = bool(await to_thread(load_summary_index, doc_id))
+    index = route_index(query, ("RAW", "SUMMARY") if has_summaries else ("RAW",))
+    if index is None:
+        index = await _route_index(query)
+    if index == "SUMMARY":
+        docs = await to_thread(search_summaries, doc_id, query, k)
+    else:
+        docs = await to_thread(search_documents, doc_id, query, k)
+    annotate(index=index, hits=len(docs))
+    emit_step(emit, f"Retrieved {len(docs)} hits from the {index} index")
     return docs
 
-def answer_with_rag(query: str) -> Tuple[str, List[Document]]:
+def retrieve_context_agentic(query: str, doc_id: str, k: Optional[int] = None) -> List[Document]:
+    return run_sync(aretrieve_context_agentic(query, doc_id, k))
+
+@traced("pack_context")
+def _pack(query: str, doc_id: str, docs: List[Document]) -> Tuple[str, List[Document]]:
+    return pack_context(query, docs, parents=load_parent_chunks(doc_id))
+
+async def aretrieve_and_pack(
+    query: str, doc_id: str, docs: Optional[List[Document]] = None, emit: Emit = None
+) -> Tuple[str, List[Document]]:
+    """Context for `query` within the token budget, and the passages it contains."""
+    if docs is None:
+        docs = await aretrieve_context_agentic(query, doc_id, emit=emit)
+    return await to_thread(_pack, query, doc_id, docs)
+
+@traced("rag_answer")
+async def aanswer_with_rag(
+    query: str, doc_id: str, docs: Optional[List[Document]] = None, emit: Emit = None
+) -> Tuple[str, List[Document]]:
+    """
+    Retrieve (unless `docs` were already retrieved for `query`), pack and
+    answer. With `emit`, the answer is streamed as it is generated.
+    """
     llm = get_llm()
-    docs = retrieve_context_agentic(query)
-    context = "\n\n".join(d.page_content for d in docs)
+    context, docs = await aretrieve_and_pack(query, doc_id, docs, emit)
 
-    RAG_SYSTEM_PROMPT = """
+    RAG_SYSTEM_PROMPT = f"""
 You are a helpful assistant that answers questions about a specific PDF.
 Use ONLY the provided context (from the indexed chunks).
-Combine information from all chunks. If the answer is not in the context, say you don't know.
+Combine information from all chunks. If the answer is not in the context, reply
+with exactly "{REFUSAL_ANSWER}" and nothing else.
 """
 
     prompt = ChatPromptTemplate.from_messages(
@@ -60,5 +106,8 @@ Combine information from all chunks. If the answer is not in the context, say yo
         ]
     )
     chain = prompt | llm
-    answer = chain.invoke({"context": context[:8000], "question": query})
-    return answer, docs
\ No newline at end of file
+    answer = await ainvoke_llm(chain, {"context": context, "question": query}, emit, "answer")
+    return answer, docs
+
+def answer_with_rag(query: str, doc_id: str) -> Tuple[str, List[Document]]:
+    return run_sync(aanswer_with_rag(query, doc_id))
\ No newline at end of file
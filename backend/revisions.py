@@ -0,0 +1,96 @@
+# backend/revisions.py
+# Incremental re-indexing: a revised PDF is diffed page by page against an
+# earlier ingested revision. Unchanged pages keep their passages, chunks and
+# vectors; only new or changed pages are split and embedded, and pages that
+# disappeared simply are not carried over.
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .ingest_cache import CachedIngestion, load_cached_ingestion
+from .pdf_loader import parent_chunk_id
+
+# (parent, children, children's vectors) of one passage
+ReusedPassage = Tuple[Document, List[Document], np.ndarray]
+
+
+class RevisionDiff:
+    """
+    Page-level diff of a new revision against a base ingestion. The ingest
+    pipeline calls match() for every page of the new revision, in order;
+    a page whose fingerprint equals one of the base's pages gets that page's
+    passages back instead of being split and embedded again.
+    """
+
+    def __init__(self, base_doc_id: str, base: CachedIngestion):
+        self.base_doc_id = base_doc_id
+        self._chunks = base.chunks
+        self._vectors = base.vectors
+        self._base_pages = len(base.page_hashes)
+        self._pages_by_hash: Dict[str, Deque[int]] = {}
+        for number, page_hash in enumerate(base.page_hashes):
+            self._pages_by_hash.setdefault(page_hash, deque()).append(number)
+        self._parents_by_page: Dict[int, List[Document]] = {}
+        for parent in base.parents:
+            self._parents_by_page.setdefault(parent.metadata.get("page", 0), []).append(parent)
+        self._rows_by_parent: Dict[str, List[int]] = {}
+        for row, chunk in enumerate(base.chunks):
+            self._rows_by_parent.setdefault(chunk.metadata.get("parent_id"), []).append(row)
+        self.unchanged_pages = 0
+        self.changed_pages: List[int] = []
+        self.reused_chunks = 0
+
+    @classmethod
+    def load(cls, base_doc_id: str, params: dict) -> Optional["RevisionDiff"]:
+        """
+        None when the base is not cached, was ingested without page
+        fingerprints, or with other ingestion_params() than `params` (its
+        chunks and vectors would not match the new revision's).
+        """
+        base = load_cached_ingestion(base_doc_id)
+        if base is None or base.page_hashes is None or base.params != params:
+            return None
+        return cls(base_doc_id, base)
+
+    def match(self, page: Document, page_hash: str, start: int) -> Optional[List[ReusedPassage]]:
+        """
+        The base's passages for an unchanged page, re-labelled for its place
+        in the new revision (parents numbered from `start`); None when the
+        page is new or changed.
+        """
+        candidates = self._pages_by_hash.get(page_hash)
+        if not candidates:
+            self.changed_pages.append(page.metadata.get("page", 0))
+            return None
+        base_page = candidates.popleft()
+        self.unchanged_pages += 1
+        passages = []
+        for number, parent in enumerate(self._parents_by_page.get(base_page, []), start):
+            metadata = {**page.metadata, "parent_id": parent_chunk_id(number)}
+            rows = self._rows_by_parent.get(parent.metadata["parent_id"], [])
+            children = [
+                Document(page_content=self._chunks[row].page_content, metadata=dict(metadata))
+                for row in rows
+            ]
+            vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+            reused = Document(page_content=parent.page_content, metadata=metadata)
+            passages.append((reused, children, vectors))
+            self.reused_chunks += len(rows)
+        return passages
+
+    def stats(self, num_chunks: int) -> dict:
+        """What the new revision (of `num_chunks` chunks) reused, re-embedded and dropped."""
+        return {
+            "base_doc_id": self.base_doc_id,
+            "pages_unchanged": self.unchanged_pages,
+            # New or edited pages (0-based numbers in the new revision)
+            "pages_changed": len(self.changed_pages),
+            "changed_pages": self.changed_pages,
+            # Base pages with no identical page left (edited or deleted)
+            "base_pages_dropped": self._base_pages - self.unchanged_pages,
+            "chunks_reused": self.reused_chunks,
+            "chunks_embedded": num_chunks - self.reused_chunks,
+            "chunks_dropped": len(self._chunks) - self.reused_chunks,
+        }
@@ -1,6 +1,42 @@
 # backend/summarizer_agent.py
+import asyncio
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterable, Awaitable, Callable, List, Optional, Tuple
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from .llm_provider import get_llm
+from .async_runtime import (
+    AgentEvent,
+    Emit,
+    ainvoke_llm,
+    emit_step,
+    run_sync,
+    stream_events,
+    to_thread,
+)
+from .config import (
+    CHUNK_SIZE,
+    SUMMARY_CACHE_DIR,
+    SUMMARY_CACHE_MAX_MB,
+    SUMMARY_GROUP_CHARS,
+    SUMMARY_MAX_CONCURRENCY,
+)
+from .context_packer import render_context
+from .disk_lru import prune, touch
+from .llm_provider import get_llm, llm_identity
+from .pdf_loader import iter_chunks
+from .tracing import span, traced
+
+# The structured-summary agents read at most this much text: the whole
+# document if it is short, otherwise the reduced section summaries
+SUMMARY_INPUT_CHARS = 12000
+
+# The summary cache is pruned to SUMMARY_CACHE_MAX_MB every this many writes
+_PRUNE_EVERY_WRITES = 64
+_writes = 0
+_writes_lock = threading.Lock()
 
 BASE_SUMMARY_SYSTEM_PROMPT = """
 You are an expert document summarizer.
@@ -86,16 +122,17 @@ Requirements:
     ]
 )
 
-def _first_pass_summary(doc_text: str, doc_type: str) -> str:
+async def _first_pass_summary(doc_text: str, doc_type: str, emit: Emit = None) -> str:
     llm = get_llm()
     chain = FIRST_PASS_PROMPT | llm
-    return chain.invoke({"doc_type": doc_type, "content": doc_text[:12000]})
+    inputs = {"doc_type": doc_type, "content": doc_text[:SUMMARY_INPUT_CHARS]}
+    return await ainvoke_llm(chain, inputs, emit, "draft summary")
 
-def _critique_summary(doc_text: str, doc_type: str, summary: str) -> tuple[str, str]:
+async def _critique_summary(doc_text: str, doc_type: str, summary: str) -> tuple[str, str]:
     llm = get_llm()
     chain = CRITIC_PROMPT | llm
-    raw = chain.invoke(
-        {"doc_type": doc_type, "content": doc_text[:8000], "summary": summary}
+    raw = await chain.ainvoke(
+        {"doc_type": doc_type, "content": doc_text[:SUMMARY_INPUT_CHARS], "summary": summary}
     )
     # very lightweight JSON-ish parsing – LLM output is small
     grade = "BAD"
@@ -117,30 +154,291 @@ def _critique_summary(doc_text: str, doc_type: str, summary: str) -> tuple[str,
             missing = raw
     return grade, missing
 
-def _refine_summary(doc_text: str, doc_type: str, summary: str, missing: str) -> str:
+async def _refine_summary(
+    doc_text: str, doc_type: str, summary: str, missing: str, emit: Emit = None
+) -> str:
     llm = get_llm()
     chain = REFINER_PROMPT | llm
-    return chain.invoke(
-        {
-            "doc_type": doc_type,
-            "content": doc_text[:12000],
-            "summary": summary,
-            "missing": missing,
-        }
-    )
+    inputs = {
+        "doc_type": doc_type,
+        "content": doc_text[:SUMMARY_INPUT_CHARS],
+        "summary": summary,
+        "missing": missing,
+    }
+    return await ainvoke_llm(chain, inputs, emit, "refined summary")
 
-def summarize_document(doc_text: str, doc_type: str) -> str:
+@traced("structured_summary")
+async def _structured_summary(content: str, doc_type: str, emit: Emit = None) -> str:
     """
     Agentic summarization:
     - First-pass summary
     - Critic grades it
     - If BAD, run a refinement pass using critic feedback
     """
-    draft = _first_pass_summary(doc_text, doc_type)
-    grade, missing = _critique_summary(doc_text, doc_type, draft)
+    draft = await _first_pass_summary(content, doc_type, emit)
+    grade, missing = await _critique_summary(content, doc_type, draft)
+    emit_step(emit, f"Critic graded the draft {grade}")
 
     if grade == "GOOD":
         return draft
 
-    improved = _refine_summary(doc_text, doc_type, draft, missing)
-    return improved
\ No newline at end of file
+    if emit is not None:
+        emit(AgentEvent("reset"))
+    improved = await _refine_summary(content, doc_type, draft, missing, emit)
+    return improved
+
+# Map-reduce over long documents: sections of consecutive passages are
+# summarized independently (in parallel), then the section summaries are
+# merged level by level until they fit the structured-summary agents.
+SECTION_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+You summarize one section of a longer document.
+Write a dense, factual summary of the section in at most 200 words.
+
+Guidelines:
+- Keep names, numbers, definitions, identifiers and conclusions.
+- Focus only on information present in the section.
+- Do NOT hallucinate or add commentary.
+""",
+        ),
+        ("human", "Section text:\n{content}\n\nSection summary:"),
+    ]
+)
+
+REDUCE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+You merge summaries of consecutive sections of one document into a single
+summary of that part of the document, in at most 300 words.
+
+Guidelines:
+- Keep the order of the sections.
+- Keep names, numbers, definitions and conclusions; drop repetition.
+- Do NOT add information that is not in the summaries.
+""",
+        ),
+        ("human", "Section summaries:\n{content}\n\nMerged summary:"),
+    ]
+)
+
+@dataclass
+class DocumentSummary:
+    summary: str
+    # Section summaries (the SUMMARY index); the summary itself for short documents
+    sections: List[Document]
+
+def _boundary_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+
+class SectionGrouper:
+    """
+    Groups consecutive passages into sections of at most `target_chars`.
+
+    Past half the target, a section also ends after any passage whose text
+    hash hits 1 in 4. Boundaries therefore depend on content, not on
+    position: an edit early in a document does not shift every later
+    section, so their cached summaries stay valid.
+    """
+
+    def __init__(self, target_chars: int = SUMMARY_GROUP_CHARS):
+        self.target_chars = target_chars
+        self._group: List[Document] = []
+        self._chars = 0
+
+    def push(self, passage: Document) -> Optional[List[Document]]:
+        """Add a passage; returns the section it completed, if any."""
+        done = None
+        if self._group and self._chars + len(passage.page_content) > self.target_chars:
+            done = self.flush()
+        self._group.append(passage)
+        self._chars += len(passage.page_content)
+        if self._chars >= self.target_chars // 2 and _boundary_hash(passage.page_content) % 4 == 0:
+            return done or self.flush()
+        return done
+
+    def flush(self) -> Optional[List[Document]]:
+        group, self._group, self._chars = self._group, [], 0
+        return group or None
+
+def _cache_path(kind: str, prompt: ChatPromptTemplate, text: str):
+    payload = json.dumps(
+        {"kind": kind, "llm": llm_identity(), "prompt": prompt.pretty_repr(), "text": text},
+        sort_keys=True,
+    )
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return SUMMARY_CACHE_DIR / key[:2] / f"{key}.txt"
+
+def _read_cached(path) -> Optional[str]:
+    try:
+        summary = path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+    touch(path)
+    return summary
+
+def _write_cached(path, summary: str):
+    global _writes
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(summary, encoding="utf-8")
+    tmp_path.replace(path)
+    with _writes_lock:
+        _writes += 1
+        due = _writes % _PRUNE_EVERY_WRITES == 0
+    if due:
+        prune(SUMMARY_CACHE_DIR.glob("*/*.txt"), SUMMARY_CACHE_MAX_MB << 20, keep={path.name})
+
+async def _cached_summary(
+    kind: str, prompt: ChatPromptTemplate, text: str, semaphore: asyncio.Semaphore
+) -> Tuple[str, bool]:
+    """
+    Partial summary of `text`, reused across runs (and document revisions)
+    when the text is unchanged; returns (summary, whether it was reused).
+    """
+    with span(f"summary_{kind}", chars=len(text)) as s:
+        path = _cache_path(kind, prompt, text)
+        cached = await to_thread(_read_cached, path)
+        s.set(cache_hit=cached is not None)
+        if cached is not None:
+            return cached, True
+        async with semaphore:
+            summary = (await (prompt | get_llm()).ainvoke({"content": text})).strip()
+        await to_thread(_write_cached, path, summary)
+        return summary, False
+
+def _section_document(passages: List[Document], number: int, summary: str) -> Document:
+    first, last = passages[0].metadata, passages[-1].metadata
+    return Document(
+        page_content=summary,
+        metadata={
+            "source": first.get("source", ""),
+            "chunk_id": f"section-{number}",
+            "first_page": first.get("page", 0),
+            "last_page": last.get("page", 0),
+        },
+    )
+
+async def _summarize_section(
+    passages: List[Document], number: int, semaphore: asyncio.Semaphore, emit: Emit = None
+) -> Document:
+    summary, cached = await _cached_summary(
+        "section", SECTION_PROMPT, render_context(passages), semaphore
+    )
+    section = _section_document(passages, number, summary)
+    # Sections a document revision did not touch keep their summary
+    section.metadata["summary_cached"] = cached
+    emit_step(
+        emit,
+        f"{'Reused the summary of' if cached else 'Summarized'} section {number + 1} "
+        f"(pages {section.metadata['first_page'] + 1}–{section.metadata['last_page'] + 1})",
+    )
+    return section
+
+async def _reduce(summaries: List[str], semaphore: asyncio.Semaphore, emit: Emit = None) -> str:
+    """Merge summaries level by level until they fit SUMMARY_INPUT_CHARS."""
+    while True:
+        text = "\n\n".join(summaries)
+        if len(text) <= SUMMARY_INPUT_CHARS or len(summaries) == 1:
+            return text
+        groups: List[List[str]] = [[]]
+        chars = 0
+        for summary in summaries:
+            if groups[-1] and chars + len(summary) > SUMMARY_GROUP_CHARS:
+                groups.append([])
+                chars = 0
+            groups[-1].append(summary)
+            chars += len(summary)
+        if len(groups) == len(summaries):
+            # Every summary is as large as a group: merging would not shrink anything
+            return text[:SUMMARY_INPUT_CHARS]
+        emit_step(emit, f"Merging {len(summaries)} summaries into {len(groups)}")
+        merged = await asyncio.gather(
+            *(_cached_summary("reduce", REDUCE_PROMPT, "\n\n".join(g), semaphore) for g in groups)
+        )
+        summaries = [summary for summary, _ in merged]
+
+async def asummarize_passages(
+    passages: AsyncIterable[Document],
+    doc_type: Callable[[], Awaitable[str]],
+    max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+    emit: Emit = None,
+) -> DocumentSummary:
+    """
+    Summarize a document from its passages (in document order). A document
+    of at most SUMMARY_INPUT_CHARS characters is summarized whole. Longer
+    ones are map-reduced; passages can arrive while the document is still
+    being processed, and once it is known to be long each section is
+    summarized as soon as it is complete, with at most `max_concurrency`
+    LLM calls at a time. `doc_type` is awaited only for the final summary.
+    With `emit`, finished steps and the summary's tokens are reported.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    grouper = SectionGrouper()
+    tasks: List[asyncio.Task] = []
+    every_passage: List[Document] = []
+    # Sections are held back until the document is known to be too long
+    # for the structured-summary agents to read whole
+    held: List[List[Document]] = []
+    total_chars = 0
+
+    def _dispatch(groups: List[List[Document]]):
+        for group in groups:
+            tasks.append(
+                asyncio.create_task(_summarize_section(group, len(tasks), semaphore, emit))
+            )
+
+    try:
+        async for passage in passages:
+            every_passage.append(passage)
+            total_chars += len(passage.page_content)
+            group = grouper.push(passage)
+            if group is not None:
+                held.append(group)
+            if total_chars > SUMMARY_INPUT_CHARS:
+                _dispatch(held)
+                held = []
+        rest = grouper.flush()
+
+        if total_chars <= SUMMARY_INPUT_CHARS:
+            # Short document: the structured-summary agents read all of it
+            content = render_context(every_passage)
+            summary = await _structured_summary(content, await doc_type(), emit)
+            section = _section_document(every_passage, 0, summary) if every_passage else None
+            return DocumentSummary(summary, [section] if section else [])
+
+        if rest is not None:
+            _dispatch([rest])
+        sections = list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    content = await _reduce([s.page_content for s in sections], semaphore, emit)
+    summary = await _structured_summary(content, await doc_type(), emit)
+    return DocumentSummary(summary, sections)
+
+async def asummarize_document(doc_text: str, doc_type: str, emit: Emit = None) -> str:
+    """Summary of a whole text, however long (map-reduce over its sections)."""
+
+    async def _passages():
+        for passage in iter_chunks([Document(page_content=doc_text)], CHUNK_SIZE, 0):
+            yield passage
+
+    async def _doc_type():
+        return doc_type
+
+    summary = await asummarize_passages(_passages(), _doc_type, emit=emit)
+    return summary.summary
+
+def summarize_document(doc_text: str, doc_type: str) -> str:
+    return run_sync(asummarize_document(doc_text, doc_type))
+
+def stream_summarize_document(doc_text: str, doc_type: str):
+    """Like summarize_document, as a stream of AgentEvents; "done" carries the summary."""
+    return stream_events(lambda emit: asummarize_document(doc_text, doc_type, emit))
\ No newline at end of file
@@ -0,0 +1,241 @@
+# backend/tracing.py
+# Per-request traces: nested, timed spans carried through threads and
+# asyncio tasks by a context variable. Finished traces are kept in memory
+# (for the app's debug panel) and appended to a JSONL file, one span per
+# line, with OpenTelemetry span field names.
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from .config import TRACE_DIR, TRACE_EXPORT, TRACE_KEEP, ensure_data_dirs
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: os.urandom(8).hex())
+    parent_id: Optional[str] = None
+    start: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "OK"
+
+    @property
+    def duration_ms(self) -> float:
+        return round(((self.end or time.time()) - self.start) * 1000, 2)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1):
+        """Increment a counter attribute (token counts, cache hits, ...)."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def as_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": int(self.start * 1e9),
+            "end_time_unix_nano": int((self.end or time.time()) * 1e9),
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+_current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("span", default=None)
+_lock = threading.Lock()
+# trace_id -> finished spans, for traces whose root is still open
+_open: Dict[str, List[Span]] = {}
+# trace_id -> all spans of recently finished traces, oldest first
+_finished: "OrderedDict[str, List[dict]]" = OrderedDict()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(**attributes):
+    """Set attributes on the current span, if there is one."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attributes)
+
+
+def count(key: str, amount: float = 1):
+    """Increment a counter on the current span, if there is one."""
+    span = _current.get()
+    if span is not None:
+        span.add(key, amount)
+
+
+def _start(name: str, attributes: dict, parent: Optional[Span]) -> Span:
+    if parent is None:
+        span = Span(name, trace_id=os.urandom(16).hex(), attributes=attributes)
+        with _lock:
+            _open[span.trace_id] = []
+    else:
+        span = Span(
+            name, trace_id=parent.trace_id, parent_id=parent.span_id, attributes=attributes
+        )
+    return span
+
+
+def _finish(span: Span, error: Optional[BaseException] = None):
+    span.end = time.time()
+    if isinstance(error, asyncio.CancelledError):
+        # Abandoned on purpose (e.g. speculative work that was not needed)
+        span.attributes["cancelled"] = True
+    elif error is not None:
+        span.status = "ERROR"
+        span.attributes["error"] = f"{type(error).__name__}: {error}"
+    with _lock:
+        spans = _open.get(span.trace_id)
+        if spans is None:
+            # Finished after its root (e.g. a cancelled speculative task)
+            return
+        spans.append(span)
+        if span.parent_id is not None:
+            return
+        del _open[span.trace_id]
+        records = [s.as_dict() for s in sorted(spans, key=lambda s: s.start)]
+        _finished[span.trace_id] = records
+        while len(_finished) > TRACE_KEEP:
+            _finished.popitem(last=False)
+    if TRACE_EXPORT:
+        _export(records)
+
+
+def start_span(name: str, **attributes) -> Optional[Span]:
+    """
+    Open a child of the current span without making it current, for work
+    that ends in another callback (e.g. an LLM call); None outside a trace.
+    Close it with end_span().
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    return _start(name, attributes, parent)
+
+
+def end_span(span: Span, error: Optional[BaseException] = None):
+    """Close a span opened by start_span(), recording `error` if it failed."""
+    _finish(span, error)
+
+
+def _export(records: List[dict]):
+    path = TRACE_DIR / f"traces-{time.strftime('%Y%m%d')}.jsonl"
+    try:
+        ensure_data_dirs()
+        with open(path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+    except OSError as exc:
+        logger.warning("Could not export trace to %s: %s", path, exc)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Time a block as a child of the current span; without one, it starts a
+    new trace. The trace is exported when its root span ends.
+    """
+    s = _start(name, attributes, _current.get())
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as exc:
+        _finish(s, exc)
+        raise
+    else:
+        _finish(s)
+    finally:
+        _current.reset(token)
+
+
+def traced(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator: run every call of a function (sync or async) in a span."""
+
+    def _decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def _async(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+
+            return _async
+
+        @functools.wraps(fn)
+        def _sync(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return _sync
+
+    return _decorate
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """`fn` bound to the caller's context, so spans it opens in another thread nest correctly."""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
+
+
+def get_trace(trace_id: str) -> List[dict]:
+    """Spans of a finished trace (oldest first), or [] if it is unknown or expired."""
+    with _lock:
+        return list(_finished.get(trace_id, []))
+
+
+def recent_traces() -> List[List[dict]]:
+    """Recently finished traces, newest first."""
+    with _lock:
+        return [list(spans) for spans in reversed(_finished.values())]
+
+
+def breakdown(spans: List[dict]) -> List[dict]:
+    """Rows for a latency table: each span with its depth and share of the trace."""
+    if not spans:
+        return []
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in spans:
+        children.setdefault(s["parent_span_id"], []).append(s)
+    ids = {s["span_id"] for s in spans}
+    roots = [s for s in spans if s["parent_span_id"] not in ids]
+    total = max(sum(r["duration_ms"] for r in roots), 1e-9)
+    rows: List[dict] = []
+
+    def _walk(s: dict, depth: int):
+        rows.append(
+            {
+                "span": "  " * depth + s["name"],
+                "ms": s["duration_ms"],
+                "share": round(s["duration_ms"] / total, 3),
+                "status": s["status"],
+                "attributes": json.dumps(s["attributes"], default=str),
+            }
+        )
+        for child in children.get(s["span_id"], []):
+            _walk(child, depth + 1)
+
+    for root in roots:
+        _walk(root, 0)
+    return rows
@@ -0,0 +1,85 @@
+# backend/vector_backend.py
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# Search hits: (document, cosine similarity), best first
+SearchResults = List[Tuple[Document, float]]
+
+
+class VectorIndex:
+    """The vectors of one document, as stored by a backend."""
+
+    def add(self, ids: Sequence[str], chunks: Sequence[Document], vectors) -> None:
+        raise NotImplementedError
+
+    def search(self, query_vector, k: int, where: Optional[dict] = None) -> SearchResults:
+        raise NotImplementedError
+
+    def get(self, ids: Sequence[str]) -> List[Document]:
+        """Stored chunks by id, in the order given; unknown ids are skipped."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class VectorBackend:
+    """
+    Storage engine behind vector_store's per-document lifecycle API. Indexes
+    are named by vector_store: each build of a document gets its own name.
+    """
+
+    name = ""
+
+    def create(self, doc_id: str) -> VectorIndex:
+        """Fresh, empty index for `doc_id`, replacing any existing one."""
+        raise NotImplementedError
+
+    def open(self, doc_id: str) -> VectorIndex:
+        raise NotImplementedError
+
+    def drop(self, doc_id: str) -> None:
+        raise NotImplementedError
+
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, operand in condition.items():
+        if op == "$eq" and not value == operand:
+            return False
+        if op == "$ne" and not value != operand:
+            return False
+        if op == "$in" and value not in operand:
+            return False
+        if op == "$nin" and value in operand:
+            return False
+        if op in ("$gt", "$gte", "$lt", "$lte"):
+            if value is None:
+                return False
+            if op == "$gt" and not value > operand:
+                return False
+            if op == "$gte" and not value >= operand:
+                return False
+            if op == "$lt" and not value < operand:
+                return False
+            if op == "$lte" and not value <= operand:
+                return False
+    return True
+
+
+def match_where(metadata: Dict[str, Any], where: Optional[dict]) -> bool:
+    """Evaluate a Chroma-style `where` filter ($and/$or, $eq/$ne/$in/$nin/$gt...) in Python."""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, sub) for sub in condition):
+                return False
+        elif not _match_condition(metadata.get(key), condition):
+            return False
+    return True
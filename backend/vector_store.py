@@ -1,38 +1,446 @@
 # backend/vector_store.py
-from typing import List
-from langchain_community.vectorstores import Chroma
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
 from langchain_core.documents import Document
-from .config import CHROMA_DIR, CHROMA_COLLECTION
+from .config import (
+    DATA_DIR,
+    HYBRID_SEARCH,
+    LEXICAL_INDEX_DIR,
+    MAX_CACHED_COLLECTIONS,
+    PARENT_STORE_DIR,
+    RRF_K,
+    SUMMARY_INDEX_DIR,
+    VECTOR_BACKEND,
+    ensure_data_dirs,
+)
+from .embedding_cache import get_embedding_cache
+from .file_lock import FileLock
+from .ingest_cache import ingestion_lock, load_cached_ingestion
+from .lexical_index import BM25Index, reciprocal_rank_fusion
 from .llm_provider import get_embeddings
+from .numpy_store import NumpyIndex, code_bytes, evaluate_sampled_recall, top_k
+from .tracing import span, traced
+from .vector_backend import VectorBackend, VectorIndex, match_where
+
+# Per-document index bookkeeping: doc_id -> {backend, num_chunks, last_used, ...}
+MANIFEST_PATH = DATA_DIR / "indexes.json"
+
+_lock = threading.RLock()
+# Held (after _lock) while the manifest is read and rewritten, across every
+# process sharing DATA_DIR
+_manifest_lock = FileLock(DATA_DIR / "indexes.lock")
+_backends: Dict[str, VectorBackend] = {}
+# Loaded BM25 indexes, parent passages and section summaries, most recently used last
+_lexical_cache: "OrderedDict[str, BM25Index]" = OrderedDict()
+_parent_cache: "OrderedDict[str, Dict[str, Document]]" = OrderedDict()
+_summary_cache: "OrderedDict[str, List[Document]]" = OrderedDict()
+# doc_id -> when this process last opened its index. Kept off the search
+# path: folded into the manifest's "last_used" whenever it is rewritten
+_last_used: Dict[str, float] = {}
+
+
+def get_backend(name: str = VECTOR_BACKEND) -> VectorBackend:
+    """Shared backend instance by name ("numpy" or "chroma")."""
+    with _lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name == "chroma":
+                from .chroma_store import ChromaBackend
 
+                backend = ChromaBackend()
+            elif name == "numpy":
+                from .numpy_store import NumpyBackend
 
-def _clear_collection(vs: Chroma):
-    """Delete all docs in a collection via Chroma API."""
+                backend = NumpyBackend()
+            else:
+                raise ValueError(f"Unknown VECTOR_BACKEND: {name!r}")
+            _backends[name] = backend
+        return backend
+
+
+def _read_manifest() -> dict:
     try:
-        vs._collection.delete(where={})
-    except Exception:
-        # On very old versions this may not exist; ignore silently
-        pass
-
-
-def build_vector_store(chunks: List[Document]):
-    """Index raw text chunks for the current PDF (single collection)."""
-    embeddings = get_embeddings()
-    vs = Chroma(
-        collection_name=CHROMA_COLLECTION,
-        embedding_function=embeddings,
-        persist_directory=str(CHROMA_DIR),
-    )
-    _clear_collection(vs)
-    vs.add_documents(chunks)
-    return vs
-
-
-def load_vector_store():
-    """Load the single collection for retrieval."""
-    embeddings = get_embeddings()
-    return Chroma(
-        collection_name=CHROMA_COLLECTION,
-        embedding_function=embeddings,
-        persist_directory=str(CHROMA_DIR),
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest: dict):
+    for doc_id, used in _last_used.items():
+        entry = manifest.get(doc_id)
+        if entry is not None:
+            entry["last_used"] = max(entry["last_used"], used)
+    _last_used.clear()
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+
+def _open_index(doc_id: str, entry: dict) -> VectorIndex:
+    # Indexes registered before builds were staged are stored under the doc_id
+    return get_backend(entry["backend"]).open(entry.get("index_id", doc_id))
+
+
+def _drop_index(doc_id: str, entry: dict):
+    get_backend(entry["backend"]).drop(entry.get("index_id", doc_id))
+
+
+def _lexical_path(doc_id: str):
+    return LEXICAL_INDEX_DIR / f"{doc_id}.json"
+
+
+def _parents_path(doc_id: str):
+    return PARENT_STORE_DIR / f"{doc_id}.jsonl"
+
+
+def _summary_path(doc_id: str):
+    return SUMMARY_INDEX_DIR / f"{doc_id}.json"
+
+
+def _cached_load(cache: OrderedDict, doc_id: str, loader):
+    with _lock:
+        value = cache.get(doc_id)
+        if value is not None:
+            cache.move_to_end(doc_id)
+            return value
+        try:
+            value = loader()
+        except (OSError, ValueError, KeyError):
+            return None
+        cache[doc_id] = value
+        while len(cache) > MAX_CACHED_COLLECTIONS:
+            cache.popitem(last=False)
+        return value
+
+
+def load_lexical_index(doc_id: str) -> Optional[BM25Index]:
+    """BM25 index built alongside the vectors, or None if the document has none."""
+    return _cached_load(_lexical_cache, doc_id, lambda: BM25Index.load(_lexical_path(doc_id)))
+
+
+def _read_parents(doc_id: str) -> Dict[str, Document]:
+    parents = {}
+    with open(_parents_path(doc_id), encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            parents[row["id"]] = Document(page_content=row["text"], metadata=row["metadata"])
+    return parents
+
+
+def load_parent_chunks(doc_id: str) -> Optional[Dict[str, Document]]:
+    """parent_id -> parent passage of a document, or None if it was indexed without parents."""
+    return _cached_load(_parent_cache, doc_id, lambda: _read_parents(doc_id))
+
+
+def build_summary_index(doc_id: str, sections: List[Document]):
+    """
+    Store a document's section summaries as its SUMMARY index. They are few,
+    so they are searched exhaustively; their vectors live in the embedding cache.
+    """
+    ensure_data_dirs()
+    if sections:
+        embed_chunks(sections)
+    path = _summary_path(doc_id)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump([{"text": s.page_content, "metadata": s.metadata} for s in sections], f)
+    os.replace(tmp_path, path)
+    with _lock:
+        _summary_cache.pop(doc_id, None)
+
+
+def _read_summaries(doc_id: str) -> List[Document]:
+    with open(_summary_path(doc_id), encoding="utf-8") as f:
+        return [Document(page_content=s["text"], metadata=s["metadata"]) for s in json.load(f)]
+
+
+def load_summary_index(doc_id: str) -> Optional[List[Document]]:
+    """Section summaries of a document, or None if it has no SUMMARY index."""
+    return _cached_load(_summary_cache, doc_id, lambda: _read_summaries(doc_id))
+
+
+@traced("search_summaries")
+def search_summaries(doc_id: str, query: str, k: int) -> List[Document]:
+    """Top-k section summaries of one document; cosine similarity in metadata["score"]."""
+    sections = load_summary_index(doc_id)
+    if not sections:
+        return []
+    vectors = embed_chunks(sections)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = np.asarray(get_embeddings().embed_query(query), dtype=np.float32)
+    scores = vectors @ (query_vector / max(float(np.linalg.norm(query_vector)), 1e-12))
+    docs = []
+    for i in top_k(scores, k):
+        section = sections[i]
+        docs.append(
+            Document(
+                page_content=section.page_content,
+                metadata={**section.metadata, "score": float(scores[i])},
+            )
+        )
+    return docs
+
+
+def embed_chunks(chunks: List[Document]):
+    """Embed chunk texts with the shared model, reusing cached vectors (float32 array)."""
+    return get_embedding_cache().embed(
+        [c.page_content for c in chunks], get_embeddings().embed_documents
     )
+
+
+class IndexWriter:
+    """
+    Incrementally fills a fresh index for one document. The document is
+    only registered in the manifest (and visible to retrieval) on commit().
+    The index is built under an id of its own, so an existing index of the
+    same document keeps serving queries until commit() replaces it.
+    """
+
+    def __init__(self, doc_id: str, backend: Optional[VectorBackend] = None):
+        self.doc_id = doc_id
+        self.backend = backend or get_backend()
+        self.index_id = f"{doc_id}-{uuid.uuid4().hex[:8]}"
+        self.count = 0
+        self.dim = 0
+        ensure_data_dirs()
+        self._index = self.backend.create(self.index_id)
+        self._lexical = BM25Index()
+        self._parents: List[Document] = []
+
+    def add(self, chunks: List[Document], vectors):
+        ids = [f"chunk-{i}" for i in range(self.count, self.count + len(chunks))]
+        for chunk_id, chunk in zip(ids, chunks):
+            chunk.metadata["chunk_id"] = chunk_id
+        self._index.add(ids, chunks, vectors)
+        self._lexical.add(ids, [c.page_content for c in chunks])
+        if len(chunks):
+            self.dim = len(vectors[0])
+        self.count += len(chunks)
+
+    def add_parents(self, parents: List[Document]):
+        """Store the passages the indexed (child) chunks point to via metadata["parent_id"]."""
+        self._parents.extend(parents)
+
+    def commit(self) -> VectorIndex:
+        self._lexical.save(_lexical_path(self.doc_id))
+        parents_path = _parents_path(self.doc_id)
+        if self._parents:
+            tmp_path = parents_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for parent in self._parents:
+                    row = {
+                        "id": parent.metadata["parent_id"],
+                        "text": parent.page_content,
+                        "metadata": parent.metadata,
+                    }
+                    f.write(json.dumps(row) + "\n")
+            os.replace(tmp_path, parents_path)
+        elif parents_path.exists():
+            os.remove(parents_path)
+        with _lock, _manifest_lock:
+            manifest = _read_manifest()
+            previous = manifest.get(self.doc_id)
+            now = time.time()
+            manifest[self.doc_id] = {
+                "backend": self.backend.name,
+                "index_id": self.index_id,
+                "num_chunks": self.count,
+                "dim": self.dim,
+                "quantization": getattr(self._index, "quantization", "none"),
+                "created_at": now,
+                "last_used": now,
+            }
+            _write_manifest(manifest)
+            _lexical_cache.pop(self.doc_id, None)
+            _parent_cache.pop(self.doc_id, None)
+            if previous is not None:
+                _drop_index(self.doc_id, previous)
+            _enforce_cap(keep=self.doc_id)
+        return self._index
+
+    def abort(self):
+        """Discard the unfinished index; a committed one of the document is untouched."""
+        self.backend.drop(self.index_id)
+
+
+def build_vector_store(
+    doc_id: str,
+    chunks: List[Document],
+    vectors: Optional[list] = None,
+    parents: Optional[List[Document]] = None,
+):
+    """
+    Index raw text chunks for one PDF into its own index, replacing any
+    previous index of the same document. Precomputed `vectors` (e.g. from the
+    ingestion cache) skip the embedder. `parents` are the larger passages
+    the chunks map to through metadata["parent_id"].
+    """
+    if vectors is None and chunks:
+        vectors = embed_chunks(chunks)
+    writer = IndexWriter(doc_id)
+    try:
+        writer.add(chunks, vectors)
+        writer.add_parents(parents or [])
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def has_vector_store(doc_id: str) -> bool:
+    return doc_id in _read_manifest()
+
+
+def index_version(doc_id: str) -> Optional[float]:
+    """Changes whenever the document is (re)indexed; None if it has no index."""
+    entry = _read_manifest().get(doc_id)
+    return entry["created_at"] if entry is not None else None
+
+
+def load_vector_store(doc_id: str) -> VectorIndex:
+    """
+    Open the index of one document for retrieval and mark it recently
+    used. An index evicted by the LRU cap is restored from the ingestion
+    cache without re-embedding.
+    """
+    with _lock:
+        # A read only: the manifest is replaced atomically
+        entry = _read_manifest().get(doc_id)
+        if entry is not None:
+            _last_used[doc_id] = time.time()
+            return _open_index(doc_id, entry)
+
+    # One restore per document; concurrent callers wait for it
+    with ingestion_lock(doc_id):
+        entry = _read_manifest().get(doc_id)
+        if entry is not None:
+            return _open_index(doc_id, entry)
+        cached = load_cached_ingestion(doc_id)
+        if cached is None:
+            raise KeyError(f"No index for document {doc_id}; ingest the PDF first.")
+        index = build_vector_store(doc_id, cached.chunks, cached.vectors, cached.parents)
+        build_summary_index(doc_id, cached.sections)
+        return index
+
+
+def list_vector_stores() -> List[dict]:
+    """All indexed documents, most recently used first."""
+    with _lock:
+        manifest = _read_manifest()
+        for doc_id, used in _last_used.items():
+            if doc_id in manifest:
+                manifest[doc_id]["last_used"] = max(manifest[doc_id]["last_used"], used)
+    entries = [
+        {
+            "doc_id": doc_id,
+            # float32 vectors only; backend overhead (e.g. Chroma's HNSW) comes on top
+            "approx_vector_bytes": entry["num_chunks"] * entry["dim"] * 4,
+            # Quantized codes scanned in memory by the first search stage
+            "approx_code_bytes": code_bytes(
+                entry.get("quantization", "none"), entry["num_chunks"], entry["dim"]
+            ),
+            **entry,
+        }
+        for doc_id, entry in manifest.items()
+    ]
+    return sorted(entries, key=lambda e: e["last_used"], reverse=True)
+
+
+def evaluate_quantization(doc_id: str, k: int = 10, queries: int = 100, seed: int = 0) -> dict:
+    """
+    Recall@k of a document's quantized numpy index against exact search
+    (numpy_store.evaluate_sampled_recall).
+    """
+    index = load_vector_store(doc_id)
+    if not isinstance(index, NumpyIndex):
+        raise ValueError(f"Document {doc_id} is not in a numpy index")
+    return evaluate_sampled_recall(index, k, queries, seed)
+
+
+@traced("search")
+def search_documents(
+    doc_id: str, query: str, k: int, where: Optional[dict] = None, hybrid: bool = HYBRID_SEARCH
+) -> List[Document]:
+    """
+    Top-k chunks of one document for `query`.
+
+    Dense hits carry their cosine similarity in metadata["score"]. With
+    `hybrid`, BM25 hits over the same chunks are fused in by reciprocal
+    rank fusion (metadata["rrf_score"]), so exact identifiers and codes
+    are found even when their embeddings are not close to the query.
+    """
+    index = load_vector_store(doc_id)
+    with span("embed_query"):
+        query_vector = get_embeddings().embed_query(query)
+    lexical = load_lexical_index(doc_id) if hybrid else None
+    # Fusion needs a deeper pool than the final k from each side
+    pool = k * 2 if lexical is not None else k
+
+    dense = []
+    with span("vector_search", backend=VECTOR_BACKEND, k=pool):
+        for doc, score in index.search(query_vector, pool, where=where):
+            doc.metadata["score"] = score
+            dense.append(doc)
+    if lexical is None:
+        return dense
+
+    with span("bm25_search"):
+        lexical_hits = lexical.search(query, pool * 2 if where else pool)
+    by_id = {d.metadata["chunk_id"]: d for d in dense}
+    missing = [chunk_id for chunk_id, _ in lexical_hits if chunk_id not in by_id]
+    for doc in index.get(missing):
+        by_id[doc.metadata["chunk_id"]] = doc
+    bm25_scores = dict(lexical_hits)
+    lexical_ranking = [
+        chunk_id for chunk_id, _ in lexical_hits
+        if chunk_id in by_id and match_where(by_id[chunk_id].metadata, where)
+    ][:pool]
+
+    docs = []
+    for chunk_id, rrf_score in reciprocal_rank_fusion(
+        [[d.metadata["chunk_id"] for d in dense], lexical_ranking], k=RRF_K
+    )[:k]:
+        doc = by_id[chunk_id]
+        doc.metadata["rrf_score"] = rrf_score
+        if chunk_id in bm25_scores:
+            doc.metadata["bm25_score"] = bm25_scores[chunk_id]
+        docs.append(doc)
+    return docs
+
+
+def evict_vector_store(doc_id: str) -> bool:
+    """Drop one document's index from disk. Returns False if it was not indexed."""
+    with _lock, _manifest_lock:
+        manifest = _read_manifest()
+        entry = manifest.pop(doc_id, None)
+        if entry is None:
+            return False
+        _drop_index(doc_id, entry)
+        _lexical_cache.pop(doc_id, None)
+        _parent_cache.pop(doc_id, None)
+        _summary_cache.pop(doc_id, None)
+        for path in (_lexical_path(doc_id), _parents_path(doc_id), _summary_path(doc_id)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _write_manifest(manifest)
+    return True
+
+
+def _enforce_cap(keep: Optional[str] = None):
+    """Evict least recently used indexes beyond MAX_CACHED_COLLECTIONS."""
+    with _lock, _manifest_lock:
+        entries = list_vector_stores()
+        for entry in entries[MAX_CACHED_COLLECTIONS:]:
+            if entry["doc_id"] != keep:
+                evict_vector_store(entry["doc_id"])
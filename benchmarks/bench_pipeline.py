@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark on synthetic PDFs, offline and deterministic.
+
+    python -m benchmarks.bench_pipeline --pages 20 100 400 --questions 20
+
+For each PDF size: ingestion throughput (pages/s, chunks/s, per-stage busy
+time), retrieval latency percentiles and recall@k of the planted facts,
+`answer_question` latency and how often the answer contains the fact,
+re-indexing time of a revision with --revise pages rewritten, and the
+process's peak memory. Unless overridden in the environment, the LLM
+is the fake stand-in (LLM_PROVIDER=fake), embeddings are feature-hashed
+(EMBEDDING_PROVIDER=hash), caches that would hide repeated work are off
+and all data goes to a temporary DATA_DIR.
+
+The JSON report (benchmarks/results/<time>-<commit>.json, or --out) can be
+compared with another one by `python -m benchmarks.compare OLD NEW`.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.synthetic_pdf import generate_pdf, revise_pages, synthetic_pages, write_pdf
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Offline, repeatable defaults; any of them can be overridden from the environment
+BENCH_ENV = {
+    "LLM_PROVIDER": "fake",
+    "EMBEDDING_PROVIDER": "hash",
+    "ANSWER_CACHE_ENABLED": "0",
+    "LLM_CACHE_ENABLED": "0",
+    "QUIZ_BANK_ENABLED": "0",
+    "TRACE_EXPORT": "0",
+}
+
+
+def _percentiles_ms(samples) -> dict:
+    if not samples:
+        return {}
+    return {
+        f"p{q}_ms": round(float(np.percentile(samples, q)) * 1000, 3) for q in (50, 95, 99)
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def bench_document(
+    pages: int, facts: int, questions: int, k: int, workdir: Path, seed: int, revise: int = 0
+) -> dict:
+    from backend.async_runtime import run_sync
+    from backend.ingestion import ingest_pdf
+    from backend.qa_agent import answer_question
+    from backend.rag_retriever_agent import aretrieve_and_pack
+    from backend.vector_store import search_documents
+
+    pdf_path = workdir / f"synthetic-{pages}p-{seed}.pdf"
+    planted = generate_pdf(pdf_path, pages, facts, seed)
+
+    t0 = time.perf_counter()
+    result = ingest_pdf(str(pdf_path))
+    ingest_seconds = time.perf_counter() - t0
+    ingest = {
+        "seconds": round(ingest_seconds, 3),
+        "pages_per_second": round(pages / ingest_seconds, 2),
+        "chunks_per_second": round(result.num_chunks / ingest_seconds, 2),
+        "chunks": result.num_chunks,
+        "stage_busy_seconds": {
+            name: s["busy_seconds"] for name, s in result.stage_stats.items()
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+    search_latency, hits, reciprocal_ranks = [], 0, []
+    pack_latency, context_hits = [], 0
+    for fact in planted:
+        t0 = time.perf_counter()
+        docs = search_documents(result.doc_id, fact.question, k)
+        search_latency.append(time.perf_counter() - t0)
+        rank = next(
+            (i for i, d in enumerate(docs, 1) if fact.answer in d.page_content), None
+        )
+        hits += rank is not None
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+        t0 = time.perf_counter()
+        context, _ = run_sync(aretrieve_and_pack(fact.question, result.doc_id))
+        pack_latency.append(time.perf_counter() - t0)
+        context_hits += fact.answer in context
+    retrieval = {
+        "k": k,
+        "queries": len(planted),
+        "search": _percentiles_ms(search_latency),
+        "retrieve_and_pack": _percentiles_ms(pack_latency),
+        "recall_at_k": round(hits / len(planted), 3) if planted else None,
+        "mrr": round(float(np.mean(reciprocal_ranks)), 3) if planted else None,
+        "context_recall": round(context_hits / len(planted), 3) if planted else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+    answer_latency, correct = [], 0
+    asked = planted[:questions]
+    for fact in asked:
+        t0 = time.perf_counter()
+        answer, _ = answer_question(fact.question, result.doc_id)
+        answer_latency.append(time.perf_counter() - t0)
+        correct += fact.answer in answer
+    answers = {
+        "questions": len(asked),
+        "latency": _percentiles_ms(answer_latency),
+        "answer_accuracy": round(correct / len(asked), 3) if asked else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    row = {
+        "pages": pages,
+        "facts": len(planted),
+        "ingest": ingest,
+        "retrieval": retrieval,
+        "answer": answers,
+    }
+    if revise:
+        row["revision"] = bench_revision(
+            pages, facts, revise, k, workdir, seed, result, ingest_seconds
+        )
+    return row
+
+
+def bench_revision(
+    pages: int, facts: int, revise: int, k: int, workdir: Path, seed: int, base, base_seconds: float
+) -> dict:
+    """Re-index a revision of the document with `revise` pages rewritten."""
+    from backend.ingestion import ingest_pdf
+    from backend.vector_store import search_documents
+
+    texts, _ = synthetic_pages(pages, facts, seed)
+    changed = sorted(random.Random(seed).sample(range(pages), min(revise, pages)))
+    new_facts = revise_pages(texts, changed, seed)
+    revised_path = workdir / f"synthetic-{pages}p-{seed}-revised.pdf"
+    write_pdf(revised_path, texts)
+
+    t0 = time.perf_counter()
+    result = ingest_pdf(str(revised_path), base_doc_id=base.doc_id)
+    seconds = time.perf_counter() - t0
+    found = sum(
+        any(f.answer in d.page_content for d in search_documents(result.doc_id, f.question, k))
+        for f in new_facts
+    )
+    revision = result.revision or {}
+    return {
+        "pages_changed": len(changed),
+        "seconds": round(seconds, 3),
+        "speedup": round(base_seconds / seconds, 2),
+        "chunks_embedded": revision.get("chunks_embedded"),
+        "chunks_reused": revision.get("chunks_reused"),
+        "stale_sections": len(revision.get("stale_sections", [])),
+        "new_fact_recall_at_k": round(found / len(new_facts), 3) if new_facts else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100, 400])
+    parser.add_argument("--facts", type=int, default=20, help="planted facts per PDF")
+    parser.add_argument("--questions", type=int, default=10, help="answer_question calls per PDF")
+    parser.add_argument("-k", type=int, default=5, help="recall@k cutoff")
+    parser.add_argument("--revise", type=int, default=2, help="pages rewritten in the revision")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, help="report path (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="insightpdf-bench-") as tmp:
+        for name, value in BENCH_ENV.items():
+            os.environ.setdefault(name, value)
+        os.environ.setdefault("DATA_DIR", str(Path(tmp) / "data"))
+        # backend.config reads the environment on import
+        from backend import config
+
+        results = []
+        for pages in sorted(args.pages):
+            row = bench_document(
+                pages, args.facts, args.questions, args.k, Path(tmp), args.seed, args.revise
+            )
+            results.append(row)
+            print(
+                f"{pages:>5} pages | ingest {row['ingest']['pages_per_second']:>8} pages/s "
+                f"{row['ingest']['chunks_per_second']:>9} chunks/s | search p95 "
+                f"{row['retrieval']['search'].get('p95_ms')} ms, recall@{args.k} "
+                f"{row['retrieval']['recall_at_k']} | answer p95 "
+                f"{row['answer']['latency'].get('p95_ms')} ms, accuracy "
+                f"{row['answer']['answer_accuracy']} | peak {row['answer']['peak_rss_mb']} MB"
+            )
+            if "revision" in row:
+                rev = row["revision"]
+                print(
+                    f"      revision of {rev['pages_changed']} pages: {rev['seconds']} s "
+                    f"({rev['speedup']}x faster), {rev['chunks_embedded']} chunks embedded, "
+                    f"{rev['chunks_reused']} reused, {rev['stale_sections']} stale sections"
+                )
+
+        report = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "args": {k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()},
+                "env": {name: os.environ[name] for name in BENCH_ENV},
+                "llm": {
+                    "provider": config.LLM_PROVIDER,
+                    "latency_ms": config.FAKE_LLM_LATENCY_MS,
+                    "tokens_per_second": config.FAKE_LLM_TOKENS_PER_SECOND,
+                },
+                "embedding_model": config.EMBEDDING_MODEL,
+                "vector_backend": config.VECTOR_BACKEND,
+            },
+            "results": results,
+        }
+
+    out = args.out
+    if out is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        out = RESULTS_DIR / f"{stamp}-{report['meta']['commit']}.json"
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {out}")
+
+
+if __name__ == "__main__":
+    main()
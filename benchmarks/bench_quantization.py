@@ -0,0 +1,93 @@
+"""
+Recall and speed of quantized numpy indexes on synthetic embeddings.
+
+    python -m benchmarks.bench_quantization --sizes 5000 50000 --dim 384 --rescore 8 16 32 64
+
+For each collection size and VECTOR_QUANTIZATION mode ("none", "int8",
+"binary"): memory taken by the codes scanned in the first stage, p50
+query latency of the two-stage search against exact search, and recall@k
+of the two-stage results versus the exact top k, per rescoring factor.
+Vectors are drawn around random cluster centres, like the embeddings of
+a document's chunks, and queries are midpoints of pairs of them.
+"""
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.numpy_store import QUANTIZATIONS, NumpyBackend, evaluate_recall
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, spread: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)]
+    vectors += spread * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def bench_size(
+    root: Path, n: int, dim: int, queries: int, k: int, rescore: list, modes: list, seed: int
+) -> list:
+    vectors = clustered_vectors(n, dim, clusters=max(n // 200, 4), spread=0.8, seed=seed)
+    chunks = [
+        Document(page_content=f"chunk {i}", metadata={"chunk_id": f"chunk-{i}"}) for i in range(n)
+    ]
+    ids = [f"chunk-{i}" for i in range(n)]
+    rng = np.random.default_rng(seed + 1)
+    pairs = rng.integers(0, n, size=(queries, 2))
+    query_vectors = vectors[pairs[:, 0]] + vectors[pairs[:, 1]]
+
+    rows = []
+    for mode in modes:
+        backend = NumpyBackend(root / mode, quantization=mode)
+        index = backend.create(f"bench-{n}")
+        index.add(ids, chunks, vectors)
+        for factor in rescore if mode != "none" else [1]:
+            index.rescore_factor = factor
+            rows.append({"n": n, "dim": dim, **evaluate_recall(index, query_vectors, k)})
+        backend.drop(f"bench-{n}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[8, 16, 32, 64],
+                        help="candidates re-scored per hit")
+    parser.add_argument("--modes", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="insightpdf-quant-") as tmp:
+        print(
+            f"{'n':>8} {'mode':>7} {'rescore':>7} {'code MB':>8} {'f32 MB':>8} "
+            f"{'p50 ms':>8} {'exact ms':>9} {'recall@' + str(args.k):>9}"
+        )
+        for n in args.sizes:
+            for row in bench_size(
+                Path(tmp), n, args.dim, args.queries, args.k, args.rescore, args.modes, args.seed
+            ):
+                results.append(row)
+                print(
+                    f"{n:>8} {row['quantization']:>7} "
+                    f"{row['rescore_factor'] if row['quantization'] != 'none' else '-':>7} "
+                    f"{row['codes_bytes'] / 2**20:>8.1f} {row['vectors_bytes'] / 2**20:>8.1f} "
+                    f"{row['search_p50_ms']:>8.3f} {row['exact_p50_ms']:>9.3f} "
+                    f"{row['recall_at_k']:>9.3f}"
+                )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
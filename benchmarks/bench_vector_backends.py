@@ -0,0 +1,96 @@
+"""
+Compare the vector backends on synthetic data.
+
+    python -m benchmarks.bench_vector_backends --sizes 1000 5000 20000 --dim 384
+
+Reports index build time and top-k query latency (p50/p95, with and without a
+metadata filter) per backend and collection size, as a table and optional JSON.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.chroma_store import ChromaBackend
+from backend.numpy_store import NumpyBackend
+
+
+def _percentile_ms(samples, q):
+    return round(float(np.percentile(samples, q)) * 1000, 3)
+
+
+def bench_backend(backend, n: int, dim: int, queries: int, k: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    chunks = [
+        Document(page_content=f"chunk {i}", metadata={"page": i // 2, "chunk_index": i})
+        for i in range(n)
+    ]
+    ids = [f"chunk-{i}" for i in range(n)]
+    doc_id = f"bench-{backend.name}-{n}"
+
+    t0 = time.perf_counter()
+    index = backend.create(doc_id)
+    index.add(ids, chunks, vectors)
+    build_seconds = time.perf_counter() - t0
+
+    query_vectors = rng.standard_normal((queries, dim)).astype(np.float32)
+    plain, filtered = [], []
+    for q in query_vectors:
+        t0 = time.perf_counter()
+        index.search(q, k)
+        plain.append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        index.search(q, k, where={"page": {"$lt": n // 20}})
+        filtered.append(time.perf_counter() - t0)
+
+    backend.drop(doc_id)
+    return {
+        "backend": backend.name,
+        "n": n,
+        "dim": dim,
+        "build_seconds": round(build_seconds, 3),
+        "query_p50_ms": _percentile_ms(plain, 50),
+        "query_p95_ms": _percentile_ms(plain, 95),
+        "filtered_p50_ms": _percentile_ms(filtered, 50),
+        "filtered_p95_ms": _percentile_ms(filtered, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["numpy", "chroma"])
+    parser.add_argument("--out", type=Path, help="write results as JSON here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Both stay out of the app's DATA_DIR
+        backends = {
+            "numpy": NumpyBackend(root=Path(tmp) / "numpy"),
+            "chroma": ChromaBackend(path=Path(tmp) / "chroma"),
+        }
+        results = [
+            bench_backend(backends[name], n, args.dim, args.queries, args.k)
+            for n in args.sizes
+            for name in args.backends
+        ]
+
+    header = ["backend", "n", "build_seconds", "query_p50_ms", "query_p95_ms", "filtered_p50_ms", "filtered_p95_ms"]
+    print(" | ".join(header))
+    for row in results:
+        print(" | ".join(str(row[h]) for h in header))
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
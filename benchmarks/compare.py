@@ -0,0 +1,83 @@
+"""
+Compare two bench_pipeline reports, e.g. before and after a change.
+
+    python -m benchmarks.compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+Prints every numeric metric per PDF size with its relative change. Changes
+for the worse beyond --threshold (latency, seconds and memory up;
+throughput, recall and accuracy down) are flagged, and with --fail the
+exit status is 1 when there is any, for CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, Tuple
+
+# Metrics where a larger value is an improvement; all others count as costs
+_HIGHER_IS_BETTER = ("per_second", "recall", "mrr", "accuracy", "speedup", "reused")
+# Descriptive numbers, not measurements
+_IGNORED = ("pages", "facts", "chunks", "queries", "questions", "k", "pages_changed")
+
+
+def _flatten(value, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            yield from _flatten(inner, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def metrics(report: dict) -> Dict[str, float]:
+    """`pages=N/section.metric` -> value, for every numeric metric of a report."""
+    flat = {}
+    for row in report["results"]:
+        for name, value in _flatten(row):
+            if name.rsplit(".", 1)[-1] not in _IGNORED:
+                flat[f"pages={row['pages']}/{name}"] = value
+    return flat
+
+
+def is_regression(name: str, old: float, new: float, threshold: float) -> bool:
+    if old == 0:
+        return False
+    change = (new - old) / abs(old)
+    if any(marker in name for marker in _HIGHER_IS_BETTER):
+        return change < -threshold
+    return change > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change to flag")
+    parser.add_argument("--fail", action="store_true", help="exit 1 on any regression")
+    args = parser.parse_args()
+
+    old_report = json.loads(args.old.read_text())
+    new_report = json.loads(args.new.read_text())
+    old, new = metrics(old_report), metrics(new_report)
+    print(f"{old_report['meta']['commit']} -> {new_report['meta']['commit']}")
+
+    regressions = []
+    width = max((len(name) for name in old.keys() | new.keys()), default=10)
+    for name in sorted(old.keys() | new.keys()):
+        if name not in old or name not in new:
+            print(f"{name:<{width}}  {'only in ' + ('new' if name in new else 'old')}")
+            continue
+        before, after = old[name], new[name]
+        change = f"{(after - before) / abs(before):+.1%}" if before else "n/a"
+        flag = ""
+        if is_regression(name, before, after, args.threshold):
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<{width}}  {before:>12g} -> {after:>12g}  {change:>8}{flag}")
+
+    print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+    if args.fail and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Import-time profile and budget of the app's upload page.
+
+    python -m benchmarks.import_budget --budget-ms 500
+
+Renders the first page of app/app.py in a fresh interpreter with
+Streamlit's script runner (no browser, no background model warmup), under
+`python -X importtime`. Prints the slowest imports the page adds to
+Streamlit's own, then checks that it imported none of HEAVY_MODULES (they
+load on first use), created nothing under DATA_DIR, and that its imports
+took at most --budget-ms. Exits 1 when a check fails, for CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / "app" / "app.py"
+
+# Must not be imported before the first upload or question
+HEAVY_MODULES = (
+    "langchain",
+    "langchain_core",
+    "langchain_community",
+    "langchain_text_splitters",
+    "chromadb",
+    "sentence_transformers",
+    "transformers",
+    "torch",
+    "pypdf",
+    "ollama",
+)
+
+_MARKER = "--- page ---"
+_PROBE = f"""
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+sys.stderr.write("{_MARKER}\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+page = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "errors": [e.message for e in page.exception],
+    "upload_page": len(page.get("file_uploader")) > 0,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """(module, self_us, cumulative_us, depth) per `-X importtime` line."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def profile_page(data_dir: Path) -> dict:
+    env = {
+        **os.environ,
+        "DATA_DIR": str(data_dir),
+        "WARMUP_ON_START": "0",
+        "API_URL": "",
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, str(APP)],
+        capture_output=True, text=True, env=env, cwd=ROOT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"app/app.py failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr.split(_MARKER, 1)[-1])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=500, help="page import time allowed")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="insightpdf-imports-") as tmp:
+        data_dir = Path(tmp) / "data"
+        result = profile_page(data_dir)
+        created = data_dir.exists()
+
+    imports = result["imports"]
+    top_level = [row for row in imports if row[3] == 0]
+    total_ms = sum(row[2] for row in top_level) / 1000
+    print(f"{'module':<50} {'cumulative ms':>14} {'self ms':>9}")
+    for name, self_us, cumulative_us, _ in sorted(top_level, key=lambda r: -r[2])[: args.top]:
+        print(f"{name:<50} {cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}")
+    print(f"{len(imports)} modules imported in {total_ms:.0f} ms; page ran in {result['seconds']:.2f}s")
+
+    failures = [f"page raised: {error}" for error in result["errors"]]
+    if not result["upload_page"]:
+        failures.append("the upload page was not rendered")
+    heavy = sorted(
+        {m.split(".")[0] for m in result["modules"] if m.split(".")[0] in HEAVY_MODULES}
+    )
+    if heavy:
+        failures.append(f"heavy modules imported eagerly: {', '.join(heavy)}")
+    if created:
+        failures.append("data directories were created on import")
+    if total_ms > args.budget_ms:
+        failures.append(f"imports took {total_ms:.0f} ms, budget {args.budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK: within the import budget")
+
+
+if __name__ == "__main__":
+    main()
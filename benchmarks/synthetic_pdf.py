@@ -0,0 +1,189 @@
+"""
+Generate synthetic PDFs with planted facts, for benchmarks.
+
+    python -m benchmarks.synthetic_pdf out.pdf --pages 50 --facts 20
+
+Pages are filler prose from a fixed vocabulary (deterministic for a seed);
+each planted fact is one sentence with a unique code on a known page, e.g.
+"The calibration code of turbine unit Kestrel-12 is QX-4821." Its question
+and answer are returned (and printed as JSON) for recall checks.
+"""
+import argparse
+import json
+import random
+import textwrap
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+# About 35 lines of 95 characters per page
+SENTENCES_PER_PAGE = 31
+CHARS_PER_LINE = 95
+
+_ADJECTIVES = (
+    "primary", "auxiliary", "redundant", "thermal", "hydraulic", "annual", "regional",
+    "external", "legacy", "modular", "seasonal", "critical", "routine", "manual",
+)
+_NOUNS = (
+    "pump", "valve", "sensor", "controller", "budget", "schedule", "warehouse", "supplier",
+    "gearbox", "inspection", "shipment", "report", "committee", "network", "filter",
+)
+_VERBS = (
+    "monitors", "replaces", "reviews", "supplies", "regulates", "documents", "delays",
+    "approves", "measures", "connects", "inspects", "extends", "records", "limits",
+)
+_PLACES = (
+    "north wing", "main plant", "test facility", "head office", "loading dock",
+    "control room", "field station", "data center", "east annex", "storage yard",
+)
+_ATTRIBUTES = (
+    "calibration code", "serial number", "access code", "license key", "batch number",
+    "permit number", "reference code", "asset tag",
+)
+_UNITS = ("turbine unit", "compressor", "site", "vessel", "project", "contract", "line")
+_NAMES = (
+    "Kestrel", "Osprey", "Harrier", "Falcon", "Merlin", "Condor", "Heron", "Plover",
+    "Curlew", "Avocet", "Dunlin", "Godwit", "Lapwing", "Petrel", "Shrike", "Tern",
+)
+
+
+@dataclass
+class PlantedFact:
+    page: int  # 0-based, like the loader's page metadata
+    sentence: str
+    question: str
+    answer: str
+
+
+def _filler_sentence(rng: random.Random) -> str:
+    return (
+        f"The {rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} {rng.choice(_VERBS)} the "
+        f"{rng.choice(_ADJECTIVES)} {rng.choice(_NOUNS)} in the {rng.choice(_PLACES)} "
+        f"every {rng.randint(2, 60)} days."
+    )
+
+
+def _fact(rng: random.Random, page: int, used: set) -> PlantedFact:
+    while True:
+        attribute = rng.choice(_ATTRIBUTES)
+        entity = f"{rng.choice(_UNITS)} {rng.choice(_NAMES)}-{rng.randint(10, 99)}"
+        if (attribute, entity) not in used:
+            used.add((attribute, entity))
+            break
+    answer = f"{chr(rng.randint(65, 90))}{chr(rng.randint(65, 90))}-{rng.randint(1000, 9999)}"
+    return PlantedFact(
+        page=page,
+        sentence=f"The {attribute} of {entity} is {answer}.",
+        question=f"What is the {attribute} of {entity}?",
+        answer=answer,
+    )
+
+
+def synthetic_pages(pages: int, facts: int, seed: int = 0):
+    """Text lines per page and the facts planted in them."""
+    rng = random.Random(seed)
+    fact_pages = sorted(rng.sample(range(pages), min(facts, pages)) if pages else [])
+    fact_pages += [rng.randrange(pages) for _ in range(max(facts - pages, 0))]
+    by_page = {}
+    used: set = set()
+    planted = []
+    for page in fact_pages:
+        fact = _fact(rng, page, used)
+        by_page.setdefault(page, []).append(fact)
+        planted.append(fact)
+
+    texts = []
+    for page in range(pages):
+        sentences = [_filler_sentence(rng) for _ in range(SENTENCES_PER_PAGE)]
+        for fact in by_page.get(page, []):
+            sentences.insert(rng.randrange(len(sentences)), fact.sentence)
+        texts.append(textwrap.wrap(" ".join(sentences), CHARS_PER_LINE))
+    return texts, planted
+
+
+def revise_pages(
+    texts: List[List[str]], pages: List[int], seed: int = 0
+) -> List[PlantedFact]:
+    """
+    Rewrite `pages` of `texts` in place with new filler and one new planted
+    fact each, like a revision of the document; returns the new facts.
+    """
+    rng = random.Random(f"revision-{seed}")
+    used: set = set()
+    planted = []
+    for page in pages:
+        fact = _fact(rng, page, used)
+        sentences = [_filler_sentence(rng) for _ in range(SENTENCES_PER_PAGE)]
+        sentences.insert(rng.randrange(len(sentences)), fact.sentence)
+        texts[page] = textwrap.wrap(" ".join(sentences), CHARS_PER_LINE)
+        planted.append(fact)
+    return planted
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, pages: List[List[str]]):
+    """A minimal PDF: one Helvetica text stream per page."""
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    # Page objects come after their content streams; the page tree follows them
+    pages_ref = font + 2 * len(pages) + 1
+    kids = []
+    for lines in pages:
+        text = " ".join(f"({_escape(line)}) '" for line in lines)
+        stream = f"BT /F1 9 Tf 40 770 Td 13 TL {text} ET".encode("latin-1", "replace")
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R"
+                b" /Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_ref, content, font)
+            )
+        )
+    tree = add(
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+    )
+    assert tree == pages_ref
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % tree)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref,
+    )
+    Path(path).write_bytes(bytes(out))
+
+
+def generate_pdf(path: Path, pages: int, facts: int = 10, seed: int = 0) -> List[PlantedFact]:
+    """Write a synthetic PDF of `pages` pages to `path`; returns the planted facts."""
+    texts, planted = synthetic_pages(pages, facts, seed)
+    write_pdf(path, texts)
+    return planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out", type=Path)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--facts", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    planted = generate_pdf(args.out, args.pages, args.facts, args.seed)
+    print(json.dumps([asdict(f) for f in planted], indent=2))
+
+
+if __name__ == "__main__":
+    main()